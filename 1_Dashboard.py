@@ -2,7 +2,21 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from streamlit_autorefresh import st_autorefresh
-from utils.db import execute_query
+from utils.db import pool_stats
+from utils.dashboard_data import (
+    fetch_kpi_snapshot,
+    fetch_city_list,
+    fetch_high_traffic_by_city,
+    fetch_traffic_forecasts,
+    fetch_aqi_trend,
+    fetch_aqi_forecasts,
+    fetch_accident_severity,
+    fetch_crowd_hotspots,
+    fetch_complaints_by_category,
+    fetch_infra_issues,
+    fetch_recent_alerts
+)
+from utils.query_cache import cache_stats
 from utils.ui_components import app_footer
 
 st.set_page_config(page_title="Smart City Analytics Dashboard", layout="wide")
@@ -28,11 +42,6 @@ Enabling faster, data-driven urban governance.
 
 st.sidebar.header("🎛 Dashboard Filters")
 
-city_list = execute_query("SELECT DISTINCT city FROM traffic_data")
-cities = ["All"] + [c["city"] for c in city_list if c["city"]]
-
-selected_city = st.sidebar.selectbox("Select City", cities)
-
 auto_refresh = st.sidebar.toggle("🔄 Auto Refresh")
 
 refresh_rate = st.sidebar.selectbox(
@@ -43,59 +52,17 @@ refresh_rate = st.sidebar.selectbox(
 
 refresh_seconds = int(refresh_rate.split()[0])
 
-if auto_refresh:
-    st_autorefresh(interval=refresh_seconds * 1000, key="dashboard_refresh")
-
-city_condition = ""
-
-if selected_city != "All":
-    city_condition = f" AND city = '{selected_city}' "
-
-# KPI QUERIES 
-
-traffic = execute_query(f"""
-SELECT COUNT(*) AS count
-FROM traffic_data
-WHERE congestion_level='high' {city_condition}
-""")
-
-aqi = execute_query(f"""
-SELECT aqi, aqi_category
-FROM air_quality_data
-WHERE 1=1 {city_condition}
-ORDER BY timestamp DESC
-LIMIT 1
-""")
-
-accidents = execute_query("""
-SELECT COUNT(*) AS count
-FROM accident_events
-WHERE DATE(detected_at)=CURDATE()
-""")
+city_list = fetch_city_list(ttl=refresh_seconds)
+cities = ["All"] + [c["city"] for c in city_list if c["city"]]
 
-crowd = execute_query(f"""
-SELECT COUNT(*) AS count
-FROM crowd_density_data
-WHERE density_level IN ('high','extreme') {city_condition}
-""")
+selected_city = st.sidebar.selectbox("Select City", cities)
 
-potholes = execute_query("""
-SELECT COUNT(*) AS count
-FROM road_infra_annotations
-WHERE object_class='pothole'
-""")
+if auto_refresh:
+    st_autorefresh(interval=refresh_seconds * 1000, key="dashboard_refresh")
 
-infra = execute_query(f"""
-SELECT COUNT(*) AS count
-FROM road_infra_images
-WHERE road_type='street_infra' {city_condition}
-""")
+# KPI SNAPSHOT 
 
-complaints = execute_query(f"""
-SELECT COUNT(*) AS count
-FROM complaint_nlp_analysis
-WHERE sentiment = 'negative' 
-""")
+kpi = fetch_kpi_snapshot(selected_city, ttl=refresh_seconds)
 
 st.markdown("### 🚨 Key Urban Risk Indicators")
 # KPI DISPLAY 
@@ -103,14 +70,14 @@ st.markdown("### 🚨 Key Urban Risk Indicators")
 col1, col2, col3, col4 = st.columns(4)
 col5, col6, col7 = st.columns(3)
 
-col1.metric("🚦 High Traffic Zones", traffic[0]["count"])
-col2.metric("🌫 Latest AQI", aqi[0]["aqi"] if aqi else "N/A")
-col3.metric("🚑 Accidents Today", accidents[0]["count"])
-col4.metric("🧍 High Crowd Locations", crowd[0]["count"])
+col1.metric("🚦 High Traffic Zones", kpi.high_traffic_zones)
+col2.metric("🌫 Latest AQI", kpi.latest_aqi if kpi.latest_aqi is not None else "N/A")
+col3.metric("🚑 Accidents Today", kpi.accidents_today)
+col4.metric("🧍 High Crowd Locations", kpi.high_crowd_locations)
 
-col5.metric("🛣 Potholes Detected", potholes[0]["count"])
-col6.metric("💡 Streetlight Issues", infra[0]["count"])
-col7.metric("🧾 Negative Complaints", complaints[0]["count"])
+col5.metric("🛣 Potholes Detected", kpi.potholes_detected)
+col6.metric("💡 Streetlight Issues", kpi.streetlight_issues)
+col7.metric("🧾 Negative Complaints", kpi.negative_complaints)
 
 st.divider()
 
@@ -120,12 +87,7 @@ st.markdown("### 📊 Urban Analytics")
 col1, col2 = st.columns(2)
 
 # 🚦 TRAFFIC
-traffic_chart = execute_query(f"""
-SELECT city, COUNT(*) AS high_congestion_count
-FROM traffic_data
-WHERE congestion_level='high' {city_condition}
-GROUP BY city
-""")
+traffic_chart = fetch_high_traffic_by_city(selected_city, ttl=refresh_seconds)
 
 df = pd.DataFrame(traffic_chart)
 
@@ -134,13 +96,7 @@ if not df.empty:
     col1.plotly_chart(fig, use_container_width=True)
 
 # 🌫 AQI TREND
-aqi_chart = execute_query(f"""
-SELECT timestamp, aqi
-FROM air_quality_data
-WHERE 1=1 {city_condition}
-ORDER BY timestamp DESC
-LIMIT 50
-""")
+aqi_chart = fetch_aqi_trend(selected_city, ttl=refresh_seconds)
 
 df = pd.DataFrame(aqi_chart)
 
@@ -148,12 +104,29 @@ if not df.empty:
     fig = px.line(df, x="timestamp", y="aqi", title="🌫 AQI Trend")
     col2.plotly_chart(fig, use_container_width=True)
 
+# 🔮 TRAFFIC FORECAST
+traffic_forecast = fetch_traffic_forecasts(selected_city, ttl=refresh_seconds)
+
+df = pd.DataFrame(traffic_forecast[:20])
+
+if not df.empty:
+    df["junction"] = df["area"].fillna("") + " (" + df["city"].fillna("") + ")"
+    fig = px.bar(df, x="junction", y="predicted_vehicles", color="congestion_level",
+                 title="🔮 Next-hour Traffic Forecast (busiest junctions)")
+    st.plotly_chart(fig, use_container_width=True)
+
+# 🔮 AQI FORECAST
+aqi_forecast = fetch_aqi_forecasts(selected_city, ttl=refresh_seconds)
+
+df = pd.DataFrame(aqi_forecast)
+
+if not df.empty:
+    fig = px.bar(df, x="monitoring_station", y="predicted_aqi", color="aqi_category",
+                 title=f"🔮 AQI Forecast for {df['forecast_for'].iloc[0]:%d %b %H:%M}")
+    st.plotly_chart(fig, use_container_width=True)
+
 # 🚑 ACCIDENT SEVERITY
-accident_chart = execute_query("""
-SELECT severity, COUNT(*) AS total
-FROM accident_events
-GROUP BY severity
-""")
+accident_chart = fetch_accident_severity(ttl=refresh_seconds)
 
 df = pd.DataFrame(accident_chart)
 
@@ -162,13 +135,7 @@ if not df.empty:
     st.plotly_chart(fig, use_container_width=True)
 
 # 🧍 CROWD HOTSPOTS
-crowd_chart = execute_query(f"""
-SELECT location, estimated_count
-FROM crowd_density_data
-WHERE 1=1 {city_condition}
-ORDER BY estimated_count DESC
-LIMIT 10
-""")
+crowd_chart = fetch_crowd_hotspots(selected_city, ttl=refresh_seconds)
 
 df = pd.DataFrame(crowd_chart)
 
@@ -177,12 +144,7 @@ if not df.empty:
     st.plotly_chart(fig, use_container_width=True)
 
 # 🧾 COMPLAINTS
-complaint_chart = execute_query(f"""
-SELECT category, COUNT(*) AS total
-FROM citizen_complaints
-WHERE 1=1 {city_condition}
-GROUP BY category
-""")
+complaint_chart = fetch_complaints_by_category(selected_city, ttl=refresh_seconds)
 
 df = pd.DataFrame(complaint_chart)
 
@@ -191,12 +153,7 @@ if not df.empty:
     st.plotly_chart(fig, use_container_width=True)
 
 # 💡 INFRASTRUCTURE
-infra_chart = execute_query(f"""
-SELECT city, COUNT(*) AS issues
-FROM road_infra_images
-WHERE road_type='street_infra' {city_condition}
-GROUP BY city
-""")
+infra_chart = fetch_infra_issues(selected_city, ttl=refresh_seconds)
 
 df = pd.DataFrame(infra_chart)
 
@@ -204,16 +161,16 @@ if not df.empty:
     fig = px.bar(df, x="city", y="issues", title="💡 Infrastructure Issues")
     st.plotly_chart(fig, use_container_width=True)
 
+# DB POOL HEALTH
+with st.sidebar.expander("🗄 DB Connection Pool"):
+    st.json(pool_stats())
+    st.json(cache_stats())
+
 #  System Alerts
 st.divider()
 st.subheader("🚨 Recent System Alerts")
 
-alerts = execute_query("""
-SELECT alert_type, location, severity, generated_at, resolved
-FROM system_alerts
-ORDER BY generated_at DESC
-LIMIT 10
-""")
+alerts = fetch_recent_alerts(ttl=refresh_seconds)
 
 df_alerts = pd.DataFrame(alerts)
 
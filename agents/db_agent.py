@@ -1,5 +1,5 @@
 from utils.llm import call_llm
-from utils.db import execute_query
+from utils.db import execute_query, sargable_time_filters
 from utils.intent_guard import is_smartcity_query
 
 
@@ -47,12 +47,14 @@ road_infra_images(image_id, captured_at, city, latitude, longitude)
 
 road_infra_annotations(annotation_id, image_id, object_class)
 
-system_alerts(alert_id, alert_type, generated_at, location, severity, resolved)
+system_alerts(alert_id, alert_type, generated_at, last_seen_at, location, severity, occurrences, resolved)
 
 Rules:
 - Use only existing columns
 - If user asks "latest" → ORDER BY correct time column DESC LIMIT 1
-- If user asks "today" → use DATE(column) = CURDATE()
+- If user asks "today" → use column >= CURDATE() AND column < CURDATE() + INTERVAL 1 DAY
+- If user asks "this week" / "last hour" → use a range on the raw time column (column >= ... AND column < ...)
+- Never wrap a time column in DATE(), WEEK() or other functions inside WHERE
 - If no limit specified → LIMIT 10
 - Infrastructure condition → use road_infra_annotations
 - To get city for infrastructure → JOIN road_infra_images using image_id
@@ -65,7 +67,7 @@ crowd_density_data.timestamp
 citizen_complaints.created_at
 accident_events.detected_at
 road_infra_images.captured_at
-system_alerts.generated_at
+system_alerts.generated_at (first seen), system_alerts.last_seen_at (latest repeat)
 
 User Question:
 {user_query}
@@ -90,6 +92,9 @@ User Question:
     if not sql_upper.startswith("SELECT"):
         return "I can answer only Smart City data questions."
 
+    # KEEP TIME FILTERS INDEX-FRIENDLY
+    sql = sargable_time_filters(sql)
+
     # EXECUTE QUERY 
     try:
         result = execute_query(sql)
@@ -1,10 +1,5 @@
-import os
-import smtplib
-from email.mime.text import MIMEText
-from dotenv import load_dotenv
 from utils.llm import call_llm
-
-load_dotenv()
+from utils.mailer import mailer
 
 
 def handle_email_query(user_query: str):
@@ -124,20 +119,8 @@ User request:
 
     # SEND EMAIL 
 
-    sender = os.getenv("ALERT_EMAIL")
-    password = os.getenv("ALERT_EMAIL_PASSWORD")
-    receiver = os.getenv("SENDER_EMAIL")
-
     try:
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = sender
-        msg["To"] = receiver
-
-        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-        server.login(sender, password)
-        server.sendmail(sender, receiver, msg.as_string())
-        server.quit()
+        mailer.send(subject, body)
 
         return f"""📧 **Email sent successfully**
 
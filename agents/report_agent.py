@@ -1,62 +1,63 @@
 from utils.db import execute_query
 from utils.llm import call_llm
+from utils.rollups import rollup_by, rollup_total
+from utils.query_executor import run_parallel
 
 
 # FULL CITY REPORT
 def generate_full_report():
 
-    traffic = execute_query("""
-        SELECT city, COUNT(*) AS high_congestion_count
-        FROM traffic_data
-        WHERE congestion_level = 'high'
-        GROUP BY city
-        LIMIT 5
-    """)
-
-    aqi = execute_query("""
-        SELECT city, aqi, aqi_category
-        FROM air_quality_data
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-
-    accidents = execute_query("""
-        SELECT severity, COUNT(*) AS incident_count
-        FROM accident_events
-        GROUP BY severity
-    """)
-
-    crowd = execute_query("""
-        SELECT city, location, estimated_count, density_level
-        FROM crowd_density_data
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-
-    complaints = execute_query("""
-        SELECT city, category, priority, status
-        FROM citizen_complaints
-        ORDER BY created_at DESC
-        LIMIT 5
-    """)
-
-    potholes = execute_query("""
-        SELECT COUNT(*) AS pothole_count
-        FROM road_infra_annotations
-        WHERE object_class = 'pothole'
-    """)
-
-    infrastructure = execute_query("""
-        SELECT city, COUNT(*) AS defect_count
-        FROM road_infra_images
-        WHERE road_type = 'street_infra'
-        GROUP BY city
-        LIMIT 5
-    """)
-
-    if not any([traffic, aqi, accidents, crowd, complaints, potholes, infrastructure]):
+    # independent reads run concurrently; a slow or failing one only blanks its own section
+    results, errors = run_parallel({
+
+        "traffic": lambda max_ms: rollup_by("traffic", "city", "high_congestion_count",
+                                            dimensions=["high"], by_city=True, limit=5, max_ms=max_ms),
+
+        "aqi": """
+            SELECT city, aqi, aqi_category
+            FROM air_quality_data
+            ORDER BY timestamp DESC
+            LIMIT 5
+        """,
+
+        "accidents": lambda max_ms: rollup_by("accident", "severity", "incident_count", max_ms=max_ms),
+
+        "crowd": """
+            SELECT city, location, estimated_count, density_level
+            FROM crowd_density_data
+            ORDER BY timestamp DESC
+            LIMIT 5
+        """,
+
+        "complaints": """
+            SELECT city, category, priority, status
+            FROM citizen_complaints
+            ORDER BY created_at DESC
+            LIMIT 5
+        """,
+
+        "potholes": lambda max_ms: [{"pothole_count": rollup_total("annotation", dimensions=["pothole"],
+                                                                   max_ms=max_ms)}],
+
+        "infrastructure": lambda max_ms: rollup_by("infra_image", "city", "defect_count",
+                                                   dimensions=["street_infra"], by_city=True, limit=5,
+                                                   max_ms=max_ms)
+    })
+
+    if not any(results.values()):
         return "No data available to generate the city report."
 
+    for name, reason in errors.items():
+        results[name] = f"UNAVAILABLE ({reason})"
+
+    traffic = results["traffic"]
+    aqi = results["aqi"]
+    accidents = results["accidents"]
+    crowd = results["crowd"]
+    complaints = results["complaints"]
+    potholes = results["potholes"]
+    infrastructure = results["infrastructure"]
+
     data = f"""
 TRAFFIC:
 {traffic}
@@ -142,13 +143,8 @@ Rules:
 
     # TRAFFIC
     if any(word in q for word in ["traffic", "congestion", "road"]):
-        traffic = execute_query("""
-            SELECT city, COUNT(*) AS high_congestion_count
-            FROM traffic_data
-            WHERE congestion_level = 'high'
-            GROUP BY city
-            LIMIT 5
-        """)
+        traffic = rollup_by("traffic", "city", "high_congestion_count",
+                            dimensions=["high"], by_city=True, limit=5)
         data_sections.append(f"TRAFFIC:\n{traffic}")
 
     # AIR QUALITY
@@ -163,11 +159,7 @@ Rules:
 
     # ACCIDENTS
     if any(word in q for word in ["accident", "crash", "collision"]):
-        accidents = execute_query("""
-            SELECT severity, COUNT(*) AS incident_count
-            FROM accident_events
-            GROUP BY severity
-        """)
+        accidents = rollup_by("accident", "severity", "incident_count")
         data_sections.append(f"ACCIDENTS:\n{accidents}")
 
     # CROWD
@@ -192,22 +184,13 @@ Rules:
 
     # POTHOLES
     if "pothole" in q:
-        potholes = execute_query("""
-            SELECT COUNT(*) AS pothole_count
-            FROM road_infra_annotations
-            WHERE object_class = 'pothole'
-        """)
+        potholes = [{"pothole_count": rollup_total("annotation", dimensions=["pothole"])}]
         data_sections.append(f"POTHOLES:\n{potholes}")
 
     # INFRASTRUCTURE
     if any(word in q for word in ["infrastructure", "infra", "streetlight"]):
-        infrastructure = execute_query("""
-            SELECT city, COUNT(*) AS defect_count
-            FROM road_infra_images
-            WHERE road_type = 'street_infra'
-            GROUP BY city
-            LIMIT 5
-        """)
+        infrastructure = rollup_by("infra_image", "city", "defect_count",
+                                   dimensions=["street_infra"], by_city=True, limit=5)
         data_sections.append(f"INFRASTRUCTURE:\n{infrastructure}")
 
     # NOTHING MATCHED
@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from utils.detections import Detections
+from utils.inference import DETECTORS, DETECTOR_BACKENDS, detector_path, load_local_model
+from utils.tracking import iou_matrix, greedy_match
+from utils.video_pipeline import load_sample_frames, SAMPLE_FRAMES
+
+# Parity check + latency benchmark of the exported detectors against PyTorch.
+#   python benchmark_backends.py                          -> every exported model, sample images
+#   python benchmark_backends.py --source clip.mp4 traffic
+#   python benchmark_backends.py --backends openvino --imgsz 960 traffic
+# Exit code is 1 when any backend's detections differ from the .pt beyond tolerance.
+
+BOX_IOU = 0.95      # a box counts as the same detection above this IoU
+CONF_DELTA = 0.01   # and when its confidence moved by at most this much
+
+
+def run(name, backend, frames, conf, imgsz, runs):
+    model = load_local_model(name, backend)
+
+    kwargs = {"conf": conf, "verbose": False}
+    if imgsz:
+        kwargs["imgsz"] = imgsz
+
+    # warm-up: graph compilation / allocator growth should not count
+    model(frames[0], **kwargs)
+
+    outputs = [Detections.from_ultralytics(model(f, **kwargs)[0]) for f in frames]
+
+    timings = []
+    for _ in range(runs):
+        for frame in frames:
+            started = time.perf_counter()
+            model(frame, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    return outputs, np.array(timings)
+
+
+def compare(reference, candidate):
+    # (matched, total, worst confidence delta) over one frame
+    scores = iou_matrix(reference.xyxy, candidate.xyxy)
+    if scores.size:
+        scores[reference.cls[:, None] != candidate.cls[None, :]] = 0
+
+    matches, _, _ = greedy_match(scores, BOX_IOU)
+
+    deltas = [abs(float(reference.conf[r]) - float(candidate.conf[c])) for r, c in matches]
+    matched = sum(1 for d in deltas if d <= CONF_DELTA)
+
+    return matched, max(len(reference), len(candidate)), max(deltas, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector backend parity and latency check")
+    parser.add_argument("models", nargs="*", default=list(DETECTORS))
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"], choices=DETECTOR_BACKENDS)
+    parser.add_argument("--source", default=SAMPLE_FRAMES, help="image folder, image or video")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=None)
+    args = parser.parse_args()
+
+    frames = load_sample_frames(args.source, args.frames)
+    if not frames:
+        print(f"❌ No frames found in {args.source}")
+        sys.exit(1)
+
+    print(f"🧪 {len(frames)} frames from {args.source}, {args.runs} timed runs each\n")
+
+    failed = False
+
+    for name in args.models:
+
+        reference, torch_ms = run(name, "torch", frames, args.conf, args.imgsz, args.runs)
+        print(f"{name}")
+        print(f"  torch     p50 {np.percentile(torch_ms, 50):7.1f} ms  p95 {np.percentile(torch_ms, 95):7.1f} ms")
+
+        for backend in args.backends:
+
+            if not os.path.exists(detector_path(name, backend)):
+                print(f"  {backend:<9} skipped (not exported)")
+                continue
+
+            outputs, ms = run(name, backend, frames, args.conf, args.imgsz, args.runs)
+
+            matched = total = 0
+            worst = 0.0
+            for ref, out in zip(reference, outputs):
+                m, t, d = compare(ref, out)
+                matched += m
+                total += t
+                worst = max(worst, d)
+
+            ok = matched == total
+            failed = failed or not ok
+            speedup = np.percentile(torch_ms, 50) / np.percentile(ms, 50)
+
+            print(
+                f"  {backend:<9} p50 {np.percentile(ms, 50):7.1f} ms  p95 {np.percentile(ms, 95):7.1f} ms  "
+                f"x{speedup:.2f}  parity {matched}/{total} (max conf delta {worst:.4f}) "
+                f"{'✅' if ok else '❌'}"
+            )
+
+        print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
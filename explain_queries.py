@@ -0,0 +1,264 @@
+import ast
+import datetime
+import os
+import re
+import sys
+from utils.db import execute_query
+
+# Run EXPLAIN on every SELECT in the codebase and flag full scans.
+#   python explain_queries.py
+# Exit code is 1 when a hot-path query does a full table / full index scan, or
+# cannot be explained at all.
+#
+# SELECT literals are explained as written. Queries assembled at runtime
+# (f-strings with city filters, time windows, rollup readers) are rendered by
+# calling the code that builds them with sample arguments (query_builders())
+# and the SQL + params it hands to execute_query are explained. An f-string
+# query that no builder renders is reported as skipped.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SKIP_DIRS = {".git", "venv", ".venv", "__pycache__", "models", "assets", "tests"}
+
+# sample value bound to %s placeholders; NULL would turn filters into "Impossible WHERE"
+SAMPLE_PARAM = "'0'"
+SAMPLE_CITY = "Chennai"
+
+FULL_SCAN_TYPES = {"ALL": "full table scan", "index": "full index scan"}
+
+# offline tools and scans that are full by design: reported, never fail the run
+OFFLINE_FILES = {
+    "quantize_models.py": "offline calibration tool",
+    "rollup_backfill.py": "offline rebuild",
+    "agents/rag_agent.py": "vector similarity ranks every chunk",
+    "utils/query_cache.py": "cache_generations holds one row per table"
+}
+
+
+def _sample_city_calls(fn):
+    # a city-filtered and an unfiltered run of a fetcher
+    return lambda: (fn(SAMPLE_CITY), fn("All"))
+
+
+def query_builders():
+    """(label, hot, builder): builder() runs code that calls execute_query.
+
+    A builder may also return (sql, params) pairs of its own, for SQL that is
+    assembled at import time and executed elsewhere.
+    """
+
+    from utils import dashboard_data, forecasting, rollups
+
+    end = forecasting.hour_window()[1]
+    since = datetime.datetime.now() - datetime.timedelta(days=1)
+
+    builders = [
+        ("dashboard kpi snapshot", True, _sample_city_calls(dashboard_data._load_kpi_snapshot)),
+        ("dashboard high traffic", True, _sample_city_calls(dashboard_data._load_high_traffic_by_city)),
+        ("dashboard traffic forecasts", True, _sample_city_calls(dashboard_data._load_traffic_forecasts)),
+        ("dashboard aqi trend", True, _sample_city_calls(dashboard_data._load_aqi_trend)),
+        ("dashboard aqi forecasts", True, _sample_city_calls(dashboard_data._load_aqi_forecasts)),
+        ("dashboard crowd hotspots", True, _sample_city_calls(dashboard_data._load_crowd_hotspots)),
+        ("dashboard complaints", True, _sample_city_calls(dashboard_data._load_complaints_by_category)),
+        ("dashboard infra issues", True, _sample_city_calls(dashboard_data._load_infra_issues)),
+        ("dashboard accident severity", True, dashboard_data._load_accident_severity),
+
+        ("rollup_total", True, lambda: (
+            rollups.rollup_total("traffic"),
+            rollups.rollup_total("crowd", dimensions=["high", "extreme"], city=SAMPLE_CITY, since=since)
+        )),
+        ("rollup_by", True, lambda: (
+            rollups.rollup_by("accident", "severity", "total", city=SAMPLE_CITY),
+            rollups.rollup_by("traffic", "city", "total", dimensions=["high"], by_city=True, limit=10)
+        )),
+
+        ("aqi history", True, lambda: forecasting.aqi_history(forecasting.STATIONS, end)),
+        ("traffic junction versions", True, lambda: forecasting.junction_versions(end)),
+        ("traffic forecast versions", True, lambda: forecasting.forecast_versions(end)),
+        ("traffic history", True, lambda: forecasting.traffic_history(end)),
+        ("latest traffic forecast", True, lambda: forecasting.latest_traffic_forecast(SAMPLE_CITY, "Anna Nagar")),
+
+        ("rollup backfill", False, lambda: [(sql, ()) for sql in rollups.BACKFILL_QUERIES.values()])
+    ]
+
+    if os.path.exists(os.path.join(ROOT, "quantize_models.py")):
+        import quantize_models
+        builders.append(("quantize traffic series", False, lambda: quantize_models.traffic_series(None, 24)))
+
+    return builders
+
+
+def render_dynamic_queries():
+    """[(label, hot, path, line, sql, params)] for every query the builders issue."""
+
+    import utils.db
+
+    builders = query_builders()  # imports the modules before they are patched
+    original = utils.db.execute_query
+    rendered = []
+    current = {}
+
+    def record(sql, values=None):
+        caller = sys._getframe(1)
+        rendered.append((
+            current["label"], current["hot"],
+            os.path.relpath(caller.f_code.co_filename, ROOT), caller.f_lineno,
+            sql.strip(), tuple(values or ())
+        ))
+        return []
+
+    # every module that imported execute_query by name gets the recorder
+    patched = [
+        module for module in list(sys.modules.values())
+        if getattr(module, "execute_query", None) is original
+    ]
+
+    try:
+        for module in patched:
+            module.execute_query = record
+
+        for label, hot, builder in builders:
+            current.update(label=label, hot=hot)
+            try:
+                returned = builder()
+            except Exception:
+                # the builder is handed [] for every query; what it does next does not matter
+                continue
+
+            if isinstance(returned, list):
+                for sql, params in returned:
+                    rendered.append((label, hot, label, 0, sql.strip(), tuple(params)))
+    finally:
+        for module in patched:
+            module.execute_query = original
+
+    return rendered
+
+
+def _literal_parts(node):
+    # literal chunks of an f-string, whitespace-normalised
+    return [" ".join(v.value.split()) for v in node.values if isinstance(v, ast.Constant) and v.value.strip()]
+
+
+def _is_select(sql):
+    return re.match(r"\s*SELECT\s", sql, re.IGNORECASE) and re.search(r"\bFROM\b", sql, re.IGNORECASE)
+
+
+def collect_queries():
+    """(static, dynamic): SELECT literals [(path, line, sql)] and f-string SELECTs [(path, line, parts)]."""
+
+    static, dynamic = [], []
+
+    for folder, dirs, files in os.walk(ROOT):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+
+        for file_name in sorted(files):
+            if not file_name.endswith(".py"):
+                continue
+
+            path = os.path.join(folder, file_name)
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=path)
+            relpath = os.path.relpath(path, ROOT)
+
+            # literal pieces of an f-string are handled with the f-string itself
+            fragments = {
+                id(part)
+                for node in ast.walk(tree) if isinstance(node, ast.JoinedStr)
+                for part in node.values
+            }
+
+            for node in ast.walk(tree):
+                if id(node) in fragments:
+                    continue
+
+                if isinstance(node, ast.Constant) and isinstance(node.value, str) and _is_select(node.value):
+                    static.append((relpath, node.lineno, node.value.strip()))
+
+                elif isinstance(node, ast.JoinedStr) and _is_select(" ".join(_literal_parts(node))):
+                    dynamic.append((relpath, node.lineno, _literal_parts(node)))
+
+    return static, dynamic
+
+
+def _renders(parts, sql):
+    # the rendered SQL contains every literal chunk of the f-string, in order
+    sql = " ".join(sql.split())
+    position = 0
+    for part in parts:
+        position = sql.find(part, position)
+        if position < 0:
+            return False
+        position += len(part)
+    return True
+
+
+def explain(sql, params=None):
+    sql = sql.rstrip().rstrip(";")
+    if params is None:
+        return execute_query("EXPLAIN " + sql.replace("%s", SAMPLE_PARAM))
+    return execute_query("EXPLAIN " + sql, params)
+
+
+def _hot_file(path):
+    return path.replace(os.sep, "/") not in OFFLINE_FILES
+
+
+if __name__ == "__main__":
+
+    static, dynamic = collect_queries()
+    rendered = render_dynamic_queries()
+
+    queries = [(path, line, sql, None, _hot_file(path)) for path, line, sql in static]
+    queries += [(path, line, sql, params, hot) for _, hot, path, line, sql, params in rendered]
+
+    unrendered = [
+        (path, line) for path, line, parts in dynamic
+        if not any(_renders(parts, sql) for *_, sql, _params in rendered)
+    ]
+
+    failed = 0
+    flagged = 0
+    skipped = 0
+
+    print(f"🔍 Explaining {len(queries)} queries ({len(rendered)} rendered from builders)...\n")
+
+    for path, line in unrendered:
+        skipped += 1
+        if _hot_file(path):
+            failed += 1
+            print(f"❌ {path}:{line}  dynamic SQL with no entry in query_builders()")
+        else:
+            print(f"⏭  {path}:{line}  dynamic SQL ({OFFLINE_FILES[path.replace(os.sep, '/')]})")
+
+    for path, line, sql, params, hot in queries:
+
+        first_line = " ".join(sql.split())[:90]
+        if line:
+            path = f"{path}:{line}"
+
+        try:
+            plan = explain(sql, params)
+        except Exception as e:
+            skipped += 1
+            failed += hot
+            print(f"{'❌' if hot else '⏭ '} {path}  not explainable: {e}")
+            continue
+
+        scans = [
+            f"{row.get('table')}: {FULL_SCAN_TYPES[row.get('type')]}"
+            for row in plan if row.get("type") in FULL_SCAN_TYPES
+        ]
+
+        if scans:
+            flagged += 1
+            failed += hot
+            print(f"{'❌' if hot else '⚠ '} {path}  {first_line}")
+            for scan in scans:
+                print(f"      {scan}")
+        else:
+            keys = ", ".join(str(row.get("key")) for row in plan)
+            print(f"✅ {path}  key: {keys}")
+
+    print(f"\n{flagged} full scan(s), {skipped} skipped, {failed} on hot paths, {len(queries)} total")
+
+    sys.exit(1 if failed else 0)
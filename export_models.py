@@ -0,0 +1,37 @@
+import os
+import sys
+from utils.inference import DETECTORS, detector_path
+
+# Export the YOLO detectors for the CPU runtimes in utils.inference.
+#   python export_models.py                    -> ONNX for every detector
+#   python export_models.py openvino           -> OpenVINO IR for every detector
+#   python export_models.py onnx traffic crowd -> selected detectors
+# Then pick a runtime with DETECTOR_BACKEND=onnx or DETECTOR_BACKEND_<MODEL>=openvino.
+
+FORMATS = ("onnx", "openvino")
+
+args = sys.argv[1:]
+fmt = args.pop(0) if args and args[0] in FORMATS else "onnx"
+names = args or list(DETECTORS)
+
+unknown = [n for n in names if n not in DETECTORS]
+if unknown:
+    print(f"❌ Unknown detector(s): {', '.join(unknown)}")
+    print(f"Available: {', '.join(DETECTORS)}")
+    sys.exit(1)
+
+from ultralytics import YOLO
+
+print(f"📦 Exporting {', '.join(names)} to {fmt}")
+
+for name in names:
+    # dynamic axes keep batched calls and the traffic page's imgsz=960 working
+    exported = YOLO(DETECTORS[name]).export(format=fmt, dynamic=True, half=False)
+
+    target = detector_path(name, fmt)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+
+    print(f"  ✅ {name}: {target}")
+
+print("✅ Export complete - check parity with: python benchmark_backends.py")
@@ -0,0 +1,25 @@
+import sys
+from utils.forecasting import forecast_aqi, forecast_traffic
+
+# Batch forecasts from stored history, meant to run hourly (cron / scheduler).
+# The dashboard only reads the tables these write; it never runs the LSTMs.
+#   python forecast_job.py            -> every forecast
+#   python forecast_job.py traffic    -> selected forecasts
+
+JOBS = {
+    "aqi": forecast_aqi,
+    "traffic": forecast_traffic
+}
+
+jobs = sys.argv[1:] or list(JOBS)
+
+unknown = [j for j in jobs if j not in JOBS]
+if unknown:
+    print(f"❌ Unknown forecast(s): {', '.join(unknown)}")
+    print(f"Available: {', '.join(JOBS)}")
+    sys.exit(1)
+
+for job in jobs:
+    print(f"🔮 Forecasting {job}...")
+    forecasts = JOBS[job]()
+    print(f"  ✅ {len(forecasts)} series forecast")
@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from utils.detections import Detections
+from utils.inference import DETECTORS, SEQUENCE_MODELS, load_local_model
+from utils.model_registry import registry
+
+# Shared model server for all Streamlit workers.
+#   python inference_server.py
+# then start Streamlit with INFERENCE_SERVER_URL=http://127.0.0.1:8600
+#
+# POST /detect/<detector>?conf=&imgsz=&h=&w=   body: raw BGR uint8 frame
+# POST /predict/<sequence model>               body: {"inputs": [...]}
+# GET  /metrics                                queue depth / batch stats per model
+# GET  /health
+
+HOST = os.getenv("INFERENCE_HOST", "127.0.0.1")
+PORT = int(os.getenv("INFERENCE_PORT", "8600"))
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+
+class DynamicBatcher:
+    """Collects requests for one model and runs them as a single batch.
+
+    A batch closes when it reaches MAX_BATCH items or MAX_WAIT_MS after its
+    first item arrived. Items with different settings (conf / imgsz) are
+    grouped so each model call uses one setting.
+    """
+
+    def __init__(self, name, run_batch, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.busy_seconds = 0.0
+
+        threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, key, payload):
+        future = Future()
+        self._queue.put((key, payload, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+
+            groups = {}
+            for key, payload, future in batch:
+                groups.setdefault(key, []).append((payload, future))
+
+            for key, items in groups.items():
+                started = time.monotonic()
+                try:
+                    outputs = self.run_batch(key, [payload for payload, _ in items])
+                    for (_, future), output in zip(items, outputs):
+                        future.set_result(output)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+
+                with self._lock:
+                    self.batches += 1
+                    self.items += len(items)
+                    self.max_seen_batch = max(self.max_seen_batch, len(items))
+                    self.busy_seconds += time.monotonic() - started
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_seen_batch,
+                "busy_seconds": round(self.busy_seconds, 3)
+            }
+
+
+def _detector_runner(name):
+    def run(key, frames):
+        conf, imgsz = key
+        model = load_local_model(name)
+
+        kwargs = {"conf": conf, "verbose": False}
+        if imgsz:
+            kwargs["imgsz"] = imgsz
+
+        return [Detections.from_ultralytics(r).to_dict() for r in model(frames, **kwargs)]
+    return run
+
+
+def _sequence_runner(name):
+    def run(key, inputs):
+        model = load_local_model(name)
+        sizes = [len(x) for x in inputs]
+        outputs = model.predict(np.concatenate(inputs, axis=0), verbose=0)
+
+        split = []
+        start = 0
+        for size in sizes:
+            split.append(outputs[start:start + size].tolist())
+            start += size
+        return split
+    return run
+
+
+BATCHERS = {}
+BATCHERS.update({name: DynamicBatcher(name, _detector_runner(name)) for name in DETECTORS})
+BATCHERS.update({name: DynamicBatcher(name, _sequence_runner(name)) for name in SEQUENCE_MODELS})
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            metrics = {name: b.metrics() for name, b in BATCHERS.items()}
+            metrics["model_registry"] = registry.stats()
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+
+        try:
+            if len(parts) == 2 and parts[0] == "detect" and parts[1] in DETECTORS:
+                query = parse_qs(url.query)
+                height = int(query["h"][0])
+                width = int(query["w"][0])
+                conf = float(query.get("conf", ["0.25"])[0])
+                imgsz = query.get("imgsz", [""])[0]
+                imgsz = int(imgsz) if imgsz else None
+
+                frame = np.frombuffer(self._read_body(), dtype=np.uint8).reshape(height, width, 3)
+                result = BATCHERS[parts[1]].submit((conf, imgsz), frame).result()
+                self._send_json(200, result)
+
+            elif len(parts) == 2 and parts[0] == "predict" and parts[1] in SEQUENCE_MODELS:
+                inputs = np.asarray(json.loads(self._read_body())["inputs"], dtype=np.float32)
+                outputs = BATCHERS[parts[1]].submit(None, inputs).result()
+                self._send_json(200, {"outputs": outputs})
+
+            else:
+                self._send_json(404, {"error": "unknown model"})
+
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+
+    print("🧠 Loading models...")
+    for name in list(DETECTORS) + list(SEQUENCE_MODELS):
+        load_local_model(name)
+        print(f"  ✅ {name}")
+
+    server = ThreadingHTTPServer((HOST, PORT), InferenceHandler)
+    print(f"🚀 Inference server listening on http://{HOST}:{PORT}")
+    server.serve_forever()
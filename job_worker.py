@@ -0,0 +1,47 @@
+import argparse
+import threading
+from utils.job_queue import JOB_WORKERS, job_queue, job_status
+
+# Runs the post-detection job queue (S3 upload, RDS inserts, alert emails,
+# system alerts) outside Streamlit.
+#   python job_worker.py                 -> work the queue until Ctrl+C
+#   python job_worker.py --workers 4
+#   python job_worker.py --status <job id>
+#   python job_worker.py --counts
+# Start Streamlit with JOB_QUEUE_INLINE_WORKERS=0 so pages only enqueue.
+
+parser = argparse.ArgumentParser(description="Background worker for detection side effects")
+parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+parser.add_argument("--status", metavar="JOB_ID")
+parser.add_argument("--counts", action="store_true", help="jobs per status")
+args = parser.parse_args()
+
+if args.status:
+    status = job_status(args.status)
+    if status is None:
+        print(f"❌ No job {args.status}")
+    else:
+        for name, value in status.items():
+            print(f"{name:>11}: {value}")
+
+elif args.counts:
+    for status, count in sorted(job_queue.counts().items()):
+        print(f"{status:>8}: {count}")
+
+else:
+    print(f"⚙️  {args.workers} worker(s) on {job_queue.path}")
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=job_queue.work, args=(stop,), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        print("Stopping...")
+        stop.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,26 @@
+import sys
+from utils.migrations import migrate, applied_versions, MIGRATIONS
+
+# Apply pending schema migrations.
+#   python migrate.py            -> latest
+#   python migrate.py 2          -> up to version 2
+#   python migrate.py --status   -> list applied / pending versions
+
+if "--status" in sys.argv:
+    done = applied_versions()
+    for version, name, _ in MIGRATIONS:
+        mark = "✅" if version in done else "⏳"
+        print(f"{mark} {version:03d} {name}")
+    sys.exit(0)
+
+target = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+print("🗄 Applying schema migrations...")
+
+applied = migrate(target)
+
+if not applied:
+    print("✅ Schema already up to date")
+
+for version, name in applied:
+    print(f"✅ {version:03d} {name}")
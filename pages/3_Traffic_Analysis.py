@@ -1,31 +1,30 @@
 import streamlit as st
 import datetime
-import joblib
-import numpy as np
 import time
 import cv2
 import tempfile
 import os
 from PIL import Image
-from tensorflow.keras.models import load_model
-from ultralytics import YOLO
-from utils.db import get_connection
-from utils.email_alert import send_email_alert
-from utils.s3_upload import upload_to_s3
-from utils.system_alerts import create_alert
-from utils.ui_components import app_footer
+from utils.inference import detect
+from utils.forecasting import congestion_level, latest_traffic_forecast
+from utils.video_pipeline import analyze_video, PreviewThrottle, FrameSampler, sampler_for
+from utils.result_cache import result_cache, CACHED_NOTICE
+from utils.detections import to_bgr
+from utils.postprocess import VEHICLE_CLASSES, count_classes
+from utils.job_queue import Job
+from utils.ui_components import app_footer, job_status_panel, track_job
 
 st.title("🚦 Traffic Analysis")
 
-# LOAD MODELS 
-@st.cache_resource
-def load_models():
-    yolo = YOLO("models/traffic_yolo_best.pt")
-    lstm = load_model("models/traffic_lstm.h5", compile=False)
-    scaler = joblib.load("models/traffic_scaler.pkl")
-    return yolo, lstm, scaler
+# frames decoded per video clip (env VIDEO_SAMPLER_<MODEL>=fps:N overrides)
+VIDEO_SAMPLER = sampler_for("traffic", FrameSampler.per_second(6))
+IMAGE_CONF = 0.05
+VIDEO_CONF = 0.05
+VIDEO_IMGSZ = 960
 
-yolo_model, lstm_model, scaler = load_models()
+# the YOLO model comes from the shared model registry (loaded once, hot-reloaded);
+# next-hour estimates are read from traffic_forecasts (forecast_job.py)
+AVG_SPEED_KMPH = {"low": 50, "medium": 30, "high": 15}
 
 current_hour = datetime.datetime.now().hour
 is_peak_hour = current_hour in [8, 9, 18, 19]
@@ -69,28 +68,41 @@ if run_btn:
     file_path = None
     status_messages = []
 
-    vehicle_classes = ["car", "bus", "truck", "motorbike", "bicycle"]
+    annotated = None
+
+    # RESULT CACHE (same file + model + settings -> same result)
+    is_image = traffic_file.type.startswith("image")
+    cache_key = result_cache.key(
+        traffic_file.getvalue(), "traffic",
+        conf=IMAGE_CONF if is_image else VIDEO_CONF,
+        sampler=None if is_image else VIDEO_SAMPLER,
+        imgsz=None if is_image else VIDEO_IMGSZ
+    )
+    hit = result_cache.get(cache_key)
+
+    if hit:
+        right.info(CACHED_NOTICE)
+
+        vehicle_count = hit.summary["vehicle_count"]
+
+        if hit.annotated is not None:
+            right.image(cv2.cvtColor(hit.annotated, cv2.COLOR_BGR2RGB), use_container_width=True)
+        else:
+            right.video(traffic_file.getvalue())
 
     # IMAGE 
-    if traffic_file.type.startswith("image"):
+    elif is_image:
 
-        image = Image.open(traffic_file)
+        image = to_bgr(Image.open(traffic_file))
 
-        results = yolo_model(image, conf=0.05)
+        detections = detect("traffic", image, conf=IMAGE_CONF)
 
-        plotted = results[0].plot()
-        plotted = cv2.cvtColor(plotted, cv2.COLOR_BGR2RGB)
+        annotated = detections.plot(image)
+        plotted = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
 
         right.image(plotted, use_container_width=True)
 
-        boxes = results[0].boxes
-        if boxes is not None and boxes.cls is not None:
-            class_ids = boxes.cls.cpu().numpy()
-            names = yolo_model.names
-
-            vehicle_count = sum(
-                1 for cid in class_ids if names[int(cid)] in vehicle_classes
-            )
+        vehicle_count = count_classes(detections, VEHICLE_CLASSES)
 
     # VIDEO 
     else:
@@ -101,80 +113,56 @@ if run_btn:
             tmp.write(traffic_file.read())
             file_path = tmp.name
 
-        cap = cv2.VideoCapture(file_path)
-
-        frame_skip = 5
-        frame_count = 0
-
         frame_placeholder = right.empty()
+        preview = PreviewThrottle()
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count += 1
-            if frame_count % frame_skip != 0:
-                continue
-
-            results = yolo_model(frame, conf=0.05, imgsz=960, verbose=False)
+        for result in analyze_video(file_path, "traffic", conf=VIDEO_CONF, imgsz=VIDEO_IMGSZ, sampler=VIDEO_SAMPLER):
 
-            boxes = results[0].boxes
+            detections = result.detections
 
-            detected_vehicles = 0
+            detected_vehicles = count_classes(detections, VEHICLE_CLASSES)
 
-            if boxes is not None and boxes.cls is not None:
-                class_ids = boxes.cls.cpu().numpy()
-                names = yolo_model.names
+            vehicle_count = max(vehicle_count, detected_vehicles)
 
-                detected_vehicles = sum(
-                    1 for cid in class_ids if names[int(cid)] in vehicle_classes
-                )
-
-                vehicle_count = max(vehicle_count, detected_vehicles)
-
-            annotated_frame = results[0].plot()
-            frame_placeholder.image(annotated_frame, channels="BGR")
-
-        cap.release()
+            if preview.ready():
+                annotated_frame = detections.plot(result.frame)
+                frame_placeholder.image(annotated_frame, channels="BGR")
 
     status_messages.append(f"🚗 Vehicles: {vehicle_count}")
 
-    # LSTM 
-    sequence = np.array([vehicle_count] * 24).reshape(24, 1)
-    scaled_sequence = scaler.transform(sequence)
-    X_input = scaled_sequence.reshape(1, 24, 1)
+    # NEXT HOUR: the junction's forecast from its real history, if the job has made one;
+    # without it the reading is graded on its own count with the same bands
+    forecast = latest_traffic_forecast(city, area)
 
-    predicted_scaled = lstm_model.predict(X_input, verbose=0)
-    predicted_value = scaler.inverse_transform(predicted_scaled)[0][0]
-
-    if predicted_value < 5:
-        congestion = "low"
-        avg_speed = 50
-    elif predicted_value < 10:
-        congestion = "medium"
-        avg_speed = 30
+    if forecast:
+        congestion = forecast["congestion_level"]
+        next_hour = f"{forecast['predicted_vehicles']}"
     else:
-        congestion = "high"
-        avg_speed = 15
+        congestion = congestion_level(vehicle_count)
+        next_hour = "no forecast yet"
+
+    avg_speed = AVG_SPEED_KMPH[congestion]
+
+    status_messages.append(f"📈 Next Hour: {next_hour} ({congestion})")
 
-    status_messages.append(f"📈 Next Hour: {int(predicted_value)} ({congestion})")
+    # BACKGROUND JOB (S3 -> RDS -> email -> alert), the page does not wait for it
+    job = Job("traffic")
 
     # S3 UPLOAD 
     if file_path:
         unique_name = f"traffic/{city}_{int(time.time())}_{traffic_file.name}"
-        image_url = upload_to_s3(file_path, unique_name)
+        job.upload(traffic_file, unique_name)
 
-        if image_url:
-            status_messages.append("☁ Stored in S3")
-        else:
-            status_messages.append("❌ S3 failed")
+        # videos are cached once their upload succeeded
+        job.cache_result(cache_key, {"vehicle_count": vehicle_count}, annotated=annotated)
+        status_messages.append("☁ S3 upload queued")
 
-    # SAVE TO RDS 
-    conn = get_connection()
-    cursor = conn.cursor()
+    # images are not uploaded
+    elif not hit:
+        result_cache.put(cache_key, {"vehicle_count": vehicle_count}, annotated=annotated)
 
-    cursor.execute("""
+    # SAVE TO RDS 
+    job.execute("""
     INSERT INTO traffic_data (
         timestamp, city, area, latitude, longitude,
         vehicle_count, avg_speed_kmph,
@@ -196,10 +184,11 @@ if run_btn:
         is_peak_hour
     ))
 
-    conn.commit()
-    conn.close()
+    job.rollup("traffic", city, congestion)
 
-    status_messages.append("💾 Stored in RDS")
+    job.invalidate("traffic_data")
+
+    status_messages.append("💾 RDS save queued")
 
     # EMAIL ALERT 
     if vehicle_count > 10:
@@ -208,23 +197,27 @@ if run_btn:
 
         email_body = f"""
 🚨 {congestion.upper()} congestion at {area}, {city} – {vehicle_count} vehicles detected.
-📈 Next hour estimate: {int(predicted_value)} vehicles | 🤖 This is an AI automated system alert.
+📈 Next hour estimate: {next_hour} vehicles | 🤖 This is an AI automated system alert.
 """
 
-        send_email_alert(
+        job.email(
             subject=email_subject,
-            message=email_body
+            message=email_body,
+            severity="high"
         )
 
-        create_alert(
+        job.alert(
             alert_type="traffic",
             location=f"{area}, {city}",
             severity="high",
-            message=f"High traffic congestion detected with {vehicle_count} vehicles. Next hour prediction: {int(predicted_value)}",
-            email_sent=True
+            message=f"High traffic congestion detected with {vehicle_count} vehicles. Next hour prediction: {next_hour}"
         )
 
-        status_messages.append("🚨 Alert email sent")
+        status_messages.append("🚨 Alert email queued")
+
+    job_id = job.submit()
+    track_job(job_id)
+    status_messages.append(f"🧾 Job {job_id}")
 
     # FINAL STATUS 
     msg = " | ".join(status_messages)
@@ -244,5 +237,6 @@ if run_btn:
             pass
 
 
+job_status_panel()
 
 app_footer()
\ No newline at end of file
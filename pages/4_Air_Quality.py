@@ -1,32 +1,21 @@
 import streamlit as st
 import datetime
 import numpy as np
-import joblib
-from tensorflow.keras.models import load_model
+from functools import partial
 from utils.db import get_connection
+from utils.inference import predict_sequence, load_scaler
+from utils.forecasting import STATIONS, aqi_to_category
 from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
+from utils.mailer import EMAIL_SENT, EMAIL_QUEUED
+from utils.system_alerts import create_alert, is_repeat_alert, mark_alert_emailed
+from utils.query_cache import invalidate_tables
 from utils.ui_components import app_footer
 
 st.title("🌫 Air Quality Prediction")
 
 # LOAD MODEL 
-model = load_model("models/aqi_lstm_model.h5", compile=False)
-scaler = joblib.load("models/aqi_scaler.pkl")
-
-# MONITORING STATIONS (INDIA)
-stations = [
-    "Anand Vihar - Delhi", "RK Puram - Delhi", "Punjabi Bagh - Delhi",
-    "Bandra Kurla Complex - Mumbai", "Worli - Mumbai",
-    "Alipore - Kolkata", "Ballygunge - Kolkata",
-    "Velachery - Chennai", "Adyar - Chennai", "Perungudi - Chennai",
-    "Anna Nagar - Chennai", "Manali - Chennai", "Tambaram - Chennai",
-    "Hebbal - Bengaluru", "BTM Layout - Bengaluru",
-    "Hyderabad Zoo Park", "Sanathnagar - Hyderabad",
-    "Lucknow Central", "Kanpur IIT",
-    "Jaipur Adarsh Nagar", "Ahmedabad Navrangpura",
-    "Chandigarh Sector 22", "Bhopal TT Nagar", "Patna Rajbansi Nagar"
-]
+# LSTM and scaler come from the shared model registry (loaded once, hot-reloaded)
+scaler = load_scaler("aqi_lstm")
 
 # INPUT SECTION 
 st.subheader("📍 Monitoring Location")
@@ -35,7 +24,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     city = st.text_input("City", placeholder="Eg : Chennai")
-    station = st.selectbox("Monitoring Station", stations)
+    station = st.selectbox("Monitoring Station", STATIONS)
     latitude = st.number_input("Latitude", value=13.0827, format="%.6f")
 
 with col2:
@@ -55,19 +44,6 @@ with col4:
     so2 = st.number_input("SO2")
     o3 = st.number_input("O3")
 
-#  AQI CATEGORY FUNCTION 
-def aqi_to_category(aqi):
-    if aqi <= 50:
-        return "Good"
-    elif aqi <= 100:
-        return "Moderate"
-    elif aqi <= 200:
-        return "Poor"
-    elif aqi <= 300:
-        return "Very Poor"
-    else:
-        return "Severe"
-
 # BUTTON 
 if st.button("Run AQI Analysis"):
 
@@ -80,7 +56,7 @@ if st.button("Run AQI Analysis"):
     scaled = scaler.transform(sequence)
     X = scaled[:, :-1].reshape(1, 72, 6)
 
-    predicted_scaled = model.predict(X)
+    predicted_scaled = predict_sequence("aqi_lstm", X)
 
     aqi_index = 6
     aqi_min = scaler.data_min_[aqi_index]
@@ -92,55 +68,73 @@ if st.button("Run AQI Analysis"):
     status_messages.append(f"AQI: {int(predicted_aqi)} ({category})")
 
     # SAVE TO RDS 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    INSERT INTO air_quality_data (
-        timestamp, city, monitoring_station,
-        latitude, longitude,
-        pm25, pm10, co, no2, so2, o3,
-        aqi, aqi_category
-    )
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        datetime.datetime.now(),
-        city,
-        station,
-        latitude,
-        longitude,
-        pm25, pm10, co, no2, so2, o3,
-        int(predicted_aqi),
-        category
-    ))
-
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        INSERT INTO air_quality_data (
+            timestamp, city, monitoring_station,
+            latitude, longitude,
+            pm25, pm10, co, no2, so2, o3,
+            aqi, aqi_category
+        )
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        """, (
+            datetime.datetime.now(),
+            city,
+            station,
+            latitude,
+            longitude,
+            pm25, pm10, co, no2, so2, o3,
+            int(predicted_aqi),
+            category
+        ))
+
+        conn.commit()
+
+    invalidate_tables("air_quality_data")
 
     status_messages.append("💾 Stored in RDS")
 
     # EMAIL ALERT 
     if category == "Severe":
-        send_email_alert(
-            subject="🚨 Severe Air Pollution Alert 🆘",
-            message=f"""
+        location = f"{city} - {station}"
+
+        # a repeat of the open alert for this station only bumps its counter
+        repeat = is_repeat_alert("pollution", location, "high")
+        email = None
+
+        if not repeat:
+            # a digested email flags the alert once the digest goes out
+            email = send_email_alert(
+                subject="🚨 Severe Air Pollution Alert 🆘",
+                message=f"""
 Severe AQI detected!
 
 📍 Location: {city} - {station}
 AQI: {int(predicted_aqi)}
 Take immediate action.
-"""
-        )
+""",
+                severity="high",
+                on_sent=partial(mark_alert_emailed, "pollution", location, "high")
+            )
 
         create_alert(
             alert_type="pollution",
-            location=f"{city} - {station}",
+            location=location,
             severity="high",
             message=f"Severe AQI detected: {int(predicted_aqi)}",
-            email_sent=True
+            email_sent=email == EMAIL_SENT
         )
 
-        status_messages.append("🚨 Alert email sent")
+        if repeat:
+            status_messages.append("🔁 Repeat alert counted")
+        elif email == EMAIL_SENT:
+            status_messages.append("🚨 Alert email sent")
+        elif email == EMAIL_QUEUED:
+            status_messages.append("📨 Alert email queued for digest")
+        else:
+            status_messages.append("⚠ Alert email failed")
 
     # FINAL NOTIFICATION 
     if category == "Severe":
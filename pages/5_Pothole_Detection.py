@@ -6,21 +6,21 @@ import os
 import tempfile
 import cv2
 from PIL import Image
-from ultralytics import YOLO
-from utils.db import get_connection
-from utils.s3_upload import upload_to_s3
-from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
-from utils.ui_components import app_footer
+from utils.inference import detect
+from utils.video_pipeline import analyze_video, frame_count, FrameSampler, sampler_for
+from utils.tracking import ByteTracker, CountStabilizer
+from utils.result_cache import result_cache, CACHED_NOTICE
+from utils.detections import to_bgr
+from utils.annotations import INSERT_ANNOTATIONS, annotation_rows
+from utils.job_queue import Job, ctx
+from utils.ui_components import app_footer, job_status_panel, track_job
 
 st.title("🛣 Pothole Detection")
 
-# LOAD MODEL 
-@st.cache_resource
-def load_model():
-    return YOLO("models/pothole_best.pt")
-
-model = load_model()
+# frames decoded per video clip (env VIDEO_SAMPLER_<MODEL>=fps:N overrides)
+VIDEO_SAMPLER = sampler_for("pothole", FrameSampler.per_second(4))
+IMAGE_CONF = 0.15
+VIDEO_CONF = 0.05
 
 # INPUT SECTION 
 st.subheader("📍 Location Details")
@@ -52,24 +52,43 @@ if st.button("🚀 Run Detection"):
     pothole_count = 0
     image_id = str(uuid.uuid4())
     temp_path = None
+    detections = None
+    annotated = None
+
+    # RESULT CACHE (same file + model + settings -> same result)
+    is_image = infra_file.type.startswith("image")
+    cache_key = result_cache.key(
+        infra_file.getvalue(), "pothole",
+        conf=IMAGE_CONF if is_image else VIDEO_CONF,
+        sampler=None if is_image else VIDEO_SAMPLER
+    )
+    hit = result_cache.get(cache_key)
+
+    if hit:
+        st.info(CACHED_NOTICE)
+
+        pothole_count = hit.summary["pothole_count"]
+        resolution = hit.summary["resolution"]
+        detections = hit.detections
+
+        if hit.annotated is not None:
+            st.image(cv2.cvtColor(hit.annotated, cv2.COLOR_BGR2RGB), use_container_width=True)
+        else:
+            st.video(infra_file.getvalue())
 
     # IMAGE 
-    if infra_file.type.startswith("image"):
+    elif is_image:
 
         image = Image.open(infra_file)
+        frame = to_bgr(image)
 
-        results = model(image, conf=0.15)
+        detections = detect("pothole", frame, conf=IMAGE_CONF)
 
-        plotted = results[0].plot()
-        plotted = cv2.cvtColor(plotted, cv2.COLOR_BGR2RGB)  # ✅ COLOR FIX
+        annotated = detections.plot(frame)
+        plotted = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)  # ✅ COLOR FIX
         st.image(plotted, use_container_width=True)
 
-        boxes = results[0].boxes
-        if boxes is not None:
-            pothole_count = len(boxes)
-
-        temp_path = f"temp_{int(time.time())}.jpg"
-        image.save(temp_path)
+        pothole_count = len(detections)
 
         resolution = f"{image.width}x{image.height}"
 
@@ -82,41 +101,44 @@ if st.button("🚀 Run Detection"):
             tfile.write(infra_file.read())
             temp_path = tfile.name
 
-        cap = cv2.VideoCapture(temp_path)
-
-        frame_skip = 5
-        frame_count = 0
+        # count each pothole once, not once per frame it appears in
+        tracker = ByteTracker(high_thresh=0.15, low_thresh=0.05)
+        stabilizer = CountStabilizer(patience=40, total_frames=frame_count(temp_path),
+                                     moving_camera=camera_source != "CCTV")
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
+        for result in analyze_video(temp_path, "pothole", conf=VIDEO_CONF, sampler=VIDEO_SAMPLER):
+            tracker.update(result.detections)
+            if stabilizer.stable(tracker, result.index):
                 break
 
-            frame_count += 1
-            if frame_count % frame_skip != 0:
-                continue
-
-            results = model(frame, conf=0.05)
-
-            boxes = results[0].boxes
-            if boxes is not None:
-                pothole_count += len(boxes)
-
-        cap.release()
+        pothole_count = tracker.unique_count
+        # one annotation per tracked pothole, at its most confident box
+        detections = tracker.objects(result.detections.names if tracker.frames else None)
 
         st.video(temp_path)
 
         resolution = "video"
 
+    # BACKGROUND JOB (S3 -> RDS -> email -> alert), the page does not wait for it
+    job = Job("pothole")
+
     # S3 UPLOAD
-    unique_name = f"potholes/{city}_{int(time.time())}_{infra_file.name}"
-    image_url = upload_to_s3(temp_path, unique_name)
+    if hit:
+        job.set(image_url=hit.image_url)
+    else:
+        unique_name = f"potholes/{city}_{int(time.time())}_{infra_file.name}"
+        job.upload(infra_file, unique_name)
+
+        # failed uploads are not cached, so the next attempt retries them
+        job.cache_result(
+            cache_key,
+            {"pothole_count": pothole_count, "resolution": resolution},
+            detections=detections,
+            annotated=annotated
+        )
 
     # SAVE TO RDS
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    job.execute("""
         INSERT INTO road_infra_images (
             image_id, image_url, captured_at, city,
             latitude, longitude, camera_source,
@@ -125,7 +147,7 @@ if st.button("🚀 Run Detection"):
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
     """, (
         image_id,
-        image_url,
+        ctx("image_url"),
         datetime.datetime.now(),
         city,
         latitude,
@@ -137,38 +159,21 @@ if st.button("🚀 Run Detection"):
         True
     ))
 
-    # SAVE ANNOTATIONS TO RDS
-    if pothole_count > 0 and infra_file.type.startswith("image"):
-
-        boxes = results[0].boxes
+    job.rollup("infra_image", city, road_type)
 
-        for box in boxes:
+    # SAVE ANNOTATIONS TO RDS (images and videos, one multi-row insert)
+    if pothole_count > 0 and detections is not None:
 
-            annotation_id = str(uuid.uuid4())
-            x, y, w, h = box.xywh[0].tolist()
-            confidence = float(box.conf[0])
+        job.executemany(INSERT_ANNOTATIONS, annotation_rows(image_id, detections, "pothole"))
 
-            cursor.execute("""
-                INSERT INTO road_infra_annotations (
-                    annotation_id, image_id, object_class,
-                    bbox_x, bbox_y, bbox_width, bbox_height, confidence
-                )
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                annotation_id,
-                image_id,
-                "pothole",
-                x, y, w, h,
-                confidence
-            ))
+        job.rollup("annotation", city, "pothole", count=len(detections))
 
-    conn.commit()
-    conn.close()
+    job.invalidate("road_infra_images", "road_infra_annotations")
 
     # EMAIL ALERT
     if pothole_count >= 3:
 
-        send_email_alert(
+        job.email(
             subject="🚨 Smart City Alert: Critical Road Damage Detected 🆘",
             message=f"""
             Smart City Infrastructure Monitoring System
@@ -192,17 +197,21 @@ if st.button("🚀 Run Detection"):
             This is an automated alert generated by the Smart City AI Platform.
 
             — Smart City AI Monitoring System
-            """
+            """,
+            severity="high"
         )
 
-        create_alert(
+        job.alert(
             alert_type="infra",
             location=f"{road_type}, {city}",
             severity="high",
-            message=f"{pothole_count} potholes detected",
-            email_sent=True
+            message=f"{pothole_count} potholes detected"
         )
 
+    job_id = job.submit()
+    track_job(job_id)
+    st.caption(f"🧾 Saving and alerts run in the background – job `{job_id}`")
+
     # FINAL STATUS
     if pothole_count >= 3:
 
@@ -228,5 +237,6 @@ if st.button("🚀 Run Detection"):
         os.remove(temp_path)
 
 
+job_status_panel()
 
 app_footer()
\ No newline at end of file
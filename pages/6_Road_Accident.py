@@ -6,21 +6,20 @@ import os
 import cv2
 import tempfile
 from PIL import Image
-from ultralytics import YOLO
-from utils.db import get_connection
-from utils.s3_upload import upload_to_s3
-from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
-from utils.ui_components import app_footer
+from utils.inference import detect
+from utils.video_pipeline import analyze_video, PreviewThrottle, FrameSampler, sampler_for
+from utils.result_cache import result_cache, CACHED_NOTICE
+from utils.detections import to_bgr
+from utils.postprocess import AccidentSummary
+from utils.job_queue import Job, ctx
+from utils.ui_components import app_footer, job_status_panel, track_job
 
 st.title("🚨 Road Accident Detection")
 
-# LOAD MODEL 
-@st.cache_resource
-def load_model():
-    return YOLO("models/accident_best.pt")
-
-model = load_model()
+# frames decoded per video clip (env VIDEO_SAMPLER_<MODEL>=fps:N overrides)
+VIDEO_SAMPLER = sampler_for("accident", FrameSampler.per_second(10))
+IMAGE_CONF = 0.10
+VIDEO_CONF = 0.60
 
 # INPUT SECTION 
 st.subheader("📍 Location Details")
@@ -52,54 +51,50 @@ if st.button("🚀 Run Detection"):
     max_conf = 0
     severity = None
     accident_detected = False
-
-# SEVERITY MAP 
-    severity_map = {
-        "no_accident": None,
-        "minor_damage": "low",
-        "moderate_damage": "medium",
-        "severe_accident": "high",
-        "total_loss": "high"
-    }
+    annotated = None
+    temp_path = None
+
+    # RESULT CACHE (same file + model + settings -> same result)
+    is_image = accident_file.type.startswith("image")
+    cache_key = result_cache.key(
+        accident_file.getvalue(), "accident",
+        conf=IMAGE_CONF if is_image else VIDEO_CONF,
+        sampler=None if is_image else VIDEO_SAMPLER
+    )
+    hit = result_cache.get(cache_key)
+
+    if hit:
+        st.info(CACHED_NOTICE)
+
+        accident_detected = hit.summary["accident_detected"]
+        severity = hit.summary["severity"]
+        vehicle_count = hit.summary["vehicle_count"]
+        max_conf = hit.summary["max_conf"]
+
+        if hit.annotated is not None:
+            st.image(cv2.cvtColor(hit.annotated, cv2.COLOR_BGR2RGB), use_container_width=True)
+        else:
+            st.video(accident_file.getvalue())
 
     # IMAGE
-    if accident_file.type.startswith("image"):
+    elif is_image:
 
         image = Image.open(accident_file)
+        frame = to_bgr(image)
 
-        results = model(image, conf=0.10, verbose=False)
+        detections = detect("accident", frame, conf=IMAGE_CONF)
 
-        plotted = results[0].plot()
-        plotted = cv2.cvtColor(plotted, cv2.COLOR_BGR2RGB)
+        annotated = detections.plot(frame)
+        plotted = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
         st.image(plotted, use_container_width=True)
 
-        boxes = results[0].boxes
-
-        names = model.names
-
-        if boxes is not None and len(boxes) > 0:
-            for box in boxes:
-                cls_id = int(box.cls[0])
-                class_name = names[cls_id]
-
-                mapped = severity_map.get(class_name)
-
-                if mapped:
-                    accident_detected = True
+        # severity / vehicles / confidence as array reductions (utils/postprocess.py)
+        verdict = AccidentSummary().update(detections)
 
-                if mapped == "high":
-                    severity = "high"
-                elif mapped == "medium" and severity != "high":
-                    severity = "medium"
-                elif mapped == "low" and severity not in ["high", "medium"]:
-                    severity = "low"
-
-                if class_name != "no_accident":
-                    vehicle_count += 1
-                max_conf = max(max_conf, float(box.conf[0]))
-
-        temp_path = f"temp_{time.time()}.jpg"
-        image.save(temp_path)
+        accident_detected = verdict.accident_detected
+        severity = verdict.severity
+        vehicle_count = verdict.vehicle_count
+        max_conf = verdict.max_conf
 
     # VIDEO  
     else:
@@ -110,56 +105,27 @@ if st.button("🚀 Run Detection"):
             tmp.write(accident_file.read())
             temp_path = tmp.name
 
-        cap = cv2.VideoCapture(temp_path)
-
         frame_placeholder = st.empty()
+        preview = PreviewThrottle()
 
-        frame_vehicle_count = 0
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            results = model(frame, conf=0.60, verbose=False)
-
-            boxes = results[0].boxes
+        verdict = AccidentSummary()
 
-            names = model.names
+        for result in analyze_video(temp_path, "accident", conf=VIDEO_CONF, sampler=VIDEO_SAMPLER):
 
-            if boxes is not None:
-                for box in boxes:
-                    cls_id = int(box.cls[0])
-                    class_name = names[cls_id]
+            detections = result.detections
 
-                    mapped = severity_map.get(class_name)
+            # worst severity, busiest frame and top confidence across the clip
+            verdict.update(detections)
 
-                    if mapped:
-                        accident_detected = True
+            if preview.ready():
+                annotated_frame = detections.plot(result.frame)
 
-                    if mapped == "high":
-                        severity = "high"
-                    elif mapped == "medium" and severity not in ["high"]:
-                        severity = "medium"
-                    elif mapped == "low" and severity not in ["high", "medium"]:
-                        severity = "low"
+                frame_placeholder.image(annotated_frame, channels="BGR")
 
-                    if class_name != "no_accident":
-                        frame_vehicle_count += 1
-                    max_conf = max(max_conf, float(box.conf[0]))
-
-            if boxes is not None and len(boxes) > 0:
-
-                if boxes.conf is not None and boxes.conf.numel() > 0:
-                    max_conf = max(max_conf, float(boxes.conf.max()))
-                vehicle_count = max(vehicle_count, frame_vehicle_count)
-                frame_vehicle_count = 0
-
-            annotated_frame = results[0].plot()
-
-            frame_placeholder.image(annotated_frame, channels="BGR")
-
-        cap.release()
+        accident_detected = verdict.accident_detected
+        severity = verdict.severity
+        vehicle_count = verdict.vehicle_count
+        max_conf = verdict.max_conf
 
     if not accident_detected:
         severity = "none"
@@ -174,17 +140,34 @@ if st.button("🚀 Run Detection"):
     else:
         response_time = 0
 
+    summary = {
+        "accident_detected": accident_detected,
+        "severity": severity,
+        "vehicle_count": vehicle_count,
+        "max_conf": max_conf
+    }
+
+    # nothing to upload for a clean frame, but the verdict is still worth caching
+    if not hit and severity == "none":
+        result_cache.put(cache_key, summary, annotated=annotated)
+
     if severity != "none":
+        # BACKGROUND JOB (S3 -> RDS -> email -> alert), the page does not wait for it
+        job = Job("accident")
+
         # S3 UPLOAD 
 
-        s3_key = f"accidents/{city}_{int(time.time())}_{accident_file.name}"
-        image_url = upload_to_s3(temp_path, s3_key)
+        if hit:
+            job.set(image_url=hit.image_url)
+        else:
+            s3_key = f"accidents/{city}_{int(time.time())}_{accident_file.name}"
+            job.upload(accident_file, s3_key)
 
-        # SAVE TO RDS 
-        conn = get_connection()
-        cursor = conn.cursor()
+            # failed uploads are not cached, so the next attempt retries them
+            job.cache_result(cache_key, summary, annotated=annotated)
 
-        cursor.execute("""
+        # SAVE TO RDS 
+        job.execute("""
             INSERT INTO road_infra_images (
                 image_id, image_url, captured_at, city,
                 latitude, longitude, resolution, annotated
@@ -192,7 +175,7 @@ if st.button("🚀 Run Detection"):
             VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
         """, (
             image_id,
-            image_url,
+            ctx("image_url"),
             datetime.datetime.now(),
             city,
             latitude,
@@ -201,7 +184,7 @@ if st.button("🚀 Run Detection"):
             True
         ))
 
-        cursor.execute("""
+        job.execute("""
             INSERT INTO accident_events (
                 accident_id, detected_at, image_id,
                 latitude, longitude, severity,
@@ -222,8 +205,10 @@ if st.button("🚀 Run Detection"):
             response_time
         ))
 
-        conn.commit()
-        conn.close()
+        job.rollup("infra_image", city, None)
+        job.rollup("accident", city, severity)
+
+        job.invalidate("road_infra_images", "accident_events")
 
         # EMAIL ALERT 
         if vehicle_count >= 1:
@@ -238,7 +223,7 @@ if st.button("🚀 Run Detection"):
                 subject = "ℹ Minor Road Incident Detected"
                 action = "⛑️Monitor the situation."
 
-            send_email_alert(
+            job.email(
                 subject=subject,
                 message=f"""
     SMART CITY – AI ACCIDENT ALERT 🆘
@@ -253,17 +238,21 @@ if st.button("🚀 Run Detection"):
     Estimated Response Time: {response_time} seconds
 
     {action}
-    """
+    """,
+                severity=severity
             )
 
-            create_alert(
+            job.alert(
                 alert_type="accident",
                 location=f"{city} ({latitude}, {longitude})",
                 severity=severity,
-                message=f"Accident detected involving {vehicle_count} vehicles",
-                email_sent=True
+                message=f"Accident detected involving {vehicle_count} vehicles"
             )
 
+        job_id = job.submit()
+        track_job(job_id)
+        st.caption(f"🧾 Saving and alerts run in the background – job `{job_id}`")
+
     # FINAL MESSAGE 
     if severity == "high":
         st.error(f"Major accident detected involving {vehicle_count} vehicles.")
@@ -274,8 +263,10 @@ if st.button("🚀 Run Detection"):
     else:
         st.success("No accident detected. Traffic conditions normal.")
 
-    os.remove(temp_path)
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
 
 
+job_status_panel()
 
 app_footer()
\ No newline at end of file
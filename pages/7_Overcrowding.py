@@ -3,24 +3,22 @@ import datetime
 import uuid
 import time
 import os
-import cv2
 import tempfile
 from PIL import Image
-from ultralytics import YOLO
-from utils.db import get_connection
-from utils.s3_upload import upload_to_s3
-from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
-from utils.ui_components import app_footer
+from utils.inference import detect
+from utils.video_pipeline import analyze_video, frame_count, FrameSampler, sampler_for
+from utils.tracking import ByteTracker, CountStabilizer
+from utils.result_cache import result_cache, CACHED_NOTICE
+from utils.detections import to_bgr
+from utils.job_queue import Job, ctx
+from utils.ui_components import app_footer, job_status_panel, track_job
 
 st.title("👥 Crowd Density Monitoring")
 
-# LOAD MODEL
-@st.cache_resource
-def load_model():
-    return YOLO("models/crowd_best.pt")
-
-model = load_model()
+# frames decoded per video clip (env VIDEO_SAMPLER_<MODEL>=fps:N overrides)
+VIDEO_SAMPLER = sampler_for("crowd", FrameSampler.per_second(4))
+IMAGE_CONF = 0.25
+VIDEO_CONF = 0.01
 
 # INPUT SECTION 
 st.subheader("📍 Location Details")
@@ -66,24 +64,42 @@ if st.button("🚀 Run Crowd Analysis"):
 
     person_count = 0
     max_conf = 0
+    annotated = None
+    temp_path = None
 
-    # IMAGE 
-    if crowd_file.type.startswith("image"):
+    # RESULT CACHE (same file + model + settings -> same result)
+    is_image = crowd_file.type.startswith("image")
+    cache_key = result_cache.key(
+        crowd_file.getvalue(), "crowd",
+        conf=IMAGE_CONF if is_image else VIDEO_CONF,
+        sampler=None if is_image else VIDEO_SAMPLER
+    )
+    hit = result_cache.get(cache_key)
 
-        image = Image.open(crowd_file)
-        results = model(image, conf=0.25)
+    if hit:
+        st.info(CACHED_NOTICE)
+
+        person_count = hit.summary["person_count"]
+        max_conf = hit.summary["max_conf"]
 
-        plotted = results[0].plot()
-        st.image(plotted, use_container_width=True)
+        if hit.annotated is not None:
+            st.image(hit.annotated, use_container_width=True)
+        else:
+            st.video(crowd_file.getvalue())
 
-        boxes = results[0].boxes
+    # IMAGE 
+    elif is_image:
+
+        image = Image.open(crowd_file)
+        frame = to_bgr(image)
+        detections = detect("crowd", frame, conf=IMAGE_CONF)
 
-        if boxes is not None:
-            person_count = len(boxes)
-            max_conf = float(boxes.conf.max())
+        annotated = detections.plot(frame)
+        st.image(annotated, use_container_width=True)
 
-        temp_path = f"temp_{time.time()}.jpg"
-        image.save(temp_path)
+        person_count = len(detections)
+        if person_count > 0:
+            max_conf = float(detections.conf.max())
 
     # VIDEO
     else:
@@ -94,41 +110,46 @@ if st.button("🚀 Run Crowd Analysis"):
             tmp.write(crowd_file.read())
             temp_path = tmp.name
 
-        cap = cv2.VideoCapture(temp_path)
-
-        frame_skip = 5
+        # count each person once, not once per frame they appear in
+        tracker = ByteTracker(high_thresh=0.25, low_thresh=0.01)
+        stabilizer = CountStabilizer(patience=20, total_frames=frame_count(temp_path))
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        for result in analyze_video(temp_path, "crowd", conf=VIDEO_CONF, sampler=VIDEO_SAMPLER):
 
-            if int(cap.get(1)) % frame_skip != 0:
-                continue
+            detections = result.detections
 
-            results = model(frame, conf=0.01)
+            tracker.update(detections)
+            if len(detections) > 0:
+                max_conf = max(max_conf, float(detections.conf.max()))
 
-            boxes = results[0].boxes
+            if stabilizer.stable(tracker, result.index):
+                break
 
-            if boxes is not None:
-                person_count += len(boxes)
-                if boxes.conf.numel() > 0:
-                    max_conf = max(max_conf, float(boxes.conf.max()))
+        person_count = tracker.unique_count
 
-        cap.release()
         st.video(temp_path)
 
     density = density_level(person_count)
 
+    # BACKGROUND JOB (S3 -> RDS -> email -> alert), the page does not wait for it
+    job = Job("crowd")
+
     # S3 UPLOAD
-    s3_key = f"crowd/{city}_{int(time.time())}_{crowd_file.name}"
-    image_url = upload_to_s3(temp_path, s3_key)
+    if hit:
+        job.set(image_url=hit.image_url)
+    else:
+        s3_key = f"crowd/{city}_{int(time.time())}_{crowd_file.name}"
+        job.upload(crowd_file, s3_key)
+
+        # failed uploads are not cached, so the next attempt retries them
+        job.cache_result(
+            cache_key,
+            {"person_count": person_count, "max_conf": max_conf},
+            annotated=annotated
+        )
 
     # SAVE TO RDS 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    job.execute("""
         INSERT INTO crowd_density_data (
             crowd_id, image_url, timestamp,
             city, location, latitude, longitude,
@@ -138,7 +159,7 @@ if st.button("🚀 Run Crowd Analysis"):
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
     """, (
         crowd_id,
-        image_url,
+        ctx("image_url"),
         datetime.datetime.now(),
         city,
         location,
@@ -150,13 +171,14 @@ if st.button("🚀 Run Crowd Analysis"):
         max_conf
     ))
 
-    conn.commit()
-    conn.close()
+    job.rollup("crowd", city, density)
+
+    job.invalidate("crowd_density_data")
 
     # EMAIL ALERT 
     if density in ["high", "extreme"]:
 
-        send_email_alert(
+        job.email(
             subject="🚨 Smart City Alert: High Crowd Density Detected 🆘",
             message=f"""
 Smart City Crowd Monitoring System
@@ -179,17 +201,21 @@ Recommended Action:
 Deploy crowd control measures and ensure public safety.
 
 This is an automated alert generated by the Smart City AI Platform.
-"""
+""",
+            severity="high" if density == "extreme" else "medium"
         )
 
-        create_alert(
+        job.alert(
             alert_type="crowd",
             location=f"{city} - {location} ({latitude}, {longitude})",
             severity="high" if density == "extreme" else "medium",
-            message=f"{density.capitalize()} crowd detected with {person_count} people",
-            email_sent=True
+            message=f"{density.capitalize()} crowd detected with {person_count} people"
         )
 
+    job_id = job.submit()
+    track_job(job_id)
+    st.caption(f"🧾 Saving and alerts run in the background – job `{job_id}`")
+
     # PROFESSIONAL OUTPUT 
     if density == "extreme":
         st.error(
@@ -214,8 +240,10 @@ This is an automated alert generated by the Smart City AI Platform.
             "Crowd levels are within safe limits. No immediate action required."
         )
 
-    os.remove(temp_path)
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
 
 
+job_status_panel()
 
 app_footer()
\ No newline at end of file
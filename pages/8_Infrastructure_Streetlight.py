@@ -3,24 +3,22 @@ import datetime
 import uuid
 import time
 import os
-import cv2
 import tempfile
 from PIL import Image
-from ultralytics import YOLO
-from utils.db import get_connection
-from utils.s3_upload import upload_to_s3
-from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
-from utils.ui_components import app_footer
+from utils.inference import detect
+from utils.video_pipeline import analyze_video, frame_count, FrameSampler, sampler_for
+from utils.tracking import ByteTracker, CountStabilizer
+from utils.result_cache import result_cache, CACHED_NOTICE
+from utils.detections import to_bgr
+from utils.job_queue import Job, ctx
+from utils.ui_components import app_footer, job_status_panel, track_job
 
 st.title("💡 Streetlight & Road Infrastructure Monitoring")
 
-# LOAD MODEL 
-@st.cache_resource
-def load_model():
-    return YOLO("models/streetlight_best.pt")  
-
-model = load_model()
+# frames decoded per video clip (env VIDEO_SAMPLER_<MODEL>=fps:N overrides)
+VIDEO_SAMPLER = sampler_for("streetlight", FrameSampler.per_second(3))
+IMAGE_CONF = 0.05
+VIDEO_CONF = 0.05
 
 # INPUT SECTION 
 st.subheader("📍 Location Details")
@@ -62,25 +60,42 @@ if st.button("🚀 Run Infrastructure Analysis"):
     image_id = str(uuid.uuid1())
     defect_count = 0
     max_conf = 0
+    annotated = None
+    temp_path = None
 
-    # IMAGE
-    if infra_file.type.startswith("image"):
+    # RESULT CACHE (same file + model + settings -> same result)
+    is_image = infra_file.type.startswith("image")
+    cache_key = result_cache.key(
+        infra_file.getvalue(), "streetlight",
+        conf=IMAGE_CONF if is_image else VIDEO_CONF,
+        sampler=None if is_image else VIDEO_SAMPLER
+    )
+    hit = result_cache.get(cache_key)
 
-        image = Image.open(infra_file)
-        results = model(image, conf=0.05)
+    if hit:
+        st.info(CACHED_NOTICE)
+
+        defect_count = hit.summary["defect_count"]
+        max_conf = hit.summary["max_conf"]
 
-        plotted = results[0].plot()
-        st.image(plotted, use_container_width=True)
+        if hit.annotated is not None:
+            st.image(hit.annotated, use_container_width=True)
+        else:
+            st.video(infra_file.getvalue())
 
-        boxes = results[0].boxes
+    # IMAGE
+    elif is_image:
+
+        image = Image.open(infra_file)
+        frame = to_bgr(image)
+        detections = detect("streetlight", frame, conf=IMAGE_CONF)
 
-        if boxes is not None:
-            defect_count = len(boxes)
-            if boxes is not None and boxes.conf is not None and boxes.conf.numel() > 0:
-                max_conf = float(boxes.conf.max())
+        annotated = detections.plot(frame)
+        st.image(annotated, use_container_width=True)
 
-        temp_path = f"temp_{time.time()}.jpg"
-        image.convert("RGB").save(temp_path)
+        defect_count = len(detections)
+        if defect_count > 0:
+            max_conf = float(detections.conf.max())
 
     # VIDEO 
     else:
@@ -91,41 +106,47 @@ if st.button("🚀 Run Infrastructure Analysis"):
             tmp.write(infra_file.read())
             temp_path = tmp.name
 
-        cap = cv2.VideoCapture(temp_path)
-
-        frame_skip = 5
+        # count each defect once, not once per frame it appears in
+        tracker = ByteTracker(high_thresh=0.25, low_thresh=0.05)
+        stabilizer = CountStabilizer(patience=30, total_frames=frame_count(temp_path),
+                                     moving_camera=camera_source != "CCTV")
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        for result in analyze_video(temp_path, "streetlight", conf=VIDEO_CONF, sampler=VIDEO_SAMPLER):
 
-            if int(cap.get(1)) % frame_skip != 0:
-                continue
+            detections = result.detections
 
-            results = model(frame, conf=0.05)
+            tracker.update(detections)
+            if len(detections) > 0:
+                max_conf = max(max_conf, float(detections.conf.max()))
 
-            boxes = results[0].boxes
+            if stabilizer.stable(tracker, result.index):
+                break
 
-            if boxes is not None:
-                defect_count += len(boxes)
-                if boxes.conf.numel() > 0:
-                    max_conf = max(max_conf, float(boxes.conf.max()))
+        defect_count = tracker.unique_count
 
-        cap.release()
         st.video(temp_path)
 
     priority = get_priority(defect_count)
 
+    # BACKGROUND JOB (S3 -> RDS -> email -> alert), the page does not wait for it
+    job = Job("streetlight")
+
     # S3 UPLOAD 
-    s3_key = f"infrastructure/{city}_{int(time.time())}_{infra_file.name}"
-    image_url = upload_to_s3(temp_path, s3_key)
+    if hit:
+        job.set(image_url=hit.image_url)
+    else:
+        s3_key = f"infrastructure/{city}_{int(time.time())}_{infra_file.name}"
+        job.upload(infra_file, s3_key)
+
+        # failed uploads are not cached, so the next attempt retries them
+        job.cache_result(
+            cache_key,
+            {"defect_count": defect_count, "max_conf": max_conf},
+            annotated=annotated
+        )
 
     # SAVE TO RDS 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    job.execute("""
         INSERT INTO road_infra_images (
             image_id, image_url, captured_at, city,
             latitude, longitude, camera_source,
@@ -134,7 +155,7 @@ if st.button("🚀 Run Infrastructure Analysis"):
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
     """, (
         image_id,
-        image_url,
+        ctx("image_url"),
         datetime.datetime.now(),
         city,
         latitude,
@@ -146,13 +167,14 @@ if st.button("🚀 Run Infrastructure Analysis"):
         True
     ))
 
-    conn.commit()
-    conn.close()
+    job.rollup("infra_image", city, "street_infra")
+
+    job.invalidate("road_infra_images")
 
     # EMAIL ALERT
     if priority == "high":
 
-        send_email_alert(
+        job.email(
             subject="🚨 Smart City Alert: Critical Infrastructure Failure 🆘",
             message=f"""
 Smart City Infrastructure Monitoring System
@@ -174,18 +196,20 @@ Recommended Action:
 Immediate maintenance crew deployment required.
 
 This is an automated alert from the Smart City AI Platform.
-"""
+""",
+            severity="high"
         )
 
-        create_alert(
+        job.alert(
             alert_type="infra",
             location=f"{city} - {area} ({latitude}, {longitude})",
             severity="high",
-            message=f"Critical infrastructure defects detected ({defect_count})",
-            email_sent=True
+            message=f"Critical infrastructure defects detected ({defect_count})"
         )
 
-        
+    job_id = job.submit()
+    track_job(job_id)
+    st.caption(f"🧾 Saving and alerts run in the background – job `{job_id}`")
 
     # PROFESSIONAL OUTPUT
     if priority == "high":
@@ -210,7 +234,10 @@ This is an automated alert from the Smart City AI Platform.
             "All monitored infrastructure assets are functioning normally."
         )
 
-    os.remove(temp_path)
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+
 
+job_status_panel()
 
 app_footer()
\ No newline at end of file
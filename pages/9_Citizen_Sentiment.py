@@ -2,25 +2,29 @@ import streamlit as st
 import datetime
 import uuid
 import nltk
+from functools import partial
 from nltk.sentiment import SentimentIntensityAnalyzer
 from utils.db import get_connection
 from utils.email_alert import send_email_alert
-from utils.system_alerts import create_alert
+from utils.mailer import EMAIL_SENT
+from utils.system_alerts import create_alert, is_repeat_alert, mark_alert_emailed
+from utils.query_cache import invalidate_tables
+from utils.rollups import bump_rollup
 from utils.ui_components import app_footer
+from utils.model_registry import registry
 from utils.db import execute_query
 
 st.title("🧾 Citizen Complaint Intelligence")
 
 # LOAD MODEL 
-@st.cache_resource
-def load_sia():
+def load_sia(_):
     try:
         nltk.data.find("sentiment/vader_lexicon")
     except:
         nltk.download("vader_lexicon")
     return SentimentIntensityAnalyzer()
 
-sia = load_sia()
+sia = registry.get("vader_sentiment", None, load_sia)
 
 #INPUT
 st.subheader("📍 Complaint Details")
@@ -100,63 +104,74 @@ if st.button("🚀 Analyze Complaint"):
 
     department = department_map[category]
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # INSERT COMPLAINT 
-    cursor.execute("""
-        INSERT INTO citizen_complaints (
-            created_at, city, category, complaint_text,
-            latitude, longitude, department, status, priority
-        )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        datetime.datetime.now(),
-        city,
-        category,
-        complaint_text,
-        latitude,
-        longitude,
-        department,
-        "open",
-        priority
-    ))
-
-    conn.commit()
-
-    complaint_id = cursor.lastrowid
-
-    if complaint_id == 0:
-        st.error("Failed to generate complaint ID. Check AUTO_INCREMENT.")
-        st.stop()
-
-    # INSERT NLP OUTPUT INTO RDS
-    cursor.execute("""
-        INSERT INTO complaint_nlp_analysis (
-            analysis_id, complaint_id, sentiment,
-            sentiment_score, emotion, topic, urgency_score
-        )
-        VALUES (%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        str(uuid.uuid1()),
-        complaint_id,
-        sentiment,
-        score,
-        "frustration" if sentiment == "negative" else "neutral",
-        category,
-        urgency
-    ))
-
-    conn.commit()
-    conn.close()
-
-    # EMAIL ALERT + SYSTEM ALERT 
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # INSERT COMPLAINT 
+        cursor.execute("""
+            INSERT INTO citizen_complaints (
+                created_at, city, category, complaint_text,
+                latitude, longitude, department, status, priority
+            )
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        """, (
+            datetime.datetime.now(),
+            city,
+            category,
+            complaint_text,
+            latitude,
+            longitude,
+            department,
+            "open",
+            priority
+        ))
+
+        complaint_id = cursor.lastrowid
+
+        bump_rollup(cursor, "complaint_category", city, category)
+
+        conn.commit()
+
+        if complaint_id == 0:
+            st.error("Failed to generate complaint ID. Check AUTO_INCREMENT.")
+            st.stop()
+
+        # INSERT NLP OUTPUT INTO RDS
+        cursor.execute("""
+            INSERT INTO complaint_nlp_analysis (
+                analysis_id, complaint_id, sentiment,
+                sentiment_score, emotion, topic, urgency_score
+            )
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+        """, (
+            str(uuid.uuid1()),
+            complaint_id,
+            sentiment,
+            score,
+            "frustration" if sentiment == "negative" else "neutral",
+            category,
+            urgency
+        ))
+
+        bump_rollup(cursor, "complaint_sentiment", city, sentiment)
+
+        conn.commit()
+
+    invalidate_tables("citizen_complaints", "complaint_nlp_analysis")
+
+    # EMAIL ALERT + SYSTEM ALERT (low priority is only logged, not raised as a system alert)
+    location = f"{city} ({latitude}, {longitude})"
 
     if priority == "high":
 
-        send_email_alert(
-            subject="🚨 Escalation: High-Priority Civic Issue Detected 🆘",
-            message=f"""
+        # a repeat of the open alert for this spot only bumps its counter
+        repeat = is_repeat_alert("infra", location, "high")
+        email = None
+
+        if not repeat:
+            email = send_email_alert(
+                subject="🚨 Escalation: High-Priority Civic Issue Detected 🆘",
+                message=f"""
     Smart City Command & Control Center
 
     A HIGH-PRIORITY civic complaint has been automatically escalated.
@@ -169,23 +184,30 @@ if st.button("🚀 Analyze Complaint"):
     {complaint_text}
 
     Immediate field inspection required.
-    """
-        )
+    """,
+                severity="high",
+                on_sent=partial(mark_alert_emailed, "infra", location, "high")
+            )
 
         create_alert(
             alert_type="infra",
-            location=f"{city} ({latitude}, {longitude})",
+            location=location,
             severity="high",
             message=f"High-priority civic complaint: {category}",
-            email_sent=True
+            email_sent=email == EMAIL_SENT
         )
 
 
     elif priority == "medium":
 
-        send_email_alert(
-            subject="📌 New Civic Complaint Assigned for Review",
-            message=f"""
+        # a repeat of the open alert for this spot only bumps its counter
+        repeat = is_repeat_alert("infra", location, "medium")
+        email = None
+
+        if not repeat:
+            email = send_email_alert(
+                subject="📌 New Civic Complaint Assigned for Review",
+                message=f"""
     Smart City Command & Control Center
 
     A complaint has been assigned to {department} for review.
@@ -194,15 +216,17 @@ if st.button("🚀 Analyze Complaint"):
     Category: {category}
 
     Action: Schedule inspection.
-    """
-        )
+    """,
+                severity="medium",
+                on_sent=partial(mark_alert_emailed, "infra", location, "medium")
+            )
 
         create_alert(
             alert_type="infra",
-            location=f"{city} ({latitude}, {longitude})",
+            location=location,
             severity="medium",
             message=f"Medium-priority civic complaint: {category}",
-            email_sent=True
+            email_sent=email == EMAIL_SENT
         )
 
 
@@ -217,15 +241,8 @@ if st.button("🚀 Analyze Complaint"):
 
     City: {city}
     Category: {category}
-    """
-        )
-
-        create_alert(
-            alert_type="infra",
-            location=f"{city} ({latitude}, {longitude})",
-            severity="low",
-            message=f"Low-priority civic complaint: {category}",
-            email_sent=True
+    """,
+            severity="low"
         )
 
     # OUTPUT 
@@ -0,0 +1,332 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+import numpy as np
+from utils.db import execute_query, hour_window, window_condition
+from utils.detections import Detections
+from utils.forecasting import (
+    AQI_COLUMN, AQI_HISTORY_HOURS, POLLUTANTS, STATIONS, TRAFFIC_HISTORY_HOURS, aqi_history, hourly_windows
+)
+from utils.inference import DETECTORS, SEQUENCE_MODELS, detector_path, load_local_model, load_scaler
+from utils.quantization import QUANT_REPORT, int8_path, load_report
+from utils.tracking import iou_matrix, greedy_match
+from utils.video_pipeline import load_sample_frames
+
+# Build INT8 variants of the detectors and LSTMs and measure what they cost.
+#   python quantize_models.py --source clips/                   -> every model
+#   python quantize_models.py --source clips/ traffic aqi_lstm  -> selected models
+#   python quantize_models.py aqi_lstm traffic_lstm --days 30   -> LSTMs need no frames
+#
+# Detectors: static INT8 (QDQ) quantization of the exported ONNX, calibrated on
+# raw camera frames (run export_models.py first). --source must be real footage,
+# not the annotated screenshots under assets/.
+# LSTMs: TFLite INT8 calibrated on hourly windows of stored readings, built per
+# monitoring station / junction the way utils/forecasting.py builds them.
+# The tail of the frames (and of each series' hours) is held out: the accuracy
+# delta is measured on data the calibration never saw.
+# Results go to models/quantization_report.json; pages switch to a quantized
+# model through INT8_BUDGET / INT8_BUDGET_<MODEL> (utils/quantization.py).
+
+IMGSZ = 640
+MATCH_IOU = 0.5  # detections agree when boxes overlap this much with the same class
+
+EVAL_FRACTION = 0.3
+MIN_CALIBRATION_SAMPLES = 20
+MIN_EVAL_SAMPLES = 10
+
+
+def split_samples(samples, eval_fraction, what):
+    # calibration from the head, evaluation from the tail: consecutive frames of a
+    # clip are near-duplicates, so interleaving would leak calibration data
+    held_out = int(round(len(samples) * eval_fraction))
+    calibration, evaluation = samples[:len(samples) - held_out], samples[len(samples) - held_out:]
+
+    if len(calibration) < MIN_CALIBRATION_SAMPLES or len(evaluation) < MIN_EVAL_SAMPLES:
+        raise ValueError(
+            f"{len(samples)} {what} split into {len(calibration)} calibration / {len(evaluation)} evaluation; "
+            f"need at least {MIN_CALIBRATION_SAMPLES} / {MIN_EVAL_SAMPLES}"
+        )
+    return calibration, evaluation
+
+
+# DETECTORS
+def _letterbox(frame, size=IMGSZ):
+    # same resize + grey padding ultralytics applies before the network
+    import cv2
+
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    resized = cv2.resize(frame, (round(width * ratio), round(height * ratio)), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+
+    rgb = canvas[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(rgb, dtype=np.float32)[None] / 255.0
+
+
+def quantize_detector(name, frames):
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    source = detector_path(name, "onnx")
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"{source} not found - run: python export_models.py onnx {name}")
+
+    input_name = ort.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: _letterbox(frame)}
+
+    quantize_static(
+        source,
+        int8_path(DETECTORS[name]),
+        FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+
+def _agreement(reference, candidate):
+    # F1 of candidate detections against the fp32 ones
+    scores = iou_matrix(reference.xyxy, candidate.xyxy)
+    if scores.size:
+        scores[reference.cls[:, None] != candidate.cls[None, :]] = 0
+
+    matched = len(greedy_match(scores, MATCH_IOU)[0])
+    total = len(reference) + len(candidate)
+    return 1.0 if total == 0 else 2 * matched / total
+
+
+def _time_detector(model, frames, conf):
+    outputs, timings = [], []
+
+    model(frames[0], conf=conf, verbose=False)  # warm-up
+    for frame in frames:
+        started = time.perf_counter()
+        result = model(frame, conf=conf, verbose=False)[0]
+        timings.append((time.perf_counter() - started) * 1000)
+        outputs.append(Detections.from_ultralytics(result))
+
+    return outputs, float(np.median(timings))
+
+
+def evaluate_detector(name, frames, conf):
+    fp32, fp32_ms = _time_detector(load_local_model(name, "torch"), frames, conf)
+    int8, int8_ms = _time_detector(load_local_model(name, "int8"), frames, conf)
+
+    agreement = float(np.mean([_agreement(r, c) for r, c in zip(fp32, int8)]))
+
+    return {
+        "kind": "detector",
+        "metric": "1 - F1 agreement with fp32 detections",
+        "accuracy_delta": round(1 - agreement, 4),
+        "fp32_ms": round(fp32_ms, 2),
+        "int8_ms": round(int8_ms, 2)
+    }
+
+
+# LSTMs
+# series(scaler, hours) -> scaled (n_series, hours, features) hourly history,
+# one series per junction / monitoring station
+def traffic_series(scaler, hours):
+    end = hour_window()[1]
+    cond, params = window_condition("timestamp", (end - datetime.timedelta(hours=hours), end))
+    rows = execute_query(f"""
+    SELECT city, area, timestamp, vehicle_count
+    FROM traffic_data
+    WHERE {cond}
+    """, params)
+
+    _, history, _ = hourly_windows(rows, ["city", "area"], ["vehicle_count"], end, hours)
+    return scaler.transform(history.reshape(-1, 1)).reshape(history.shape)
+
+
+def aqi_series(scaler, hours):
+    end = hour_window()[1]
+    rows = aqi_history(STATIONS, end, hours)
+
+    _, history, _ = hourly_windows(rows, ["monitoring_station"], POLLUTANTS + ["aqi"], end, hours)
+    scaled = scaler.transform(history.reshape(-1, history.shape[2])).reshape(history.shape)
+    return scaled[:, :, :AQI_COLUMN]
+
+
+SEQUENCE_SOURCES = {
+    "traffic_lstm": (traffic_series, TRAFFIC_HISTORY_HOURS),
+    "aqi_lstm": (aqi_series, AQI_HISTORY_HOURS)
+}
+
+
+def sequence_windows(series, length, limit):
+    # sliding windows inside one series at a time, never across two stations /
+    # junctions, plus each hour repeated over a window (what the pages feed);
+    # thinned evenly to at most `limit`
+    repeated = [np.repeat(s[i][None], length, axis=0) for s in series for i in range(s.shape[0])]
+    sliding = [s[i:i + length] for s in series for i in range(s.shape[0] - length + 1)]
+
+    windows = np.asarray(repeated + sliding, dtype=np.float32).reshape(-1, length, series.shape[2])
+    if len(windows) > limit:
+        windows = windows[np.linspace(0, len(windows) - 1, limit).astype(int)]
+    return windows
+
+
+def split_series(series, length, eval_fraction):
+    # hold out the most recent hours of every series; each part must fit a full window
+    hours = series.shape[1]
+    cut = hours - int(round(hours * eval_fraction))
+
+    if len(series) == 0:
+        raise ValueError("no stored readings to calibrate on")
+    if cut < length or hours - cut < length:
+        raise ValueError(
+            f"{hours} hours of history split into {cut} calibration / {hours - cut} evaluation hours; "
+            f"each needs at least {length} - raise --days"
+        )
+    return series[:, :cut], series[:, cut:]
+
+
+def quantize_sequence(name, sequences):
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    model = load_model(SEQUENCE_MODELS[name], compile=False)
+    _, length, features = model.input_shape
+
+    # fixed batch of one: TFLite cannot quantize the LSTM with a dynamic batch
+    concrete = tf.function(lambda x: model(x)).get_concrete_function(
+        tf.TensorSpec([1, length, features], tf.float32)
+    )
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: ([s[None]] for s in sequences)
+    # INT8 kernels where they exist, float fallback for the rest; I/O stays float
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+        tf.lite.OpsSet.TFLITE_BUILTINS
+    ]
+
+    with open(int8_path(SEQUENCE_MODELS[name]), "wb") as f:
+        f.write(converter.convert())
+
+
+def evaluate_sequence(name, sequences):
+    from tensorflow.keras.models import load_model
+    from utils.quantization import TFLiteModel
+
+    fp32 = load_model(SEQUENCE_MODELS[name], compile=False)
+    int8 = TFLiteModel(int8_path(SEQUENCE_MODELS[name]))
+
+    def timed(model):
+        model.predict(sequences[:1], verbose=0)  # warm-up
+        started = time.perf_counter()
+        outputs = np.concatenate([model.predict(s[None], verbose=0) for s in sequences])
+        return outputs, (time.perf_counter() - started) * 1000 / len(sequences)
+
+    reference, fp32_ms = timed(fp32)
+    quantized, int8_ms = timed(int8)
+
+    return {
+        "kind": "sequence",
+        # outputs are min-max scaled, so this is a fraction of the target's range
+        "metric": "mean absolute error vs fp32, scaled units",
+        "accuracy_delta": round(float(np.mean(np.abs(reference - quantized))), 4),
+        "fp32_ms": round(fp32_ms, 2),
+        "int8_ms": round(int8_ms, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate INT8 model variants")
+    parser.add_argument("models", nargs="*", default=list(DETECTORS) + list(SEQUENCE_MODELS))
+    parser.add_argument("--source", help="raw camera frames: image folder, image or video (required for detectors)")
+    parser.add_argument("--frames", type=int, default=100, help="frames to load, calibration + evaluation")
+    parser.add_argument("--eval-fraction", type=float, default=EVAL_FRACTION,
+                        help="share of the frames / history hours held out for evaluation")
+    parser.add_argument("--sequences", type=int, default=500, help="max sequences per split")
+    parser.add_argument("--days", type=int, default=14, help="days of stored readings for the LSTMs")
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    unknown = [m for m in args.models if m not in DETECTORS and m not in SEQUENCE_MODELS]
+    if unknown:
+        print(f"❌ Unknown model(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    calibration_frames, eval_frames = [], []
+    if any(name in DETECTORS for name in args.models):
+        if not args.source:
+            parser.error("--source is required to quantize detectors")
+        try:
+            calibration_frames, eval_frames = split_samples(
+                load_sample_frames(args.source, args.frames), args.eval_fraction, f"frames in {args.source}"
+            )
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    report = dict(load_report())
+    failed = []
+
+    for name in args.models:
+        print(f"⚙️  {name}")
+
+        try:
+            if name in DETECTORS:
+                quantize_detector(name, calibration_frames)
+                entry = evaluate_detector(name, eval_frames, args.conf)
+                entry["samples"] = len(eval_frames)
+                entry["calibration_samples"] = len(calibration_frames)
+
+            else:
+                build, length = SEQUENCE_SOURCES[name]
+                calibration, evaluation = split_series(
+                    build(load_scaler(name), args.days * 24), length, args.eval_fraction
+                )
+                calibration = sequence_windows(calibration, length, args.sequences)
+                evaluation = sequence_windows(evaluation, length, args.sequences)
+
+                quantize_sequence(name, calibration)
+                entry = evaluate_sequence(name, evaluation)
+                entry["samples"] = len(evaluation)
+                entry["calibration_samples"] = len(calibration)
+
+        except Exception as e:
+            print(f"  ❌ {e}")
+            failed.append(name)
+            continue
+
+        entry["int8_path"] = int8_path(DETECTORS.get(name) or SEQUENCE_MODELS[name])
+        entry["speedup"] = round(entry["fp32_ms"] / entry["int8_ms"], 2) if entry["int8_ms"] else None
+        entry["created_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        report[name] = entry
+
+        print(
+            f"  ✅ delta {entry['accuracy_delta']:.4f} ({entry['metric']})  "
+            f"fp32 {entry['fp32_ms']} ms -> int8 {entry['int8_ms']} ms  x{entry['speedup']}"
+        )
+
+    with open(QUANT_REPORT, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📝 Report written to {QUANT_REPORT}")
+    print("Enable per model with INT8_BUDGET_<MODEL>=<max delta>, e.g. INT8_BUDGET_CROWD=0.03")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
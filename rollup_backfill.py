@@ -0,0 +1,23 @@
+import sys
+from utils.rollups import backfill_rollups, BACKFILL_QUERIES
+
+# Rebuild metric_rollup from the raw event tables.
+#   python rollup_backfill.py                 -> every metric
+#   python rollup_backfill.py traffic crowd   -> selected metrics
+
+metrics = sys.argv[1:] or list(BACKFILL_QUERIES)
+
+unknown = [m for m in metrics if m not in BACKFILL_QUERIES]
+if unknown:
+    print(f"❌ Unknown metric(s): {', '.join(unknown)}")
+    print(f"Available: {', '.join(BACKFILL_QUERIES)}")
+    sys.exit(1)
+
+print(f"📊 Rebuilding rollups: {', '.join(metrics)}")
+
+rebuilt = backfill_rollups(metrics)
+
+for metric, rows in rebuilt.items():
+    print(f"  {metric}: {rows} rollup rows")
+
+print("✅ Rollups rebuilt successfully")
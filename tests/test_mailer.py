@@ -0,0 +1,227 @@
+import smtplib
+import time
+import pytest
+from utils import mailer as mailer_module
+from utils.mailer import EMAIL_QUEUED, EMAIL_SENT, Mailer, RateLimiter, SMTPPool
+
+# SMTPPool / RateLimiter / digest tests against an in-process fake of
+# smtplib.SMTP, so nothing leaves the machine:
+#   python -m pytest tests
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; every connection is recorded in `servers`."""
+
+    servers = []
+    failing_sends = 0  # the next n sendmail() calls raise SMTPServerDisconnected
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.noops = 0
+        self.alive = True
+        self.closed = False
+        FakeSMTP.servers.append(self)
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        self.noops += 1
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        return 250, b"OK"
+
+    def sendmail(self, sender, recipient, message):
+        if FakeSMTP.failing_sends > 0:
+            FakeSMTP.failing_sends -= 1
+            self.alive = False
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        self.sent.append((recipient, message))
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.servers = []
+    FakeSMTP.failing_sends = 0
+    monkeypatch.setattr(mailer_module.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(mailer_module, "SMTP_SSL", False)
+    monkeypatch.setattr(mailer_module, "SMTP_LOGIN", False)
+    monkeypatch.setenv("ALERT_EMAIL", "alerts@example.com")
+    monkeypatch.setenv("SENDER_EMAIL", "ops@example.com")
+    return FakeSMTP
+
+
+def make_mailer(digest_seconds=0, **pool_options):
+    return Mailer(SMTPPool(**pool_options), RateLimiter(limit=0), digest_seconds=digest_seconds)
+
+
+def sent_messages():
+    return [message for server in FakeSMTP.servers for message in server.sent]
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+# SMTP POOL
+def test_pool_reuses_one_session():
+    mailer = make_mailer()
+    for i in range(5):
+        mailer.send(f"subject {i}", "body")
+
+    stats = mailer.pool.stats()
+    assert len(FakeSMTP.servers) == 1
+    assert stats["logins"] == 1
+    assert stats["reused"] == 4
+    assert len(sent_messages()) == 5
+
+
+def test_pool_reaps_idle_sessions():
+    pool = SMTPPool(idle_seconds=0.05)
+    first = pool.acquire()
+    pool.release(first)
+
+    time.sleep(0.1)
+    second = pool.acquire()
+
+    assert second is not first
+    assert first.closed
+    assert pool.stats()["open"] == 1
+
+
+def test_noop_check_replaces_dropped_session():
+    pool = SMTPPool(noop_after=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.alive = False
+
+    second = pool.acquire()
+
+    assert first.noops == 1
+    assert first.closed
+    assert second is not first
+    assert pool.stats()["open"] == 1
+
+
+def test_noop_skipped_for_recently_used_session():
+    pool = SMTPPool(noop_after=60)
+    first = pool.acquire()
+    pool.release(first)
+
+    assert pool.acquire() is first
+    assert first.noops == 0
+
+
+def test_broken_session_gets_one_fresh_retry():
+    mailer = make_mailer()
+    mailer.send("warm-up", "body")
+
+    FakeSMTP.failing_sends = 1
+    mailer.send("after drop", "body")
+
+    assert len(FakeSMTP.servers) == 2
+    assert FakeSMTP.servers[0].closed
+    assert len(FakeSMTP.servers[1].sent) == 1
+    assert mailer.pool.stats()["open"] == 1
+
+
+def test_send_raises_when_the_retry_fails_too():
+    mailer = make_mailer()
+    FakeSMTP.failing_sends = 2
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        mailer.send("subject", "body")
+
+    assert mailer.pool.stats()["open"] == 0
+    assert mailer.sent == 0
+
+
+# RATE LIMITER
+def test_rate_limiter_waits_for_a_free_slot():
+    limiter = RateLimiter(limit=2, period=0.2)
+
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+
+    assert time.monotonic() - started >= 0.18
+
+
+def test_rate_limiter_disabled_with_zero_limit():
+    limiter = RateLimiter(limit=0, period=60)
+
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.wait()
+
+    assert time.monotonic() - started < 0.1
+
+
+# DIGEST MODE
+def test_alert_without_digest_is_sent_immediately():
+    mailer = make_mailer()
+
+    assert mailer.alert("subject", "body", severity="high") == EMAIL_SENT
+    assert len(sent_messages()) == 1
+
+
+def test_digest_merges_alerts_and_reports_delivery():
+    mailer = make_mailer(digest_seconds=0.05)
+    delivered = []
+
+    results = [
+        mailer.alert(f"alert {i}", "body", severity="high", on_sent=lambda i=i: delivered.append(i))
+        for i in range(3)
+    ]
+
+    assert results == [EMAIL_QUEUED] * 3
+    assert sent_messages() == []
+    assert delivered == []
+
+    assert wait_until(lambda: len(delivered) == 3)
+    messages = sent_messages()
+    assert len(messages) == 1
+    assert "[1] alert 0" in messages[0][1]
+    assert "[3] alert 2" in messages[0][1]
+    assert mailer.stats()["digest_waiting"] == 0
+
+
+def test_failed_digest_is_requeued_and_retried():
+    mailer = make_mailer(digest_seconds=0.05)
+    delivered = []
+    FakeSMTP.failing_sends = 2  # the first flush fails on both sessions
+
+    mailer.alert("alert", "body", severity="high", on_sent=lambda: delivered.append(True))
+
+    assert wait_until(lambda: delivered == [True])
+    stats = mailer.stats()
+    assert stats["failed_flushes"] == 1
+    assert stats["dropped"] == 0
+    assert len(sent_messages()) == 1
+
+
+def test_digest_dropped_after_retries(monkeypatch):
+    monkeypatch.setattr(mailer_module, "EMAIL_FLUSH_RETRIES", 2)
+    mailer = make_mailer(digest_seconds=0.05)
+    delivered = []
+    FakeSMTP.failing_sends = 10**6
+
+    mailer.alert("alert", "body", severity="high", on_sent=lambda: delivered.append(True))
+
+    assert wait_until(lambda: mailer.stats()["dropped"] == 1)
+    stats = mailer.stats()
+    assert stats["failed_flushes"] == 2
+    assert stats["digest_waiting"] == 0
+    assert "SMTPServerDisconnected" in stats["last_error"]
+    assert delivered == []
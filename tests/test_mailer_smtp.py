@@ -0,0 +1,129 @@
+import socket
+import time
+import pytest
+from utils import mailer as mailer_module
+from utils.mailer import EMAIL_QUEUED, EMAIL_SENT, Mailer, RateLimiter, SMTPPool
+
+# The same SMTPPool / Mailer paths as test_mailer.py, but through real smtplib
+# against a local aiosmtpd server, so the SMTP conversation itself is covered:
+#   pip install aiosmtpd
+#   python -m pytest tests
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+SERVER_IDLE_TIMEOUT = 0.3  # the server hangs up on sessions idle this long, like Gmail does
+
+
+class Inbox:
+    """aiosmtpd handler keeping every message it accepts."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode("utf-8", "replace")))
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def inbox(monkeypatch):
+    inbox = Inbox()
+    port = free_port()
+    controller = controller_module.Controller(inbox, hostname="127.0.0.1", port=port, timeout=SERVER_IDLE_TIMEOUT)
+    controller.start()
+
+    monkeypatch.setattr(mailer_module, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(mailer_module, "SMTP_PORT", port)
+    monkeypatch.setattr(mailer_module, "SMTP_SSL", False)
+    monkeypatch.setattr(mailer_module, "SMTP_LOGIN", False)
+    monkeypatch.setenv("ALERT_EMAIL", "alerts@example.com")
+    monkeypatch.setenv("SENDER_EMAIL", "ops@example.com")
+
+    yield inbox
+    controller.stop()
+
+
+def make_mailer(digest_seconds=0, **pool_options):
+    return Mailer(SMTPPool(**pool_options), RateLimiter(limit=0), digest_seconds=digest_seconds)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_pooled_session_delivers_every_message(inbox):
+    mailer = make_mailer()
+    for i in range(3):
+        mailer.send(f"subject {i}", f"body {i}")
+
+    stats = mailer.pool.stats()
+    assert stats["logins"] == 1
+    assert stats["reused"] == 2
+    assert len(inbox.messages) == 3
+    assert inbox.messages[0][0] == ["ops@example.com"]
+    assert "Subject: subject 2" in inbox.messages[2][1]
+    mailer.pool.close_all()
+
+
+def test_session_dropped_by_server_is_retried_on_a_new_one(inbox):
+    mailer = make_mailer(noop_after=60)  # no NOOP check: sendmail hits the dead session
+    mailer.send("before", "body")
+
+    time.sleep(SERVER_IDLE_TIMEOUT * 2)
+    mailer.send("after", "body")
+
+    assert len(inbox.messages) == 2
+    assert mailer.pool.stats()["logins"] == 2
+    assert mailer.pool.stats()["open"] == 1
+    mailer.pool.close_all()
+
+
+def test_noop_check_replaces_session_dropped_by_server(inbox):
+    pool = SMTPPool(noop_after=0)
+    first = pool.acquire()
+    pool.release(first)
+
+    time.sleep(SERVER_IDLE_TIMEOUT * 2)
+    second = pool.acquire()
+
+    assert second is not first
+    assert second.noop()[0] == 250
+    assert pool.stats()["open"] == 1
+    pool.release(second)
+    pool.close_all()
+
+
+def test_alert_without_digest_is_delivered(inbox):
+    mailer = make_mailer()
+
+    assert mailer.alert("subject", "body", severity="high") == EMAIL_SENT
+    assert len(inbox.messages) == 1
+    mailer.pool.close_all()
+
+
+def test_digest_arrives_as_one_message(inbox):
+    mailer = make_mailer(digest_seconds=0.05)
+    delivered = []
+
+    results = [
+        mailer.alert(f"alert {i}", "body", severity="high", on_sent=lambda i=i: delivered.append(i))
+        for i in range(3)
+    ]
+
+    assert results == [EMAIL_QUEUED] * 3
+    assert wait_until(lambda: len(delivered) == 3)
+    assert len(inbox.messages) == 1
+    assert "[1] alert 0" in inbox.messages[0][1]
+    assert "[3] alert 2" in inbox.messages[0][1]
+    mailer.pool.close_all()
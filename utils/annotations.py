@@ -0,0 +1,39 @@
+import uuid
+import numpy as np
+
+# Bulk rows for road_infra_annotations.
+# Boxes are converted array-at-a-time (one tolist() per column instead of per
+# box) and written with a single executemany, which mysql-connector sends as
+# one multi-row INSERT.
+
+INSERT_ANNOTATIONS = """
+    INSERT INTO road_infra_annotations (
+        annotation_id, image_id, object_class,
+        bbox_x, bbox_y, bbox_width, bbox_height, confidence
+    )
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+"""
+
+
+def annotation_rows(image_id, detections, object_class=None):
+    """One row per box. object_class overrides the model's class names."""
+
+    count = len(detections)
+    if count == 0:
+        return []
+
+    x, y, w, h = detections.xywh.astype(np.float64).T.tolist()
+    confidence = detections.conf.astype(np.float64).tolist()
+
+    if object_class:
+        classes = [object_class] * count
+    else:
+        # look each class id up once, then index the whole column
+        class_ids, inverse = np.unique(detections.cls, return_inverse=True)
+        labels = np.array([detections.names.get(int(c), str(c)) for c in class_ids], dtype=object)
+        classes = labels[inverse].tolist()
+
+    annotation_ids = [str(uuid.uuid4()) for _ in range(count)]
+
+    return list(zip(annotation_ids, [image_id] * count, classes, x, y, w, h, confidence))
+
@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from typing import Optional
+from utils.db import execute_query, day_window, window_condition
+from utils.query_cache import cached
+from utils.rollups import rollup_by
+
+# cached results are shared by every session; the dashboard passes its refresh interval
+DEFAULT_TTL = 30
+
+KPI_TABLES = (
+    "traffic_data", "air_quality_data", "accident_events", "crowd_density_data",
+    "road_infra_annotations", "road_infra_images", "complaint_nlp_analysis"
+)
+
+
+@dataclass
+class KpiSnapshot:
+    high_traffic_zones: int
+    latest_aqi: Optional[int]
+    latest_aqi_category: Optional[str]
+    accidents_today: int
+    high_crowd_locations: int
+    potholes_detected: int
+    streetlight_issues: int
+    negative_complaints: int
+
+
+def city_filter(city):
+    # SQL fragment + params for the sidebar city selector ("All" = no filter)
+    if city and city != "All":
+        return " AND city = %s ", (city,)
+    return "", ()
+
+
+# KPI SNAPSHOT (ONE ROUND TRIP)
+def fetch_kpi_snapshot(city="All", ttl=DEFAULT_TTL):
+    return cached("kpi_snapshot", city, KPI_TABLES, ttl,
+                  lambda: _load_kpi_snapshot(city))
+
+
+def _load_kpi_snapshot(city):
+
+    cond, params = city_filter(city)
+    today, today_params = window_condition("hour_start", day_window())
+
+    # counters come from metric_rollup (see utils/rollups.py); only the latest AQI reading hits a raw table
+    rows = execute_query(f"""
+    SELECT
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='traffic' AND dimension='high' {cond}) AS high_traffic_zones,
+
+        latest_aqi.aqi AS latest_aqi,
+        latest_aqi.aqi_category AS latest_aqi_category,
+
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='accident' AND {today}) AS accidents_today,
+
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='crowd' AND dimension IN ('high','extreme') {cond}) AS high_crowd_locations,
+
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='annotation' AND dimension='pothole') AS potholes_detected,
+
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='infra_image' AND dimension='street_infra' {cond}) AS streetlight_issues,
+
+        (SELECT COALESCE(SUM(row_count), 0)
+         FROM metric_rollup
+         WHERE metric='complaint_sentiment' AND dimension='negative') AS negative_complaints
+
+    FROM (SELECT 1) AS one
+    LEFT JOIN (
+        SELECT aqi, aqi_category
+        FROM air_quality_data
+        WHERE 1=1 {cond}
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) AS latest_aqi ON TRUE
+    """, params + today_params + params * 3)
+
+    row = rows[0]
+
+    return KpiSnapshot(
+        high_traffic_zones=int(row["high_traffic_zones"]),
+        latest_aqi=row["latest_aqi"],
+        latest_aqi_category=row["latest_aqi_category"],
+        accidents_today=int(row["accidents_today"]),
+        high_crowd_locations=int(row["high_crowd_locations"]),
+        potholes_detected=int(row["potholes_detected"]),
+        streetlight_issues=int(row["streetlight_issues"]),
+        negative_complaints=int(row["negative_complaints"])
+    )
+
+
+# SIDEBAR
+def fetch_city_list(ttl=DEFAULT_TTL):
+    return cached("city_list", None, ("traffic_data",), ttl, _load_city_list)
+
+
+def _load_city_list():
+    return execute_query("SELECT DISTINCT city FROM metric_rollup WHERE metric='traffic'")
+
+
+# CHARTS
+def fetch_high_traffic_by_city(city="All", ttl=DEFAULT_TTL):
+    return cached("high_traffic_by_city", city, ("traffic_data",), ttl,
+                  lambda: _load_high_traffic_by_city(city))
+
+
+def _load_high_traffic_by_city(city):
+    return rollup_by("traffic", "city", "high_congestion_count",
+                     dimensions=["high"], city=city, by_city=True)
+
+
+def fetch_traffic_forecasts(city="All", ttl=DEFAULT_TTL):
+    return cached("traffic_forecasts", city, ("traffic_forecasts",), ttl,
+                  lambda: _load_traffic_forecasts(city))
+
+
+def _load_traffic_forecasts(city):
+    # latest batch written by forecast_job.py
+    cond, params = city_filter(city)
+    return execute_query(f"""
+    SELECT city, area, forecast_for, predicted_vehicles, congestion_level
+    FROM traffic_forecasts
+    WHERE forecast_for = (SELECT MAX(forecast_for) FROM traffic_forecasts) {cond}
+    ORDER BY predicted_vehicles DESC
+    """, params)
+
+
+def fetch_aqi_trend(city="All", ttl=DEFAULT_TTL):
+    return cached("aqi_trend", city, ("air_quality_data",), ttl,
+                  lambda: _load_aqi_trend(city))
+
+
+def _load_aqi_trend(city):
+    cond, params = city_filter(city)
+    return execute_query(f"""
+    SELECT timestamp, aqi
+    FROM air_quality_data
+    WHERE 1=1 {cond}
+    ORDER BY timestamp DESC
+    LIMIT 50
+    """, params)
+
+
+def fetch_aqi_forecasts(city="All", ttl=DEFAULT_TTL):
+    return cached("aqi_forecasts", city, ("aqi_forecasts",), ttl,
+                  lambda: _load_aqi_forecasts(city))
+
+
+def _load_aqi_forecasts(city):
+    # latest batch written by forecast_job.py
+    cond, params = city_filter(city)
+    return execute_query(f"""
+    SELECT monitoring_station, city, forecast_for, predicted_aqi, aqi_category
+    FROM aqi_forecasts
+    WHERE forecast_for = (SELECT MAX(forecast_for) FROM aqi_forecasts) {cond}
+    ORDER BY predicted_aqi DESC
+    """, params)
+
+
+def fetch_accident_severity(ttl=DEFAULT_TTL):
+    return cached("accident_severity", None, ("accident_events",), ttl, _load_accident_severity)
+
+
+def _load_accident_severity():
+    return rollup_by("accident", "severity", "total")
+
+
+def fetch_crowd_hotspots(city="All", ttl=DEFAULT_TTL):
+    return cached("crowd_hotspots", city, ("crowd_density_data",), ttl,
+                  lambda: _load_crowd_hotspots(city))
+
+
+def _load_crowd_hotspots(city):
+    cond, params = city_filter(city)
+    return execute_query(f"""
+    SELECT location, estimated_count
+    FROM crowd_density_data
+    WHERE 1=1 {cond}
+    ORDER BY estimated_count DESC
+    LIMIT 10
+    """, params)
+
+
+def fetch_complaints_by_category(city="All", ttl=DEFAULT_TTL):
+    return cached("complaints_by_category", city, ("citizen_complaints",), ttl,
+                  lambda: _load_complaints_by_category(city))
+
+
+def _load_complaints_by_category(city):
+    return rollup_by("complaint_category", "category", "total", city=city)
+
+
+def fetch_infra_issues(city="All", ttl=DEFAULT_TTL):
+    return cached("infra_issues", city, ("road_infra_images",), ttl,
+                  lambda: _load_infra_issues(city))
+
+
+def _load_infra_issues(city):
+    return rollup_by("infra_image", "city", "issues",
+                     dimensions=["street_infra"], city=city, by_city=True)
+
+
+def fetch_recent_alerts(ttl=DEFAULT_TTL):
+    return cached("recent_alerts", None, ("system_alerts",), ttl, _load_recent_alerts)
+
+
+def _load_recent_alerts():
+    return execute_query("""
+    SELECT alert_type, location, severity, occurrences, generated_at, last_seen_at, resolved
+    FROM system_alerts
+    ORDER BY last_seen_at DESC
+    LIMIT 10
+    """)
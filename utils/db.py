@@ -1,10 +1,24 @@
 import mysql.connector
+import datetime
+import logging
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connection():
+logger = logging.getLogger(__name__)
+
+# POOL SETTINGS
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_IDLE_SECONDS = float(os.getenv("DB_POOL_IDLE_SECONDS", "300"))
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+
+def _connect():
     return mysql.connector.connect(
         host=os.getenv("DB_HOST"),
         user=os.getenv("DB_USER"),
@@ -13,17 +27,324 @@ def get_connection():
         port=3306
     )
 
-def execute_query(sql):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(sql)
-    data = cursor.fetchall()
-    conn.close()
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Borrowed connection. Use it as `with get_connection() as conn:`; close()
+    (or leaving the with-block) hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # a leaked connection may sit mid-transaction or mid-result: close it
+        # and free its slot instead of handing it to the next caller
+        if getattr(self, "_raw", None) is not None:
+            raw, self._raw = self._raw, None
+            logger.warning("Pooled DB connection garbage-collected without close(); discarding it")
+            self._pool.discard(raw, time.monotonic() - self._checked_out)
+
+    def close(self):
+        if getattr(self, "_raw", None) is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, time.monotonic() - self._checked_out)
+
+
+class ConnectionPool:
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 idle_seconds=POOL_IDLE_SECONDS, ping_after=POOL_PING_AFTER):
+        self.size = size
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # (raw connection, last returned at)
+        self._open = 0
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._hold_total = 0.0
+        self._hold_max = 0.0
+        self._reaped = 0
+        self._broken = 0
+        self._leaked = 0
+
+    # CHECKOUT
+    def acquire(self):
+        start = time.monotonic()
+        raw = None
+        idle_for = 0.0
+
+        with self._cond:
+            while True:
+                self._reap_locked()
+
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    idle_for = time.monotonic() - returned_at
+                    break
+
+                if self._open < self.size:
+                    self._open += 1
+                    break
+
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if raw is None:
+                raw = _connect()
+            elif idle_for >= self.ping_after and not self._healthy(raw):
+                raw = _connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        return PooledConnection(self, raw)
+
+    # RETURN
+    def release(self, raw, held):
+        try:
+            # never hand a half-finished transaction or stale snapshot to the next caller
+            raw.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+            self._close_quietly(raw)
+
+        with self._cond:
+            self._hold_total += held
+            self._hold_max = max(self._hold_max, held)
+
+            if reusable:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._broken += 1
+                self._open -= 1
+
+            self._reap_locked()
+            self._cond.notify()
+
+    def discard(self, raw, held):
+        self._close_quietly(raw)
+
+        with self._cond:
+            self._hold_total += held
+            self._hold_max = max(self._hold_max, held)
+            self._leaked += 1
+            self._open -= 1
+            self._cond.notify()
+
+    # IDLE REAPING
+    def reap_idle(self):
+        with self._cond:
+            self._reap_locked()
+
+    def _reap_locked(self):
+        if not self._idle:
+            return
+
+        cutoff = time.monotonic() - self.idle_seconds
+        keep = []
+
+        for raw, returned_at in self._idle:
+            if returned_at < cutoff:
+                self._close_quietly(raw)
+                self._open -= 1
+                self._reaped += 1
+            else:
+                keep.append((raw, returned_at))
+
+        self._idle = keep
+
+    def _healthy(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            self._close_quietly(raw)
+            with self._cond:
+                self._broken += 1
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._cond:
+            for raw, _ in self._idle:
+                self._close_quietly(raw)
+                self._open -= 1
+            self._idle = []
+            self._cond.notify_all()
+
+    # METRICS
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts or 1
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "checkouts": self._checkouts,
+                "wait_avg_ms": round(self._wait_total / checkouts * 1000, 2),
+                "wait_max_ms": round(self._wait_max * 1000, 2),
+                "hold_avg_ms": round(self._hold_total / checkouts * 1000, 2),
+                "hold_max_ms": round(self._hold_max * 1000, 2),
+                "reaped": self._reaped,
+                "broken": self._broken,
+                "leaked": self._leaked
+            }
+
+
+# PROCESS-WIDE POOL
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def get_connection():
+    # usable as before (conn.close() returns it) or as `with get_connection() as conn:`
+    return get_pool().acquire()
+
+
+def execute_query(sql, values=None):
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, values)
+        data = cursor.fetchall()
+        cursor.close()
     return data
 
+
+def with_time_limit(sql, max_ms):
+    # server-side limit: the SELECT is aborted after max_ms and its connection
+    # goes back to the pool even if nobody is waiting for the result any more
+    if not max_ms:
+        return sql
+    return re.sub(r"^\s*SELECT\b", f"SELECT /*+ MAX_EXECUTION_TIME({int(max_ms)}) */", sql,
+                  count=1, flags=re.IGNORECASE)
+
+
 def execute_write(sql, values):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(sql, values)
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, values)
+        conn.commit()
+        cursor.close()
+
+
+# TIME WINDOWS
+# Half-open [start, end) ranges on the raw timestamp column keep filters
+# index-backed; wrapping the column (DATE(col) = CURDATE()) forces a full scan.
+
+def day_window(day=None):
+    day = day or datetime.date.today()
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + datetime.timedelta(days=1)
+
+
+def hour_window(at=None):
+    at = at or datetime.datetime.now()
+    start = at.replace(minute=0, second=0, microsecond=0)
+    return start, start + datetime.timedelta(hours=1)
+
+
+def week_window(day=None):
+    # ISO week, Monday 00:00 to next Monday 00:00
+    day = day or datetime.date.today()
+    start = datetime.datetime.combine(day - datetime.timedelta(days=day.weekday()), datetime.time.min)
+    return start, start + datetime.timedelta(days=7)
+
+
+def window_condition(column, window):
+    start, end = window
+    return f"{column} >= %s AND {column} < %s", (start, end)
+
+
+# REWRITE NON-SARGABLE TIME PREDICATES (LLM-GENERATED SQL)
+
+_COLUMN = r"(?P<col>[`\w.]+)"
+_DAY_EXPR = r"(?P<expr>(?:CURDATE\(\)|CURRENT_DATE(?:\(\))?)(?:\s*[-+]\s*INTERVAL\s+\d+\s+DAY)?|'\d{4}-\d{2}-\d{2}')"
+
+_TIME_REWRITES = [
+
+    # DATE(col) = CURDATE() [- INTERVAL n DAY] | 'YYYY-MM-DD'
+    (
+        re.compile(rf"DATE\(\s*{_COLUMN}\s*\)\s*=\s*{_DAY_EXPR}", re.IGNORECASE),
+        lambda m: f"({m['col']} >= {m['expr']} AND {m['col']} < {m['expr']} + INTERVAL 1 DAY)"
+    ),
+
+    # YEARWEEK(col, 1) = YEARWEEK(CURDATE(), 1)  -> Monday-based week
+    (
+        re.compile(rf"YEARWEEK\(\s*{_COLUMN}\s*,\s*1\s*\)\s*=\s*YEARWEEK\(\s*(?:CURDATE\(\)|NOW\(\)|CURRENT_DATE(?:\(\))?)\s*,\s*1\s*\)", re.IGNORECASE),
+        lambda m: (f"({m['col']} >= CURDATE() - INTERVAL WEEKDAY(CURDATE()) DAY"
+                   f" AND {m['col']} < CURDATE() - INTERVAL WEEKDAY(CURDATE()) DAY + INTERVAL 7 DAY)")
+    ),
+
+    # YEARWEEK(col) = YEARWEEK(CURDATE()) / WEEK(col) = WEEK(CURDATE())  -> Sunday-based week
+    (
+        re.compile(rf"(?:YEAR)?WEEK\(\s*{_COLUMN}\s*\)\s*=\s*(?:YEAR)?WEEK\(\s*(?:CURDATE\(\)|NOW\(\)|CURRENT_DATE(?:\(\))?)\s*\)", re.IGNORECASE),
+        lambda m: (f"({m['col']} >= CURDATE() - INTERVAL (DAYOFWEEK(CURDATE()) - 1) DAY"
+                   f" AND {m['col']} < CURDATE() - INTERVAL (DAYOFWEEK(CURDATE()) - 1) DAY + INTERVAL 7 DAY)")
+    ),
+
+    # DATE_FORMAT(col, '%Y-%m-%d %H') = DATE_FORMAT(NOW(), '%Y-%m-%d %H')  -> current hour
+    (
+        re.compile(rf"DATE_FORMAT\(\s*{_COLUMN}\s*,\s*'%Y-%m-%d %H'\s*\)\s*=\s*DATE_FORMAT\(\s*NOW\(\)\s*,\s*'%Y-%m-%d %H'\s*\)", re.IGNORECASE),
+        lambda m: (f"({m['col']} >= DATE_FORMAT(NOW(), '%Y-%m-%d %H:00:00')"
+                   f" AND {m['col']} < DATE_FORMAT(NOW(), '%Y-%m-%d %H:00:00') + INTERVAL 1 HOUR)")
+    )
+]
+
+
+def sargable_time_filters(sql):
+    for pattern, replacement in _TIME_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Detections:
+    """Plain NumPy view of one frame's detections.
+
+    Pages work with this instead of ultralytics Results so the same code runs
+    whether the model lives in-process or in the inference server.
+    """
+
+    xyxy: np.ndarray = field(default_factory=lambda: np.zeros((0, 4), dtype=np.float32))
+    conf: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    cls: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    names: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.conf)
+
+    @property
+    def xywh(self):
+        # centre x, centre y, width, height (same convention as ultralytics boxes.xywh)
+        x1, y1, x2, y2 = self.xyxy.T
+        return np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+
+    @classmethod
+    def from_ultralytics(cls, result):
+        boxes = result.boxes
+
+        if boxes is None or boxes.cls is None:
+            return cls(names=dict(result.names))
+
+        return cls(
+            xyxy=boxes.xyxy.cpu().numpy().astype(np.float32),
+            conf=boxes.conf.cpu().numpy().astype(np.float32),
+            cls=boxes.cls.cpu().numpy().astype(np.int64),
+            names=dict(result.names)
+        )
+
+    def to_dict(self):
+        return {
+            "xyxy": self.xyxy.tolist(),
+            "conf": self.conf.tolist(),
+            "cls": self.cls.tolist(),
+            "names": {str(k): v for k, v in self.names.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            xyxy=np.asarray(data["xyxy"], dtype=np.float32).reshape(-1, 4),
+            conf=np.asarray(data["conf"], dtype=np.float32),
+            cls=np.asarray(data["cls"], dtype=np.int64),
+            names={int(k): v for k, v in data["names"].items()}
+        )
+
+    def plot(self, image_bgr):
+        # annotated copy of the frame, BGR in / BGR out like Results.plot()
+        canvas = image_bgr.copy()
+
+        for (x1, y1, x2, y2), score, class_id in zip(self.xyxy.astype(int), self.conf, self.cls):
+            color = _class_color(int(class_id))
+            label = f"{self.names.get(int(class_id), class_id)} {score:.2f}"
+
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), color, 2)
+
+            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            top = max(y1 - th - 4, 0)
+            cv2.rectangle(canvas, (x1, top), (x1 + tw + 4, top + th + 4), color, -1)
+            cv2.putText(canvas, label, (x1 + 2, top + th + 1),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+        return canvas
+
+
+def _class_color(class_id):
+    palette = [
+        (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+        (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+        (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0)
+    ]
+    return palette[class_id % len(palette)]
+
+
+def to_bgr(image):
+    # PIL uploads -> BGR array, the layout cv2 frames and the models expect
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
@@ -1,26 +1,19 @@
-import os
-import smtplib
-from email.mime.text import MIMEText
-from dotenv import load_dotenv
+import logging
+from utils.mailer import EMAIL_SENT, EMAIL_QUEUED, mailer
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-def send_email_alert(subject, message):
-
-    sender = os.getenv("ALERT_EMAIL")
-    password = os.getenv("ALERT_EMAIL_PASSWORD")
-    receiver = os.getenv("SENDER_EMAIL")
-
-    msg = MIMEText(message)
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = receiver
 
+def send_email_alert(subject, message, severity=None, on_sent=None):
+    # pooled + rate limited; merged into a digest when EMAIL_DIGEST_SECONDS is set.
+    # Returns EMAIL_SENT, EMAIL_QUEUED (on_sent() runs once the digest went out) or False
     try:
-        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-        server.login(sender, password)
-        server.sendmail(sender, receiver, msg.as_string())
-        server.quit()
-        print("Email alert sent")
+        result = mailer.alert(subject, message, severity=severity, on_sent=on_sent)
+        if result == EMAIL_SENT:
+            logger.info("Email alert sent: %s", subject)
+        else:
+            logger.info("Email alert queued for digest: %s", subject)
+        return result
     except Exception as e:
-        print("Email failed:", e)
\ No newline at end of file
+        logger.error("Email alert failed: %s: %s", subject, e)
+        return False
@@ -0,0 +1,339 @@
+import datetime
+import numpy as np
+from utils.db import execute_query, get_connection, hour_window, window_condition
+from utils.inference import predict_sequence, load_scaler
+from utils.query_cache import invalidate_tables
+
+# Batch forecasting over stored history.
+# Every series' input window is rebuilt from the raw table in one query,
+# resampled to hourly slots with NumPy (no per-series loops), stacked into a
+# single tensor and sent to the LSTM in one call - forecasting every station
+# costs about as much as forecasting one.
+
+AQI_HISTORY_HOURS = 72
+POLLUTANTS = ["pm25", "pm10", "co", "no2", "so2", "o3"]
+AQI_COLUMN = 6  # position of aqi in the columns aqi_scaler was fitted on
+
+TRAFFIC_HISTORY_HOURS = 24
+
+# MONITORING STATIONS (INDIA)
+STATIONS = [
+    "Anand Vihar - Delhi", "RK Puram - Delhi", "Punjabi Bagh - Delhi",
+    "Bandra Kurla Complex - Mumbai", "Worli - Mumbai",
+    "Alipore - Kolkata", "Ballygunge - Kolkata",
+    "Velachery - Chennai", "Adyar - Chennai", "Perungudi - Chennai",
+    "Anna Nagar - Chennai", "Manali - Chennai", "Tambaram - Chennai",
+    "Hebbal - Bengaluru", "BTM Layout - Bengaluru",
+    "Hyderabad Zoo Park", "Sanathnagar - Hyderabad",
+    "Lucknow Central", "Kanpur IIT",
+    "Jaipur Adarsh Nagar", "Ahmedabad Navrangpura",
+    "Chandigarh Sector 22", "Bhopal TT Nagar", "Patna Rajbansi Nagar"
+]
+
+UPSERT_AQI_FORECAST = """
+INSERT INTO aqi_forecasts (
+    monitoring_station, forecast_for, city,
+    predicted_aqi, aqi_category, history_hours, generated_at
+)
+VALUES (%s,%s,%s,%s,%s,%s,%s)
+ON DUPLICATE KEY UPDATE
+    city = VALUES(city),
+    predicted_aqi = VALUES(predicted_aqi),
+    aqi_category = VALUES(aqi_category),
+    history_hours = VALUES(history_hours),
+    generated_at = VALUES(generated_at)
+"""
+
+
+UPSERT_TRAFFIC_FORECAST = """
+INSERT INTO traffic_forecasts (
+    city, area, forecast_for,
+    predicted_vehicles, congestion_level, history_hours,
+    source_rows, source_last_at, generated_at
+)
+VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+ON DUPLICATE KEY UPDATE
+    predicted_vehicles = VALUES(predicted_vehicles),
+    congestion_level = VALUES(congestion_level),
+    history_hours = VALUES(history_hours),
+    source_rows = VALUES(source_rows),
+    source_last_at = VALUES(source_last_at),
+    generated_at = VALUES(generated_at)
+"""
+
+
+def aqi_to_category(aqi):
+    if aqi <= 50:
+        return "Good"
+    elif aqi <= 100:
+        return "Moderate"
+    elif aqi <= 200:
+        return "Poor"
+    elif aqi <= 300:
+        return "Very Poor"
+    else:
+        return "Severe"
+
+
+# SEQUENCE BUILDING
+def _fill_gaps(tensor):
+    # carry the last reading forward along the time axis, then the first one back
+    def forward(t):
+        slots = np.arange(t.shape[1])[None, :, None]
+        last_seen = np.where(np.isnan(t), 0, slots)
+        np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+        return np.take_along_axis(t, last_seen, axis=1)
+
+    filled = forward(tensor)
+    filled = forward(filled[:, ::-1])[:, ::-1]
+
+    # a column with no readings at all in the window
+    return np.nan_to_num(filled, nan=0.0)
+
+
+def hourly_windows(rows, keys, values, end, hours):
+    """Stack rows into one (n_series, hours, len(values)) tensor of hourly means.
+
+    rows are dicts with the key columns, "timestamp" and the value columns.
+    The window is the `hours` hourly slots before `end`. Returns
+    (series keys, tensor, observed hours per series); hours without a reading
+    reuse the nearest one.
+    """
+
+    empty = [], np.zeros((0, hours, len(values)), dtype=np.float32), np.zeros(0, dtype=int)
+    if not rows:
+        return empty
+
+    start = np.datetime64(end - datetime.timedelta(hours=hours), "s")
+    stamps = np.array([row["timestamp"] for row in rows], dtype="datetime64[s]")
+    slots = ((stamps - start) // np.timedelta64(1, "h")).astype(int)
+
+    inside = (slots >= 0) & (slots < hours)
+    if not inside.any():
+        return empty
+
+    rows = [row for row, keep in zip(rows, inside) if keep]
+    slots = slots[inside]
+
+    series_index = {}
+    series = np.array([series_index.setdefault(tuple(row[k] for k in keys), len(series_index)) for row in rows])
+    data = np.array([[row[v] for v in values] for row in rows], dtype=np.float64)  # NULL -> nan
+
+    # hourly mean per (series, slot, column), ignoring NULL readings
+    shape = (len(series_index), hours, len(values))
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    present = ~np.isnan(data)
+    np.add.at(sums, (series, slots), np.where(present, data, 0.0))
+    np.add.at(counts, (series, slots), present)
+
+    with np.errstate(invalid="ignore"):
+        tensor = (sums / counts).astype(np.float32)
+
+    observed = (counts > 0).any(axis=2).sum(axis=1)
+
+    return list(series_index), _fill_gaps(tensor), observed
+
+
+# AQI
+def aqi_history(stations, end, hours=AQI_HISTORY_HOURS):
+    cond, params = window_condition("timestamp", (end - datetime.timedelta(hours=hours), end))
+    placeholders = ",".join(["%s"] * len(stations))
+
+    return execute_query(f"""
+    SELECT monitoring_station, city, timestamp, {", ".join(POLLUTANTS)}, aqi
+    FROM air_quality_data
+    WHERE monitoring_station IN ({placeholders}) AND {cond}
+    ORDER BY timestamp
+    """, tuple(stations) + params)
+
+
+def forecast_aqi(stations=STATIONS, now=None):
+    """Next-hour AQI for every station with readings in the last 72 hours."""
+
+    # the window ends with the current (partial) hour; the forecast is for the next one
+    end = hour_window(now)[1]
+    rows = aqi_history(stations, end)
+
+    keys, history, observed = hourly_windows(
+        rows, ["monitoring_station"], POLLUTANTS + ["aqi"], end, AQI_HISTORY_HOURS
+    )
+    if not keys:
+        return []
+
+    scaler = load_scaler("aqi_lstm")
+    scaled = scaler.transform(history.reshape(-1, history.shape[2])).reshape(history.shape)
+
+    # one predict() for every station
+    predicted_scaled = predict_sequence("aqi_lstm", scaled[:, :, :AQI_COLUMN])
+
+    aqi_min = scaler.data_min_[AQI_COLUMN]
+    aqi_max = scaler.data_max_[AQI_COLUMN]
+    predicted = np.asarray(predicted_scaled)[:, 0] * (aqi_max - aqi_min) + aqi_min
+
+    # rows are time-ordered, so the last city seen per station wins
+    cities = {row["monitoring_station"]: row["city"] for row in rows}
+    generated_at = datetime.datetime.now()
+
+    forecasts = [
+        {
+            "monitoring_station": station,
+            "forecast_for": end,
+            "city": cities.get(station),
+            "predicted_aqi": int(round(value)),
+            "aqi_category": aqi_to_category(value),
+            "history_hours": int(hours),
+            "generated_at": generated_at
+        }
+        for (station,), value, hours in zip(keys, predicted, observed)
+    ]
+
+    save_aqi_forecasts(forecasts)
+    return forecasts
+
+
+def save_aqi_forecasts(forecasts):
+    if not forecasts:
+        return
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(UPSERT_AQI_FORECAST, [
+            (f["monitoring_station"], f["forecast_for"], f["city"], f["predicted_aqi"],
+             f["aqi_category"], f["history_hours"], f["generated_at"])
+            for f in forecasts
+        ])
+        conn.commit()
+        cursor.close()
+
+    invalidate_tables("aqi_forecasts")
+
+
+# TRAFFIC
+def congestion_level(vehicles):
+    # same bands the traffic page applies to a reading without a stored forecast
+    if vehicles < 5:
+        return "low"
+    elif vehicles < 10:
+        return "medium"
+    return "high"
+
+
+def _traffic_window(end):
+    return window_condition("timestamp", (end - datetime.timedelta(hours=TRAFFIC_HISTORY_HOURS), end))
+
+
+def junction_versions(end):
+    # rows and newest reading per junction in the window; both only change when a row lands for it
+    cond, params = _traffic_window(end)
+    rows = execute_query(f"""
+    SELECT COALESCE(city, '') AS city, COALESCE(area, '') AS area,
+           COUNT(*) AS source_rows, MAX(timestamp) AS source_last_at
+    FROM traffic_data
+    WHERE {cond}
+    GROUP BY COALESCE(city, ''), COALESCE(area, '')
+    """, params)
+    return {(row["city"], row["area"]): (row["source_rows"], row["source_last_at"]) for row in rows}
+
+
+def forecast_versions(end):
+    # junction versions the stored forecasts for this window were computed from
+    rows = execute_query("""
+    SELECT city, area, source_rows, source_last_at
+    FROM traffic_forecasts
+    WHERE forecast_for = %s
+    """, (end,))
+    return {(row["city"], row["area"]): (row["source_rows"], row["source_last_at"]) for row in rows}
+
+
+def traffic_history(end):
+    cond, params = _traffic_window(end)
+    return execute_query(f"""
+    SELECT COALESCE(city, '') AS city, COALESCE(area, '') AS area, timestamp, vehicle_count
+    FROM traffic_data
+    WHERE {cond}
+    """, params)
+
+
+def forecast_traffic(now=None):
+    """Next-hour vehicle counts for junctions whose 24-hour history changed.
+
+    A junction is only sent through the LSTM when traffic_forecasts holds no
+    forecast for this window yet, or the one it holds was computed from fewer
+    or older rows (its stored source_rows / source_last_at). Run it every few
+    minutes: between new readings a run costs two GROUP BY queries.
+    Returns the forecasts it (re)computed.
+    """
+
+    end = hour_window(now)[1]
+    versions = junction_versions(end)
+    stored = forecast_versions(end)
+
+    stale = {key for key, version in versions.items() if stored.get(key) != version}
+    if not stale:
+        return []
+
+    rows = [row for row in traffic_history(end) if (row["city"], row["area"]) in stale]
+
+    keys, history, observed = hourly_windows(
+        rows, ["city", "area"], ["vehicle_count"], end, TRAFFIC_HISTORY_HOURS
+    )
+    if not keys:
+        return []
+
+    scaler = load_scaler("traffic_lstm")
+    scaled = scaler.transform(history.reshape(-1, 1)).reshape(history.shape)
+
+    # one predict() for every stale junction
+    predicted = scaler.inverse_transform(
+        np.asarray(predict_sequence("traffic_lstm", scaled)).reshape(-1, 1)
+    )[:, 0]
+
+    generated_at = datetime.datetime.now()
+    forecasts = [
+        {
+            "city": key[0],
+            "area": key[1],
+            "forecast_for": end,
+            "predicted_vehicles": max(0, int(round(value))),
+            "congestion_level": congestion_level(value),
+            "history_hours": int(hours),
+            "source_rows": versions[key][0],
+            "source_last_at": versions[key][1],
+            "generated_at": generated_at
+        }
+        for key, value, hours in zip(keys, predicted, observed)
+    ]
+
+    save_traffic_forecasts(forecasts)
+    return forecasts
+
+
+def save_traffic_forecasts(forecasts):
+    if not forecasts:
+        return
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(UPSERT_TRAFFIC_FORECAST, [
+            (f["city"], f["area"], f["forecast_for"], f["predicted_vehicles"], f["congestion_level"],
+             f["history_hours"], f["source_rows"], f["source_last_at"], f["generated_at"])
+            for f in forecasts
+        ])
+        conn.commit()
+        cursor.close()
+
+    invalidate_tables("traffic_forecasts")
+
+
+def latest_traffic_forecast(city, area, now=None):
+    """The newest stored forecast for one junction (current or next hour), or None."""
+
+    rows = execute_query("""
+    SELECT forecast_for, predicted_vehicles, congestion_level, history_hours
+    FROM traffic_forecasts
+    WHERE city = %s AND area = %s AND forecast_for >= %s
+    ORDER BY forecast_for DESC
+    LIMIT 1
+    """, (city or "", area or "", hour_window(now)[0]))
+    return rows[0] if rows else None
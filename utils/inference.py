@@ -0,0 +1,225 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import requests
+from dotenv import load_dotenv
+from utils.detections import Detections, to_bgr
+from utils.model_registry import registry, file_version
+from utils.quantization import int8_path, use_int8, TFLiteModel
+
+load_dotenv()
+
+# Single entry point for every model call made by the pages.
+# With INFERENCE_SERVER_URL set (e.g. http://127.0.0.1:8600) requests go to the
+# shared inference_server.py process; otherwise models load in this process.
+
+INFERENCE_SERVER_URL = os.getenv("INFERENCE_SERVER_URL", "").rstrip("/")
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "120"))
+
+DETECTORS = {
+    "traffic": "models/traffic_yolo_best.pt",
+    "pothole": "models/pothole_best.pt",
+    "accident": "models/accident_best.pt",
+    "crowd": "models/crowd_best.pt",
+    "streetlight": "models/streetlight_best.pt"
+}
+
+SEQUENCE_MODELS = {
+    "traffic_lstm": "models/traffic_lstm.h5",
+    "aqi_lstm": "models/aqi_lstm_model.h5"
+}
+
+SCALERS = {
+    "traffic_lstm": "models/traffic_scaler.pkl",
+    "aqi_lstm": "models/aqi_scaler.pkl"
+}
+
+
+# Detector runtime, chosen per model:
+#   torch    - the .pt through PyTorch (default)
+#   onnx     - models/<name>.onnx through ONNX Runtime
+#   openvino - models/<name>_openvino_model/ through OpenVINO
+#   int8     - models/<name>_int8.onnx through ONNX Runtime (quantize_models.py)
+# DETECTOR_BACKEND sets the default, DETECTOR_BACKEND_<MODEL> overrides one model.
+# Without an explicit per-model choice, a model inside its INT8 budget runs int8
+# (see utils/quantization.py).
+# export_models.py writes the onnx / openvino files next to each .pt.
+DETECTOR_BACKENDS = ("torch", "onnx", "openvino", "int8")
+
+
+def detector_backend(name):
+    explicit = os.getenv(f"DETECTOR_BACKEND_{name.upper()}")
+
+    if not explicit and use_int8(name, DETECTORS[name]):
+        return "int8"
+
+    backend = (explicit or os.getenv("DETECTOR_BACKEND", "torch")).lower()
+
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend for {name}: {backend}")
+    return backend
+
+
+def detector_path(name, backend=None):
+    backend = backend or detector_backend(name)
+    stem = os.path.splitext(DETECTORS[name])[0]
+
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    if backend == "int8":
+        return int8_path(DETECTORS[name])
+    return DETECTORS[name]
+
+
+def model_version(name):
+    # identifies the weights behind a model name, for caches keyed on model output
+    if name in DETECTORS:
+        backend = detector_backend(name)
+        path = detector_path(name, backend)
+    else:
+        path = SEQUENCE_MODELS[name]
+        backend = "int8" if use_int8(name, path) else "keras"
+        path = int8_path(path) if backend == "int8" else path
+
+    return f"{backend}:{os.path.basename(path)}:{file_version(path)}"
+
+
+# LOCAL BACKEND
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+WARMUP_IMGSZ = 640
+
+
+def _load_detector(name, backend):
+    from ultralytics import YOLO
+
+    path = detector_path(name, backend)
+    if not os.path.exists(path):
+        tool = "quantize_models.py" if backend == "int8" else f"export_models.py {backend}"
+        raise FileNotFoundError(f"{path} not found - run: python {tool} {name}")
+
+    # exported models do not carry the task, so name it explicitly
+    return YOLO(path, task="detect")
+
+
+def _warm_detector(model):
+    # first call builds the predictor / runtime session; pay for it at load time
+    model(np.zeros((WARMUP_IMGSZ, WARMUP_IMGSZ, 3), dtype=np.uint8), verbose=False)
+
+
+def _load_sequence(path):
+    if path.endswith(".tflite"):
+        return TFLiteModel(path)
+
+    from tensorflow.keras.models import load_model
+    return load_model(path, compile=False)
+
+
+def _warm_sequence(model):
+    model.predict(np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32), verbose=0)
+
+
+def load_local_model(name, backend=None):
+
+    if name in DETECTORS:
+        backend = backend or detector_backend(name)
+        return registry.get(
+            (name, backend),
+            detector_path(name, backend),
+            lambda path: _load_detector(name, backend),
+            _warm_detector if MODEL_WARMUP else None
+        )
+
+    if name in SEQUENCE_MODELS:
+        source = SEQUENCE_MODELS[name]
+        path = int8_path(source) if use_int8(name, source) else source
+        return registry.get(name, path, _load_sequence, _warm_sequence if MODEL_WARMUP else None)
+
+    raise KeyError(f"Unknown model: {name}")
+
+
+def load_scaler(name):
+    # the scaler that goes with a sequence model, e.g. load_scaler("aqi_lstm")
+    return registry.get(f"{name}_scaler", SCALERS[name], joblib.load)
+
+
+def _local_detect_batch(name, frames, conf, imgsz):
+    model = load_local_model(name)
+
+    kwargs = {"conf": conf, "verbose": False}
+    if imgsz:
+        kwargs["imgsz"] = imgsz
+
+    results = model(list(frames), **kwargs)
+    return [Detections.from_ultralytics(r) for r in results]
+
+
+def _local_predict(name, inputs):
+    return load_local_model(name).predict(inputs, verbose=0)
+
+
+# REMOTE BACKEND
+_session = requests.Session()
+_request_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="inference-client")
+
+
+def _remote_detect_one(name, frame, conf, imgsz):
+
+    frame = np.ascontiguousarray(frame, dtype=np.uint8)
+    height, width = frame.shape[:2]
+
+    response = _session.post(
+        f"{INFERENCE_SERVER_URL}/detect/{name}",
+        params={"conf": conf, "imgsz": imgsz or "", "h": height, "w": width},
+        data=frame.tobytes(),
+        headers={"Content-Type": "application/octet-stream"},
+        timeout=INFERENCE_TIMEOUT
+    )
+    response.raise_for_status()
+    return Detections.from_dict(response.json())
+
+
+def _remote_detect_batch(name, frames, conf, imgsz):
+
+    if len(frames) == 1:
+        return [_remote_detect_one(name, frames[0], conf, imgsz)]
+
+    # frames go out concurrently so the server's batcher sees them together
+    return list(_request_pool.map(
+        lambda frame: _remote_detect_one(name, frame, conf, imgsz), frames
+    ))
+
+
+def _remote_predict(name, inputs):
+
+    response = _session.post(
+        f"{INFERENCE_SERVER_URL}/predict/{name}",
+        json={"inputs": np.asarray(inputs, dtype=np.float32).tolist()},
+        timeout=INFERENCE_TIMEOUT
+    )
+    response.raise_for_status()
+    return np.asarray(response.json()["outputs"], dtype=np.float32)
+
+
+# PUBLIC API
+def detect_batch(name, frames, conf=0.25, imgsz=None):
+    frames = [to_bgr(f) for f in frames]
+
+    if not frames:
+        return []
+
+    if INFERENCE_SERVER_URL:
+        return _remote_detect_batch(name, frames, conf, imgsz)
+    return _local_detect_batch(name, frames, conf, imgsz)
+
+
+def detect(name, image, conf=0.25, imgsz=None):
+    return detect_batch(name, [image], conf=conf, imgsz=imgsz)[0]
+
+
+def predict_sequence(name, inputs):
+    if INFERENCE_SERVER_URL:
+        return _remote_predict(name, inputs)
+    return _local_predict(name, inputs)
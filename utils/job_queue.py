@@ -0,0 +1,547 @@
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from functools import partial
+import numpy as np
+from utils.db import get_connection
+from utils.email_alert import EMAIL_SENT, send_email_alert
+from utils.query_cache import invalidate_tables
+from utils.rollups import bump_rollup
+from utils.s3_upload import upload_to_s3
+from utils.system_alerts import create_alert, is_repeat_alert, mark_alert_emailed
+
+# Durable queue for the slow work a detection page does after inference
+# (S3 upload, RDS inserts, alert email, system alert).
+#
+# A page builds a Job out of steps, submits it and carries on; worker threads
+# pick jobs up from a local SQLite file and run the steps in order. Each step's
+# output (e.g. the S3 URL) is stored with the job and can feed later steps via
+# ctx("image_url"). A failing step is retried with exponential backoff and the
+# job resumes from that step, so an email is never sent twice. Jobs survive a
+# restart: anything queued or left running by a dead process is picked up again.
+# A worker renews its lease with every progress write, and from a heartbeat
+# thread while a step runs; it stops as soon as a write finds the lease gone.
+# The RDS step records itself in job_steps inside its own transaction, so a
+# job taken over mid-way never inserts twice.
+#
+# Workers start inside the Streamlit process by default; set
+# JOB_QUEUE_INLINE_WORKERS=0 and run `python job_worker.py` to move them out.
+
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", os.path.join(".cache", "jobs.sqlite3"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(".cache", "job_files"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_INLINE_WORKERS = os.getenv("JOB_QUEUE_INLINE_WORKERS", "1") != "0"
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = 300
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # a running job not renewed for this long belongs to a dead worker
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3  # renewal interval while a step runs
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    context TEXT NOT NULL,
+    next_step INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_at);
+"""
+
+
+# SERIALISATION (datetimes + numpy scalars in SQL params)
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _dumps(value):
+    return json.dumps(value, default=_encode)
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode)
+
+
+def ctx(name):
+    """Placeholder for the output of an earlier step, filled in when the step runs."""
+    return {"__ctx__": name}
+
+
+def _resolve(value, context):
+    if isinstance(value, dict):
+        if "__ctx__" in value:
+            return context.get(value["__ctx__"])
+        return {k: _resolve(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v, context) for v in value]
+    return value
+
+
+# STEP HANDLERS
+# handler(args, job_id) -> dict merged into the job context. Raising retries the
+# step; steps marked optional fall back to their defaults once out of attempts.
+def _spool_dir(job_id):
+    return os.path.join(JOB_SPOOL_DIR, job_id)
+
+
+def _step_s3_upload(args, job_id):
+    image_url = upload_to_s3(os.path.join(_spool_dir(job_id), args["file"]), args["key"])
+    if not image_url:
+        raise RuntimeError(f"S3 upload of {args['key']} failed")
+    return {"image_url": image_url}
+
+
+def _step_db(args, job_id):
+    # one transaction for every insert + rollup of the report, plus the
+    # job_steps marker: a re-run after a commit this worker never recorded
+    # (crash, lost lease) finds the marker and leaves the data alone
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "INSERT IGNORE INTO job_steps (job_id, step, done_at) VALUES (%s,%s,%s)",
+            (job_id, args.get("step", 0), datetime.datetime.now())
+        )
+
+        if cursor.rowcount == 0:
+            conn.rollback()
+        else:
+            for query, params, many in args["statements"]:
+                if many:
+                    cursor.executemany(query, [tuple(p) for p in params])
+                else:
+                    cursor.execute(query, tuple(params))
+
+            for metric, city, dimension, count, at in args["rollups"]:
+                bump_rollup(cursor, metric, city, dimension, count=count, at=at)
+
+            conn.commit()
+        cursor.close()
+
+    if args["invalidate"]:
+        invalidate_tables(*args["invalidate"])
+    return {}
+
+
+def _step_dedup(args, job_id):
+    return {"repeat_alert": is_repeat_alert(args["alert_type"], args["location"], args["severity"])}
+
+
+def _step_email(args, job_id):
+    if args.get("skip"):
+        # repeat of an open alert: it only bumps the counter, no second email
+        return {"email_sent": False}
+
+    # a digest flags the alert itself once it has actually gone out
+    alert = args.get("alert")
+    on_sent = partial(mark_alert_emailed, **alert) if alert else None
+
+    result = send_email_alert(args["subject"], args["message"], severity=args["severity"], on_sent=on_sent)
+    if not result:
+        raise RuntimeError("alert email not sent")
+    return {"email_sent": result == EMAIL_SENT}
+
+
+def _step_alert(args, job_id):
+    create_alert(
+        alert_type=args["alert_type"],
+        location=args["location"],
+        severity=args["severity"],
+        message=args["message"],
+        email_sent=bool(args["email_sent"])
+    )
+    return {}
+
+
+def _step_cache_result(args, job_id):
+    # imported here so a standalone worker does not load the models up front
+    import cv2
+    from utils.detections import Detections
+    from utils.result_cache import result_cache
+
+    if not args["image_url"]:
+        return {}
+
+    annotated = None
+    if args["annotated"]:
+        annotated = cv2.imread(os.path.join(_spool_dir(job_id), args["annotated"]))
+
+    detections = Detections.from_dict(args["detections"]) if args["detections"] else None
+    result_cache.put(args["key"], args["summary"], detections=detections,
+                     annotated=annotated, image_url=args["image_url"])
+    return {}
+
+
+HANDLERS = {
+    "s3_upload": _step_s3_upload,
+    "db": _step_db,
+    "dedup": _step_dedup,
+    "email": _step_email,
+    "alert": _step_alert,
+    "cache_result": _step_cache_result
+}
+
+
+class Job:
+    """Steps for one detection report, run in order by a worker."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.job_id = uuid.uuid4().hex[:12]
+        self.steps = []
+        self.context = {}
+
+    def _add(self, handler, args, optional=False, defaults=None):
+        self.steps.append({
+            "handler": handler,
+            "args": args,
+            "optional": optional,
+            "defaults": defaults or {}
+        })
+
+    def _spool(self, name, data):
+        folder = _spool_dir(self.job_id)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(data)
+        return name
+
+    def _db_step(self):
+        # consecutive statements / rollups share one transaction
+        if not self.steps or self.steps[-1]["handler"] != "db":
+            self._add("db", {"step": len(self.steps), "statements": [], "rollups": [], "invalidate": []})
+        return self.steps[-1]["args"]
+
+    def set(self, **values):
+        # known values for ctx() placeholders, e.g. a cached S3 URL
+        self.context.update(values)
+        return self
+
+    def upload(self, source, key):
+        """Upload an UploadedFile / bytes to S3; image_url is None if it keeps failing."""
+        data = source if isinstance(source, (bytes, bytearray)) else source.getbuffer()
+        self._add("s3_upload", {"file": self._spool("upload", data), "key": key},
+                  optional=True, defaults={"image_url": None})
+        return self
+
+    def execute(self, query, params):
+        self._db_step()["statements"].append([query, list(params), False])
+        return self
+
+    def executemany(self, query, rows):
+        if rows:
+            self._db_step()["statements"].append([query, [list(r) for r in rows], True])
+        return self
+
+    def rollup(self, metric, city, dimension, count=1):
+        # the hour is fixed now, not when a retried job finally runs
+        self._db_step()["rollups"].append([metric, city, dimension, count, datetime.datetime.now()])
+        return self
+
+    def invalidate(self, *tables):
+        self._db_step()["invalidate"].extend(tables)
+        return self
+
+    def email(self, subject, message, severity=None):
+        self._add("email", {"subject": subject, "message": message, "severity": severity},
+                  optional=True, defaults={"email_sent": False})
+        return self
+
+    def alert(self, alert_type, location, severity, message):
+        # the email just before an alert is skipped when the alert is a repeat
+        if self.steps and self.steps[-1]["handler"] == "email":
+            email = self.steps.pop()
+            email["args"]["skip"] = ctx("repeat_alert")
+            email["args"]["alert"] = {"alert_type": alert_type, "location": location, "severity": severity}
+            self._add("dedup", {"alert_type": alert_type, "location": location, "severity": severity})
+            self.steps.append(email)
+
+        self._add("alert", {
+            "alert_type": alert_type,
+            "location": location,
+            "severity": severity,
+            "message": message,
+            "email_sent": ctx("email_sent")
+        })
+        return self
+
+    def cache_result(self, key, summary, detections=None, annotated=None):
+        # written once the upload has an URL; failed uploads are not cached
+        import cv2
+
+        annotated_file = None
+        if annotated is not None:
+            annotated_file = self._spool("annotated.jpg", cv2.imencode(".jpg", annotated)[1].tobytes())
+
+        self._add("cache_result", {
+            "key": key,
+            "summary": summary,
+            "detections": detections.to_dict() if detections is not None else None,
+            "annotated": annotated_file,
+            "image_url": ctx("image_url")
+        }, optional=True)
+        return self
+
+    def submit(self):
+        return job_queue.submit(self)
+
+
+class LeaseLost(Exception):
+    """The job's lease ran out and another worker has claimed it."""
+
+
+class _Heartbeat:
+    """Renews a job's lease while one of its steps runs, so a step that takes
+    longer than JOB_LEASE_SECONDS is not reclaimed and run a second time."""
+
+    def __init__(self, queue, job_id, lease):
+        self.queue = queue
+        self.job_id = job_id
+        self.lease = lease
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                self.lease = self.queue._save(self.job_id, self.lease)
+            except LeaseLost:
+                self.lost = True
+                return
+            except sqlite3.Error:
+                pass  # database busy; the next beat comes well before the lease runs out
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+class JobQueue:
+
+    def __init__(self, path=JOB_QUEUE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._workers = []
+        self._start_lock = threading.Lock()
+
+    def _conn(self):
+        # one connection per thread; autocommit, transactions opened explicitly
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def submit(self, job):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, kind, status, steps, context, run_at, created_at, updated_at) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            (job.job_id, job.kind, "queued", _dumps(job.steps), _dumps(job.context), now, now, now)
+        )
+
+        if JOB_INLINE_WORKERS:
+            self.start_workers()
+        self._wake.set()
+        return job.job_id
+
+    def status(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        steps = _loads(row["steps"])
+        return {
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "step": steps[row["next_step"]]["handler"] if row["next_step"] < len(steps) else None,
+            "progress": f"{row['next_step']}/{len(steps)}",
+            "attempts": row["attempts"],
+            "error": row["error"],
+            "context": _loads(row["context"]),
+            "created_at": datetime.datetime.fromtimestamp(row["created_at"]),
+            "updated_at": datetime.datetime.fromtimestamp(row["updated_at"])
+        }
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    # WORKER SIDE
+    def _claim(self):
+        conn = self._conn()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND run_at <= ?) "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY run_at LIMIT 1",
+                (now, now)
+            ).fetchone()
+
+            if row is not None:
+                row = dict(row)
+                row["lease_until"] = now + JOB_LEASE_SECONDS
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', lease_until = ?, updated_at = ? WHERE job_id = ?",
+                    (row["lease_until"], now, row["job_id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return row
+
+    def _save(self, job_id, lease, **fields):
+        # lease_until doubles as the lease token: the write only lands while it
+        # still holds this worker's value, and renews it unless the job is let go
+        now = time.time()
+        fields.setdefault("lease_until", now + JOB_LEASE_SECONDS)
+        fields["updated_at"] = now
+        columns = ", ".join(f"{name} = ?" for name in fields)
+
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET {columns} WHERE job_id = ? AND lease_until = ?",
+            (*fields.values(), job_id, lease)
+        )
+        if cursor.rowcount == 0:
+            raise LeaseLost(job_id)
+        return fields["lease_until"]
+
+    def _note_error(self, job_id, error):
+        try:
+            self._conn().execute("UPDATE jobs SET error = ?, updated_at = ? WHERE job_id = ?",
+                                 (error, time.time(), job_id))
+        except sqlite3.Error:
+            pass  # the lease runs out and the job is picked up again anyway
+
+    def run_job(self, row):
+        """Run a claimed job from its next step. Raises LeaseLost if another worker took it over."""
+
+        job_id = row["job_id"]
+        lease = row["lease_until"]
+        steps = _loads(row["steps"])
+        context = _loads(row["context"])
+        index = row["next_step"]
+        attempts = row["attempts"]
+
+        while index < len(steps):
+            step = steps[index]
+
+            with _Heartbeat(self, job_id, lease) as heartbeat:
+                try:
+                    output = HANDLERS[step["handler"]](_resolve(step["args"], context), job_id)
+                    error = None
+                except Exception as e:
+                    error = f"{step['handler']}: {e}"
+
+            # the heartbeat holds the current lease once it has renewed it
+            lease = heartbeat.lease
+            if heartbeat.lost:
+                raise LeaseLost(job_id)
+
+            if error:
+                attempts += 1
+
+                if attempts < JOB_MAX_ATTEMPTS:
+                    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+                    self._save(job_id, lease, status="queued", next_step=index, attempts=attempts,
+                               context=_dumps(context), error=error, run_at=time.time() + delay,
+                               lease_until=None)
+                    return
+
+                if not step["optional"]:
+                    self._save(job_id, lease, status="failed", next_step=index, attempts=attempts,
+                               context=_dumps(context), error=error, lease_until=None)
+                    shutil.rmtree(_spool_dir(job_id), ignore_errors=True)
+                    return
+
+                # best-effort step: keep the failure on the job and let the report go through
+                lease = self._save(job_id, lease, error=f"gave up on {error}")
+                output = step["defaults"]
+
+            context.update(output)
+            index += 1
+            attempts = 0
+            lease = self._save(job_id, lease, next_step=index, attempts=0, context=_dumps(context))
+
+        self._save(job_id, lease, status="done", lease_until=None)
+        shutil.rmtree(_spool_dir(job_id), ignore_errors=True)
+
+    def work(self, stop=None):
+        stop = stop or threading.Event()
+
+        while not stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.OperationalError:
+                # database locked by another process for longer than the timeout; poll again
+                row = None
+
+            if row is None:
+                self._wake.wait(JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+
+            try:
+                self.run_job(row)
+            except LeaseLost:
+                pass  # another worker has the job now and carries on from its last saved step
+            except Exception as e:
+                # left running: once the lease runs out the job is claimed and retried
+                self._note_error(row["job_id"], f"worker crashed: {type(e).__name__}: {e}")
+
+    def start_workers(self, count=JOB_WORKERS):
+        with self._start_lock:
+            if self._workers:
+                return
+            for i in range(count):
+                worker = threading.Thread(target=self.work, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+
+job_queue = JobQueue()
+
+
+def job_status(job_id):
+    return job_queue.status(job_id)
@@ -0,0 +1,359 @@
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from email.mime.text import MIMEText
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Outgoing mail for alerts and the email agent.
+# Authenticated SMTP connections are pooled and reused instead of doing a TLS
+# handshake + login per message, sends are rate limited, and in digest mode
+# alerts fired within EMAIL_DIGEST_SECONDS are merged into one message per
+# (recipient, severity). A digest that fails to go out is put back and retried
+# EMAIL_FLUSH_RETRIES times before it is dropped (and logged).
+#
+# For local runs / tests point it at a plain SMTP stand-in instead of Gmail:
+#   python -m aiosmtpd -n -l localhost:1025
+#   SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SSL=0 SMTP_LOGIN=0 streamlit run 1_Dashboard.py
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+SMTP_LOGIN = os.getenv("SMTP_LOGIN", "1") != "0"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "20"))
+
+# POOL / RATE SETTINGS
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "120"))
+SMTP_NOOP_AFTER = float(os.getenv("SMTP_NOOP_AFTER", "20"))
+EMAIL_RATE_PER_MINUTE = int(os.getenv("EMAIL_RATE_PER_MINUTE", "20"))
+EMAIL_DIGEST_SECONDS = float(os.getenv("EMAIL_DIGEST_SECONDS", "0"))  # 0 = send every alert
+EMAIL_FLUSH_RETRIES = int(os.getenv("EMAIL_FLUSH_RETRIES", "3"))
+
+# Mailer.alert() results
+EMAIL_SENT = "sent"
+EMAIL_QUEUED = "queued"  # waiting in a digest; not delivered yet
+
+
+def sender_address():
+    return os.getenv("ALERT_EMAIL")
+
+
+def default_recipient():
+    return os.getenv("SENDER_EMAIL")
+
+
+class SMTPPool:
+    """Logged-in SMTP sessions, checked out one per message and handed back."""
+
+    def __init__(self, size=SMTP_POOL_SIZE, idle_seconds=SMTP_IDLE_SECONDS, noop_after=SMTP_NOOP_AFTER):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.noop_after = noop_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # (server, last returned at)
+        self._open = 0
+
+        self._logins = 0
+        self._reused = 0
+
+    def _connect(self):
+        if SMTP_SSL:
+            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+
+        if SMTP_LOGIN:
+            server.login(sender_address(), os.getenv("ALERT_EMAIL_PASSWORD"))
+
+        with self._cond:
+            self._logins += 1
+        return server
+
+    @staticmethod
+    def _close_quietly(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _healthy(self, server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _reap_locked(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        keep = []
+
+        for server, returned_at in self._idle:
+            if returned_at < cutoff:
+                # Gmail drops idle sessions anyway; close them on our side first
+                self._close_quietly(server)
+                self._open -= 1
+            else:
+                keep.append((server, returned_at))
+
+        self._idle = keep
+
+    def acquire(self):
+        server = None
+        idle_for = 0.0
+
+        with self._cond:
+            while True:
+                self._reap_locked()
+
+                if self._idle:
+                    server, returned_at = self._idle.pop()
+                    idle_for = time.monotonic() - returned_at
+                    break
+
+                if self._open < self.size:
+                    self._open += 1
+                    break
+
+                self._cond.wait()
+
+        try:
+            if server is not None and idle_for >= self.noop_after and not self._healthy(server):
+                self._close_quietly(server)
+                server = None
+
+            if server is None:
+                server = self._connect()
+            else:
+                with self._cond:
+                    self._reused += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        return server
+
+    def release(self, server, broken=False):
+        with self._cond:
+            if broken:
+                self._close_quietly(server)
+                self._open -= 1
+            else:
+                self._idle.append((server, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            for server, _ in self._idle:
+                self._close_quietly(server)
+                self._open -= 1
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "logins": self._logins,
+                "reused": self._reused
+            }
+
+
+class RateLimiter:
+    """At most `limit` sends in any rolling `period` seconds; callers wait for a slot."""
+
+    def __init__(self, limit=EMAIL_RATE_PER_MINUTE, period=60.0):
+        self.limit = limit
+        self.period = period
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.limit <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= self.period:
+                    self._sent.popleft()
+
+                if len(self._sent) < self.limit:
+                    self._sent.append(now)
+                    return
+
+                delay = self.period - (now - self._sent[0])
+
+            time.sleep(delay)
+
+
+class Mailer:
+
+    def __init__(self, pool=None, limiter=None, digest_seconds=EMAIL_DIGEST_SECONDS):
+        self.pool = pool or SMTPPool()
+        self.limiter = limiter or RateLimiter()
+        self.digest_seconds = digest_seconds
+
+        self._digests = {}  # (recipient, severity) -> [(subject, body, on_sent)]
+        self._flush_failures = {}  # (recipient, severity) -> failed flushes in a row
+        self._digest_lock = threading.Lock()
+        self.sent = 0
+        self.digested = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def send(self, subject, body, recipient=None):
+        """Send one message now. Raises on failure."""
+
+        recipient = recipient or default_recipient()
+
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = sender_address()
+        msg["To"] = recipient
+
+        self.limiter.wait()
+
+        # a pooled session the server has since dropped gets one fresh retry
+        for attempt in range(2):
+            server = self.pool.acquire()
+            try:
+                server.sendmail(sender_address(), recipient, msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                self.pool.release(server, broken=True)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self.pool.release(server, broken=True)
+                raise
+
+            self.pool.release(server)
+            self.sent += 1
+            return
+
+    # DIGEST MODE
+    def alert(self, subject, body, severity=None, recipient=None, on_sent=None):
+        """Send an alert, or add it to the open digest for its recipient and severity.
+
+        Returns EMAIL_SENT, or EMAIL_QUEUED when it waits in a digest; on_sent()
+        is called once that digest has actually gone out. Raises on failure.
+        """
+
+        if self.digest_seconds <= 0:
+            self.send(subject, body, recipient)
+            return EMAIL_SENT
+
+        key = (recipient or default_recipient(), severity or "info")
+
+        with self._digest_lock:
+            pending = self._digests.setdefault(key, [])
+            pending.append((subject, body, on_sent))
+            self.digested += 1
+            first = len(pending) == 1
+
+        if first:
+            # the first alert opens the window; everything until it closes rides along
+            self._schedule(key)
+        return EMAIL_QUEUED
+
+    def _schedule(self, key):
+        timer = threading.Timer(self.digest_seconds, self.flush, args=(key,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, key, pending, error, retry):
+        # put a digest that failed back in front of anything queued since
+        with self._digest_lock:
+            self.failed_flushes += 1
+            self.last_error = error
+            failures = self._flush_failures.get(key, 0) + 1
+
+            if retry and failures < EMAIL_FLUSH_RETRIES:
+                self._flush_failures[key] = failures
+                waiting = self._digests.get(key, [])
+                self._digests[key] = pending + waiting
+            else:
+                self._flush_failures.pop(key, None)
+                self.dropped += len(pending)
+                waiting = None
+
+        if waiting is None:
+            logger.error("Dropped digest of %d alert(s) to %s after %d failed sends: %s",
+                         len(pending), key[0], failures, error)
+            return
+
+        logger.warning("Digest email to %s failed, retrying in %ss: %s", key[0], self.digest_seconds, error)
+        if not waiting:
+            # otherwise the timer of the newer alerts is already running
+            self._schedule(key)
+
+    def flush(self, key=None, retry=True):
+        keys = [key] if key else list(self._digests)
+
+        for key in keys:
+            with self._digest_lock:
+                pending = self._digests.pop(key, [])
+            if not pending:
+                continue
+
+            recipient, severity = key
+
+            if len(pending) == 1:
+                subject, body, _ = pending[0]
+            else:
+                subject = f"🚨 Smart City Alert Digest: {len(pending)} {severity} alerts"
+                body = "\n\n".join(
+                    f"[{i}] {s}\n{b.strip()}" for i, (s, b, _) in enumerate(pending, 1)
+                )
+
+            try:
+                self.send(subject, body, recipient)
+            except Exception as e:
+                self._requeue(key, pending, f"{type(e).__name__}: {e}", retry)
+                continue
+
+            with self._digest_lock:
+                self._flush_failures.pop(key, None)
+
+            for _, _, on_sent in pending:
+                if on_sent:
+                    try:
+                        on_sent()
+                    except Exception as e:
+                        logger.warning("Digest sent but its on_sent callback failed: %s", e)
+
+    def stats(self):
+        with self._digest_lock:
+            waiting = sum(len(p) for p in self._digests.values())
+            return {
+                **self.pool.stats(),
+                "sent": self.sent,
+                "digested": self.digested,
+                "digest_waiting": waiting,
+                "failed_flushes": self.failed_flushes,
+                "dropped": self.dropped,
+                "last_error": self.last_error
+            }
+
+
+mailer = Mailer()
+
+# don't drop a digest that is still waiting for its window to close; there is
+# no later retry at exit, so a failure here is logged as dropped
+atexit.register(mailer.flush, retry=False)
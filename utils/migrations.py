@@ -0,0 +1,373 @@
+import datetime
+from utils.db import get_connection
+from utils.rollups import CREATE_ROLLUP_TABLE
+
+# Versioned schema for the Smart City database.
+# Each migration is (version, name, steps). A step is either a SQL string, an
+# ("index", table, index_name, columns) or a ("column", table, column, definition)
+# tuple; indexes and columns are only created when missing, so the pack can be
+# applied to a database that predates it.
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+INITIAL_SCHEMA = [
+
+    """
+    CREATE TABLE IF NOT EXISTS traffic_data (
+        traffic_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        timestamp DATETIME NOT NULL,
+        city VARCHAR(100),
+        area VARCHAR(150),
+        latitude DOUBLE,
+        longitude DOUBLE,
+        vehicle_count INT,
+        avg_speed_kmph FLOAT,
+        congestion_level VARCHAR(16),
+        lane_count INT,
+        weather_condition VARCHAR(32),
+        is_peak_hour BOOLEAN
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS air_quality_data (
+        reading_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        timestamp DATETIME NOT NULL,
+        city VARCHAR(100),
+        monitoring_station VARCHAR(150),
+        latitude DOUBLE,
+        longitude DOUBLE,
+        pm25 FLOAT,
+        pm10 FLOAT,
+        co FLOAT,
+        no2 FLOAT,
+        so2 FLOAT,
+        o3 FLOAT,
+        aqi INT,
+        aqi_category VARCHAR(32)
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS citizen_complaints (
+        complaint_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        created_at DATETIME NOT NULL,
+        city VARCHAR(100),
+        category VARCHAR(32),
+        complaint_text TEXT,
+        latitude DOUBLE,
+        longitude DOUBLE,
+        department VARCHAR(64),
+        status VARCHAR(16),
+        priority VARCHAR(16)
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS complaint_nlp_analysis (
+        analysis_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        complaint_id BIGINT NOT NULL,
+        sentiment VARCHAR(16),
+        sentiment_score FLOAT,
+        emotion VARCHAR(32),
+        topic VARCHAR(32),
+        urgency_score FLOAT
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS road_infra_images (
+        image_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        image_url VARCHAR(1024),
+        captured_at DATETIME NOT NULL,
+        city VARCHAR(100),
+        latitude DOUBLE,
+        longitude DOUBLE,
+        camera_source VARCHAR(32),
+        weather VARCHAR(32),
+        road_type VARCHAR(32),
+        resolution VARCHAR(32),
+        annotated BOOLEAN
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS road_infra_annotations (
+        annotation_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        image_id VARCHAR(36) NOT NULL,
+        object_class VARCHAR(64),
+        bbox_x FLOAT,
+        bbox_y FLOAT,
+        bbox_width FLOAT,
+        bbox_height FLOAT,
+        confidence FLOAT
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS accident_events (
+        accident_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        detected_at DATETIME NOT NULL,
+        image_id VARCHAR(36),
+        latitude DOUBLE,
+        longitude DOUBLE,
+        severity VARCHAR(16),
+        vehicle_count INT,
+        confidence_score FLOAT,
+        emergency_alert_sent BOOLEAN,
+        response_time_sec INT
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS crowd_density_data (
+        crowd_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        image_url VARCHAR(1024),
+        timestamp DATETIME NOT NULL,
+        city VARCHAR(100),
+        location VARCHAR(150),
+        latitude DOUBLE,
+        longitude DOUBLE,
+        estimated_count INT,
+        density_level VARCHAR(16),
+        event_type VARCHAR(32),
+        model_confidence FLOAT
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS system_alerts (
+        alert_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        alert_type VARCHAR(32),
+        generated_at DATETIME NOT NULL,
+        location VARCHAR(255),
+        severity VARCHAR(16),
+        message TEXT,
+        email_sent BOOLEAN,
+        resolved BOOLEAN NOT NULL DEFAULT FALSE
+    )
+    """,
+
+    # embedding_vector holds the text form written by rag_ingest.py
+    """
+    CREATE TABLE IF NOT EXISTS rag_documents (
+        doc_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        source_type VARCHAR(32),
+        source_reference VARCHAR(255),
+        text_chunk TEXT,
+        embedding_vector LONGTEXT,
+        created_at DATETIME
+    )
+    """
+]
+
+# Composite indexes matched to the filters / sorts used across pages, agents and the dashboard
+HOT_PATH_INDEXES = [
+
+    # congestion_level='high' [AND city=?] GROUP BY city
+    ("index", "traffic_data", "idx_traffic_congestion_city", "congestion_level, city"),
+    # ORDER BY timestamp DESC LIMIT n / WHERE city=? ORDER BY timestamp / DISTINCT city
+    ("index", "traffic_data", "idx_traffic_timestamp", "timestamp"),
+    ("index", "traffic_data", "idx_traffic_city_timestamp", "city, timestamp"),
+
+    ("index", "air_quality_data", "idx_aqi_timestamp", "timestamp"),
+    ("index", "air_quality_data", "idx_aqi_city_timestamp", "city, timestamp"),
+    ("index", "air_quality_data", "idx_aqi_station_timestamp", "monitoring_station, timestamp"),
+
+    # "today" range scans and the latest-accident image JOIN (covers image_id)
+    ("index", "accident_events", "idx_accident_detected_image", "detected_at, image_id"),
+    ("index", "accident_events", "idx_accident_severity", "severity"),
+    ("index", "accident_events", "idx_accident_image", "image_id"),
+
+    ("index", "crowd_density_data", "idx_crowd_timestamp", "timestamp"),
+    ("index", "crowd_density_data", "idx_crowd_city_timestamp", "city, timestamp"),
+    ("index", "crowd_density_data", "idx_crowd_density_city", "density_level, city"),
+    ("index", "crowd_density_data", "idx_crowd_city_count", "city, estimated_count"),
+
+    ("index", "citizen_complaints", "idx_complaints_created", "created_at"),
+    ("index", "citizen_complaints", "idx_complaints_city_category", "city, category"),
+    ("index", "citizen_complaints", "idx_complaints_status_category", "status, category, priority"),
+
+    ("index", "complaint_nlp_analysis", "idx_nlp_sentiment", "sentiment"),
+    ("index", "complaint_nlp_analysis", "idx_nlp_complaint", "complaint_id"),
+
+    # road_type=? ORDER BY captured_at DESC (s3_agent) / road_type=? GROUP BY city (dashboard)
+    ("index", "road_infra_images", "idx_images_roadtype_captured", "road_type, captured_at"),
+    ("index", "road_infra_images", "idx_images_roadtype_city", "road_type, city"),
+    ("index", "road_infra_images", "idx_images_captured", "captured_at"),
+
+    # object_class='pothole' JOIN road_infra_images USING image_id
+    ("index", "road_infra_annotations", "idx_annotations_class_image", "object_class, image_id"),
+    ("index", "road_infra_annotations", "idx_annotations_image", "image_id"),
+
+    # resolved = FALSE ORDER BY generated_at DESC
+    ("index", "system_alerts", "idx_alerts_generated", "generated_at"),
+    ("index", "system_alerts", "idx_alerts_resolved_generated", "resolved, generated_at"),
+
+    ("index", "rag_documents", "idx_rag_source_type", "source_type")
+]
+
+# next-hour forecasts written by forecast_job.py (utils/forecasting.py)
+CREATE_AQI_FORECASTS_TABLE = """
+CREATE TABLE IF NOT EXISTS aqi_forecasts (
+    monitoring_station VARCHAR(150) NOT NULL,
+    forecast_for DATETIME NOT NULL,
+    city VARCHAR(100),
+    predicted_aqi INT NOT NULL,
+    aqi_category VARCHAR(32),
+    history_hours INT NOT NULL,
+    generated_at DATETIME NOT NULL,
+    PRIMARY KEY (monitoring_station, forecast_for),
+    KEY idx_aqi_forecasts_for (forecast_for, city)
+)
+"""
+
+# repeats of an open alert bump occurrences / last_seen_at instead of adding rows (utils/system_alerts.py)
+ALERT_DEDUP = [
+    ("column", "system_alerts", "occurrences", "INT NOT NULL DEFAULT 1"),
+    ("column", "system_alerts", "last_seen_at", "DATETIME NULL"),
+    "UPDATE system_alerts SET last_seen_at = generated_at WHERE last_seen_at IS NULL",
+    # open alert lookup by (type, location, severity) / recent alerts by last occurrence
+    ("index", "system_alerts", "idx_alerts_dedup", "alert_type, location(100), severity, resolved, last_seen_at"),
+    ("index", "system_alerts", "idx_alerts_last_seen", "last_seen_at")
+]
+
+# next-hour junction forecasts written by forecast_job.py; area/city are '' when the reading had none
+CREATE_TRAFFIC_FORECASTS_TABLE = """
+CREATE TABLE IF NOT EXISTS traffic_forecasts (
+    city VARCHAR(100) NOT NULL,
+    area VARCHAR(150) NOT NULL,
+    forecast_for DATETIME NOT NULL,
+    predicted_vehicles INT NOT NULL,
+    congestion_level VARCHAR(16),
+    history_hours INT NOT NULL,
+    generated_at DATETIME NOT NULL,
+    PRIMARY KEY (city, area, forecast_for),
+    KEY idx_traffic_forecasts_for (forecast_for, city)
+)
+"""
+
+# the junction history each traffic forecast was computed from: forecast_job.py
+# only re-predicts junctions whose row count / newest reading moved since
+TRAFFIC_FORECAST_VERSIONS = [
+    ("column", "traffic_forecasts", "source_rows", "INT NOT NULL DEFAULT 0"),
+    ("column", "traffic_forecasts", "source_last_at", "DATETIME NULL")
+]
+
+# RDS steps of post-detection jobs that already committed (utils/job_queue.py)
+CREATE_JOB_STEPS_TABLE = """
+CREATE TABLE IF NOT EXISTS job_steps (
+    job_id VARCHAR(32) NOT NULL,
+    step INT NOT NULL,
+    done_at DATETIME NOT NULL,
+    PRIMARY KEY (job_id, step)
+)
+"""
+
+# per-table write counters: invalidate_tables() bumps them so every process's
+# query cache drops what another process changed (utils/query_cache.py)
+CREATE_CACHE_GENERATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS cache_generations (
+    table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0
+)
+"""
+
+MIGRATIONS = [
+    (1, "initial_schema", INITIAL_SCHEMA),
+    (2, "hot_path_indexes", HOT_PATH_INDEXES),
+    (3, "metric_rollup", [CREATE_ROLLUP_TABLE]),
+    (4, "aqi_forecasts", [CREATE_AQI_FORECASTS_TABLE]),
+    (5, "alert_dedup", ALERT_DEDUP),
+    (6, "job_steps", [CREATE_JOB_STEPS_TABLE]),
+    (7, "traffic_forecasts", [CREATE_TRAFFIC_FORECASTS_TABLE]),
+    (8, "traffic_forecast_versions", TRAFFIC_FORECAST_VERSIONS),
+    (9, "cache_generations", [CREATE_CACHE_GENERATIONS_TABLE])
+]
+
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND index_name = %s
+    """, (table, index_name))
+    return cursor.fetchone()[0] > 0
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _apply_step(cursor, step):
+
+    if isinstance(step, str):
+        cursor.execute(step)
+        return
+
+    kind, table, name, definition = step
+
+    if kind == "column":
+        if not _column_exists(cursor, table, name):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        return
+
+    if not _index_exists(cursor, table, name):
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({definition})")
+
+
+def applied_versions():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    return versions
+
+
+def migrate(target=None):
+
+    done = applied_versions()
+    applied = []
+
+    for version, name, steps in MIGRATIONS:
+
+        if version in done:
+            continue
+        if target is not None and version > target:
+            break
+
+        # DDL auto-commits in MySQL, so each step is idempotent and the
+        # version row is only written once every step succeeded
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            for step in steps:
+                _apply_step(cursor, step)
+
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s,%s,%s)",
+                (version, name, datetime.datetime.now())
+            )
+            conn.commit()
+            cursor.close()
+
+        applied.append((version, name))
+
+    return applied
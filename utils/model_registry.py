@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+# Process-wide home for loaded models and scalers.
+# Each artifact is loaded once, optionally warmed with a dummy prediction, and
+# reloaded when the file on disk changes (checked at most every
+# MODEL_RELOAD_CHECK_SECONDS), so dropping a retrained model into models/ takes
+# effect without restarting Streamlit or the inference server.
+
+RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+
+
+def _mtime(path):
+    # exported OpenVINO models are directories; any file inside counts
+    if path is None:
+        return None
+    try:
+        if os.path.isdir(path):
+            return max(
+                (os.path.getmtime(os.path.join(folder, f)) for folder, _, files in os.walk(path) for f in files),
+                default=os.path.getmtime(path)
+            )
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def file_version(path):
+    # integer mtime of a model file / directory, 0 when it is not on this host
+    mtime = _mtime(path)
+    return int(mtime) if mtime else 0
+
+
+class _Entry:
+
+    def __init__(self, value, path, mtime):
+        self.value = value
+        self.path = path
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_error_at = None
+
+
+class ModelRegistry:
+
+    def __init__(self, check_interval=RELOAD_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, path, loader, warmup=None):
+        """Return the loaded artifact for key, (re)loading it from path when needed.
+
+        loader(path) builds the object; warmup(obj), if given, runs once per load
+        before the object is handed out. path=None is for objects that are not
+        backed by one file - they load once and are never reloaded.
+        """
+
+        entry = self._entries.get(key)
+
+        if entry and entry.path == path and time.monotonic() - entry.checked_at < self.check_interval:
+            return entry.value
+
+        mtime = _mtime(path)
+
+        if entry and entry.path == path and (entry.mtime == mtime or mtime is None):
+            # unchanged, or the file is mid-replace: keep serving what we have
+            entry.checked_at = time.monotonic()
+            return entry.value
+
+        # one loader per key; other callers keep using the old object meanwhile
+        lock = self._key_lock(key)
+        if entry and not lock.acquire(blocking=False):
+            return entry.value
+        if not entry:
+            lock.acquire()
+
+        try:
+            current = self._entries.get(key)
+            if current and current is not entry and current.path == path and current.mtime == mtime:
+                return current.value
+
+            try:
+                value = loader(path)
+                if warmup:
+                    warmup(value)
+            except Exception as e:
+                if not entry:
+                    raise
+                # a half-written file should not take the page down; stats() reports it
+                entry.failed_reloads += 1
+                entry.last_error = f"{type(e).__name__}: {e}"
+                entry.last_error_at = time.time()
+                entry.checked_at = time.monotonic()
+                return entry.value
+
+            fresh = _Entry(value, path, mtime)
+            if entry:
+                fresh.reloads = entry.reloads + 1
+                fresh.failed_reloads = entry.failed_reloads
+            self._entries[key] = fresh
+            return value
+
+        finally:
+            lock.release()
+
+    def stats(self):
+        def stamp(at):
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(at)) if at else None
+
+        return {
+            str(key): {
+                "path": entry.path,
+                "loaded_at": stamp(entry.loaded_at),
+                "reloads": entry.reloads,
+                # the served object is the previous version while this is set
+                "reload_failed": entry.last_error is not None,
+                "failed_reloads": entry.failed_reloads,
+                "last_error": entry.last_error,
+                "last_error_at": stamp(entry.last_error_at)
+            }
+            for key, entry in list(self._entries.items())
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+
+# Detection post-processing shared by the pages.
+# Class-name rules (which classes are vehicles, how accident classes map to a
+# severity) are turned once per model into lookup arrays indexed by class id,
+# so a frame's counts, max confidence and severity are NumPy reductions over
+# detections.cls / detections.conf instead of a names[] lookup per box.
+
+VEHICLE_CLASSES = ("car", "bus", "truck", "motorbike", "bicycle")
+
+ACCIDENT_SEVERITY = {
+    "no_accident": None,
+    "minor_damage": "low",
+    "moderate_damage": "medium",
+    "severe_accident": "high",
+    "total_loss": "high"
+}
+
+SEVERITY_LEVELS = [None, "low", "medium", "high"]  # index = rank
+
+_luts = {}
+_luts_lock = threading.Lock()
+
+
+def _lut(names, rule, build):
+    # one table per (model class names, rule); models keep their names for life
+    key = (rule, tuple(sorted(names.items())))
+    table = _luts.get(key)
+    if table is None:
+        size = max(names, default=-1) + 1
+        table = np.array([build(names.get(i)) for i in range(size)])
+        with _luts_lock:
+            _luts[key] = table
+    return table
+
+
+def class_mask(names, classes):
+    """Boolean array: class id -> name is in classes."""
+    classes = tuple(classes)
+    return _lut(names, ("mask", classes), lambda name: name in classes).astype(bool)
+
+
+def count_classes(detections, classes):
+    if len(detections) == 0:
+        return 0
+    return int(class_mask(detections.names, classes)[detections.cls].sum())
+
+
+def max_conf(detections):
+    return float(detections.conf.max()) if len(detections) else 0.0
+
+
+class AccidentSummary:
+    """Accident verdict for one frame, or several frames merged with update()."""
+
+    def __init__(self):
+        self.rank = 0
+        self.vehicle_count = 0
+        self.max_conf = 0.0
+
+    @property
+    def accident_detected(self):
+        return self.rank > 0
+
+    @property
+    def severity(self):
+        return SEVERITY_LEVELS[self.rank]
+
+    def update(self, detections):
+        # vehicles: every box except no_accident; per clip, the busiest frame wins
+        if len(detections) == 0:
+            return self
+
+        names = detections.names
+        ranks = _lut(names, "severity", lambda name: SEVERITY_LEVELS.index(ACCIDENT_SEVERITY.get(name)))
+        involved = ~class_mask(names, ("no_accident",))
+
+        cls = detections.cls
+        self.rank = max(self.rank, int(ranks[cls].max()))
+        self.vehicle_count = max(self.vehicle_count, int(involved[cls].sum()))
+        self.max_conf = max(self.max_conf, max_conf(detections))
+        return self
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import numpy as np
+
+# Runtime side of the INT8 models written by quantize_models.py.
+#
+# A model runs quantized only when its budget is set and the last report
+# measured an accuracy delta inside it:
+#   INT8_BUDGET=0.02            -> every model whose delta is <= 0.02
+#   INT8_BUDGET_TRAFFIC=0.05    -> per model (the page's model name)
+#   INT8_BUDGET_AQI_LSTM=0      -> never for that model
+# With no budget configured everything stays on the fp32 models.
+
+QUANT_REPORT = "models/quantization_report.json"
+
+_report = {"mtime": None, "data": {}}
+_report_lock = threading.Lock()
+
+
+def int8_path(source_path):
+    # models/x.pt -> models/x_int8.onnx, models/x.h5 -> models/x_int8.tflite
+    stem, ext = os.path.splitext(source_path)
+    return f"{stem}_int8.tflite" if ext == ".h5" else f"{stem}_int8.onnx"
+
+
+def load_report():
+    # re-read only when quantize_models.py has rewritten the file
+    try:
+        mtime = os.path.getmtime(QUANT_REPORT)
+    except OSError:
+        return {}
+
+    with _report_lock:
+        if _report["mtime"] != mtime:
+            with open(QUANT_REPORT) as f:
+                _report["data"] = json.load(f)
+            _report["mtime"] = mtime
+        return _report["data"]
+
+
+def int8_budget(name):
+    value = os.getenv(f"INT8_BUDGET_{name.upper()}", os.getenv("INT8_BUDGET", ""))
+    return float(value) if value else None
+
+
+def use_int8(name, source_path):
+    budget = int8_budget(name)
+    if budget is None:
+        return False
+
+    entry = load_report().get(name)
+    if not entry or not os.path.exists(int8_path(source_path)):
+        return False
+
+    return entry["accuracy_delta"] <= budget
+
+
+class TFLiteModel:
+    """Keras-style predict() over a TFLite interpreter, for the INT8 LSTMs."""
+
+    def __init__(self, path):
+        import tensorflow as tf
+
+        self.path = path
+        self._interpreter = tf.lite.Interpreter(model_path=path, num_threads=os.cpu_count())
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self):
+        return tuple(self._input["shape"])
+
+    def predict(self, inputs, verbose=0):
+        inputs = np.asarray(inputs, dtype=np.float32)
+        outputs = []
+
+        # the interpreter holds one set of buffers, so calls are serialised
+        with self._lock:
+            for sample in inputs:
+                self._interpreter.set_tensor(self._input["index"], sample[None].astype(self._input["dtype"]))
+                self._interpreter.invoke()
+                outputs.append(self._interpreter.get_tensor(self._output["index"])[0])
+
+        return np.asarray(outputs, dtype=np.float32)
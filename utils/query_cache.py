@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+import time
+from utils.db import execute_query, get_connection
+
+logger = logging.getLogger(__name__)
+
+# Writes in other processes (job_worker.py, forecast_job.py) reach this cache
+# through cache_generations: invalidate_tables() bumps a per-table counter in
+# MySQL and every cache re-reads the counters at most every
+# QUERY_CACHE_SYNC_SECONDS, dropping the entries of tables that moved.
+# If MySQL cannot be reached, entries still expire after their TTL.
+QUERY_CACHE_SYNC_SECONDS = float(os.getenv("QUERY_CACHE_SYNC_SECONDS", "2"))
+
+
+class QueryCache:
+    """Process-wide result cache shared by every Streamlit session.
+
+    Entries are keyed by (name, city) and tagged with the tables they read,
+    so a write to one table only drops the entries built from it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # key -> (value, loaded_at)
+        self._tables = {}       # table -> set of keys
+        self._generation = {}   # table -> bumped on every write to it
+        self._loading = {}      # key -> lock held by the session running the query
+        self._shared = {}       # table -> last cache_generations value seen
+        self._synced_at = 0.0
+        self._sync_failed = False
+        self._sync_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, name, city, tables, ttl, loader):
+        key = (name, city)
+        self.sync()
+
+        entry = self._fresh(key, ttl)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # only one session runs the query; the rest wait and reuse its result
+        with load_lock:
+            entry = self._fresh(key, ttl)
+            if entry is not None:
+                return entry
+
+            with self._lock:
+                generation = self._generations(tables)
+                self.misses += 1
+
+            value = loader()
+
+            with self._lock:
+                # a write during the load means the value may already be stale
+                if self._generations(tables) == generation:
+                    self._entries[key] = (value, time.monotonic())
+                    for table in tables:
+                        self._tables.setdefault(table, set()).add(key)
+
+            return value
+
+    def sync(self):
+        """Drop entries of tables another process wrote to since the last look."""
+
+        if time.monotonic() - self._synced_at < QUERY_CACHE_SYNC_SECONDS:
+            return
+        # one session reads the counters; the rest go on with what they have
+        if not self._sync_lock.acquire(blocking=False):
+            return
+
+        try:
+            rows = execute_query("SELECT table_name, generation FROM cache_generations")
+
+            moved = [row["table_name"] for row in rows if self._shared.get(row["table_name"]) != row["generation"]]
+            self._shared = {row["table_name"]: row["generation"] for row in rows}
+            if moved:
+                self.invalidate(*moved)
+
+            self._sync_failed = False
+        except Exception as e:
+            if not self._sync_failed:
+                logger.warning("Query cache falls back to TTLs, cache_generations unreadable: %s", e)
+            self._sync_failed = True
+        finally:
+            self._synced_at = time.monotonic()
+            self._sync_lock.release()
+
+    def _generations(self, tables):
+        return tuple(self._generation.get(table, 0) for table in tables)
+
+    def _fresh(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._generation[table] = self._generation.get(table, 0) + 1
+                for key in self._tables.pop(table, set()):
+                    if self._entries.pop(key, None) is not None:
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for table in self._tables:
+                self._generation[table] = self._generation.get(table, 0) + 1
+            self._entries.clear()
+            self._tables.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+
+_cache = QueryCache()
+
+
+def cached(name, city, tables, ttl, loader):
+    return _cache.get(name, city, tables, ttl, loader)
+
+
+def _publish(tables):
+    # bump the shared counters so the caches of other processes drop these tables too
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO cache_generations (table_name, generation) VALUES (%s, 1) "
+                "ON DUPLICATE KEY UPDATE generation = generation + 1",
+                [(table,) for table in tables]
+            )
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        logger.warning("Could not publish cache invalidation of %s: %s", ", ".join(tables), e)
+
+
+def invalidate_tables(*tables):
+    _cache.invalidate(*tables)
+    if tables:
+        _publish(tables)
+
+
+def cache_stats():
+    return _cache.stats()
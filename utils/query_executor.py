@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.db import execute_query, with_time_limit, POOL_SIZE
+
+# Fan independent read queries out over pooled connections.
+# Latency becomes the slowest query instead of the sum of all of them.
+
+QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "8"))
+
+# never run more queries at once than the pool can lend out
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db-query")
+
+
+def _runner(query, timeout):
+
+    max_ms = int(timeout * 1000)
+
+    if callable(query):
+        # the deadline is passed on so the callable's own SELECTs are bounded too
+        return lambda: query(max_ms=max_ms)
+
+    if isinstance(query, tuple):
+        sql, params = query
+    else:
+        sql, params = query, None
+
+    sql = with_time_limit(sql, max_ms)
+    return lambda: execute_query(sql, params)
+
+
+def run_parallel(queries, timeout=QUERY_TIMEOUT):
+    """Run {name: sql | (sql, params) | callable} concurrently.
+
+    Callables are called as query(max_ms=...) and must hand max_ms on to the
+    SELECTs they run (rollup_by / rollup_total take it). A query that misses
+    the deadline keeps its worker thread and pooled connection until MySQL
+    aborts it at max_ms, so nothing is held past the deadline for long.
+
+    Returns (results, errors). Queries that fail or miss the deadline get an
+    empty list in results and a reason in errors, so callers can still use
+    the rest.
+    """
+
+    futures = {
+        name: _executor.submit(_runner(query, timeout))
+        for name, query in queries.items()
+    }
+
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    errors = {}
+
+    for name, future in futures.items():
+
+        if not future.done():
+            future.cancel()
+            results[name] = []
+            errors[name] = f"timed out after {timeout}s"
+            continue
+
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            results[name] = []
+            errors[name] = str(e)
+
+    return results, errors
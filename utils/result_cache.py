@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+import cv2
+from utils.detections import Detections
+from utils.inference import model_version
+
+# Content-addressed cache of detection results on local disk.
+# Key = SHA-256 of the uploaded bytes + model version + confidence (+ any other
+# setting that changes the output, e.g. the video sampler). A hit gives back the
+# page's summary values, the detections, the annotated image and the S3 URL of
+# the first upload, so re-uploading the same frame or clip skips inference and
+# the S3 transfer. Least recently used entries are evicted past the size limit.
+# The total size is tracked as entries are written; the directory is only
+# walked once at start and when the total crosses the limit, and eviction then
+# frees down to RESULT_CACHE_LOW_WATER of the limit so the next walk is far off.
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(".cache", "detections"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "500"))
+RESULT_CACHE_LOW_WATER = 0.9
+
+CACHED_NOTICE = "⚡ Cached result – this file was analysed before, inference and S3 upload skipped"
+
+CachedResult = namedtuple("CachedResult", ["summary", "detections", "annotated", "image_url"])
+
+
+class ResultCache:
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk; None until the first walk
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, data, model_name, conf, **settings):
+        digest = hashlib.sha256(data).hexdigest()
+        extra = json.dumps(settings, sort_keys=True, default=repr)
+        identity = f"{digest}|{model_name}|{model_version(model_name)}|{conf}|{extra}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        folder = self._path(key)
+        meta_path = os.path.join(folder, "meta.json")
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # mtime doubles as the LRU clock; the entry may be evicted under us
+        try:
+            os.utime(meta_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        annotated = cv2.imread(os.path.join(folder, "annotated.jpg"))
+        detections = Detections.from_dict(meta["detections"]) if meta.get("detections") else None
+
+        return CachedResult(meta["summary"], detections, annotated, meta.get("image_url"))
+
+    def put(self, key, summary, detections=None, annotated=None, image_url=None):
+        folder = self._path(key)
+        staging = f"{folder}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(staging, exist_ok=True)
+
+        try:
+            if annotated is not None:
+                cv2.imwrite(os.path.join(staging, "annotated.jpg"), annotated)
+
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump({
+                    "summary": summary,
+                    "detections": detections.to_dict() if detections is not None else None,
+                    "image_url": image_url,
+                    "created_at": time.time()
+                }, f)
+
+            size = self._folder_size(staging)
+            replaced = self._folder_size(folder)
+
+            # swap in whole so readers never see a half-written entry
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(staging, folder)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size - replaced
+
+        if self._size is None or self._size > self.max_bytes:
+            self._evict()
+
+    @staticmethod
+    def _folder_size(path):
+        try:
+            return sum(f.stat().st_size for f in os.scandir(path))
+        except OSError:
+            return 0
+
+    def _entries(self):
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    used = os.path.getmtime(os.path.join(entry.path, "meta.json"))
+                except OSError:
+                    continue
+                yield used, size, entry.path
+
+    def _evict(self):
+        # the walk also picks up entries other processes wrote or removed
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+
+            if total > self.max_bytes:
+                for _, size, path in entries:
+                    if total <= self.max_bytes * RESULT_CACHE_LOW_WATER:
+                        break
+                    shutil.rmtree(path, ignore_errors=True)
+                    total -= size
+
+            self._size = total
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+result_cache = ResultCache()
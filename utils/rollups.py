@@ -0,0 +1,190 @@
+import datetime
+from utils.db import get_connection, execute_query, with_time_limit
+
+# One row per (metric, city, hour, dimension). The detection pages bump these
+# counters inside the same transaction as their raw INSERT, so dashboard and
+# report reads scan the rollup instead of the raw event tables.
+#
+# metric               dimension
+# traffic              congestion_level
+# accident             severity
+# crowd                density_level
+# annotation           object_class
+# infra_image          road_type
+# complaint_category   category
+# complaint_sentiment  sentiment
+
+CREATE_ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS metric_rollup (
+    metric VARCHAR(32) NOT NULL,
+    city VARCHAR(100) NOT NULL DEFAULT '',
+    hour_start DATETIME NOT NULL,
+    dimension VARCHAR(64) NOT NULL DEFAULT '',
+    row_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, dimension, city, hour_start)
+)
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO metric_rollup (metric, city, hour_start, dimension, row_count)
+VALUES (%s,%s,%s,%s,%s)
+ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count)
+"""
+
+# annotations / NLP rows whose parent row is missing have no timestamp
+ORPHAN_HOUR = "'1970-01-01 00:00:00'"
+
+
+def _hour(column):
+    return f"TIMESTAMP(DATE({column}), MAKETIME(HOUR({column}), 0, 0))"
+
+
+BACKFILL_QUERIES = {
+
+    "traffic": f"""
+        SELECT 'traffic', COALESCE(city, ''), {_hour('timestamp')},
+               COALESCE(congestion_level, ''), COUNT(*)
+        FROM traffic_data
+        GROUP BY 2, 3, 4
+    """,
+
+    "accident": f"""
+        SELECT 'accident', COALESCE(r.city, ''), {_hour('a.detected_at')},
+               COALESCE(a.severity, ''), COUNT(*)
+        FROM accident_events a
+        LEFT JOIN road_infra_images r ON a.image_id = r.image_id
+        GROUP BY 2, 3, 4
+    """,
+
+    "crowd": f"""
+        SELECT 'crowd', COALESCE(city, ''), {_hour('timestamp')},
+               COALESCE(density_level, ''), COUNT(*)
+        FROM crowd_density_data
+        GROUP BY 2, 3, 4
+    """,
+
+    "annotation": f"""
+        SELECT 'annotation', COALESCE(r.city, ''),
+               COALESCE({_hour('r.captured_at')}, {ORPHAN_HOUR}),
+               COALESCE(a.object_class, ''), COUNT(*)
+        FROM road_infra_annotations a
+        LEFT JOIN road_infra_images r ON a.image_id = r.image_id
+        GROUP BY 2, 3, 4
+    """,
+
+    "infra_image": f"""
+        SELECT 'infra_image', COALESCE(city, ''), {_hour('captured_at')},
+               COALESCE(road_type, ''), COUNT(*)
+        FROM road_infra_images
+        GROUP BY 2, 3, 4
+    """,
+
+    "complaint_category": f"""
+        SELECT 'complaint_category', COALESCE(city, ''), {_hour('created_at')},
+               COALESCE(category, ''), COUNT(*)
+        FROM citizen_complaints
+        GROUP BY 2, 3, 4
+    """,
+
+    "complaint_sentiment": f"""
+        SELECT 'complaint_sentiment', COALESCE(c.city, ''),
+               COALESCE({_hour('c.created_at')}, {ORPHAN_HOUR}),
+               COALESCE(n.sentiment, ''), COUNT(*)
+        FROM complaint_nlp_analysis n
+        LEFT JOIN citizen_complaints c ON c.complaint_id = n.complaint_id
+        GROUP BY 2, 3, 4
+    """
+}
+
+
+# INCREMENTAL UPDATE (CALLER OWNS THE TRANSACTION)
+def bump_rollup(cursor, metric, city, dimension, count=1, at=None):
+
+    if count <= 0:
+        return
+
+    at = at or datetime.datetime.now()
+    hour_start = at.replace(minute=0, second=0, microsecond=0)
+
+    cursor.execute(UPSERT_ROLLUP, (
+        metric,
+        city or "",
+        hour_start,
+        dimension or "",
+        count
+    ))
+
+
+# FULL REBUILD FROM RAW HISTORY
+def backfill_rollups(metrics=None):
+
+    metrics = metrics or list(BACKFILL_QUERIES)
+    rebuilt = {}
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_ROLLUP_TABLE)
+
+        # one transaction: readers keep seeing the old rollup until commit
+        for metric in metrics:
+            cursor.execute("DELETE FROM metric_rollup WHERE metric = %s", (metric,))
+            cursor.execute(
+                "INSERT INTO metric_rollup (metric, city, hour_start, dimension, row_count) "
+                + BACKFILL_QUERIES[metric]
+            )
+            rebuilt[metric] = cursor.rowcount
+
+        conn.commit()
+        cursor.close()
+
+    return rebuilt
+
+
+# READS
+def rollup_total(metric, dimensions=None, city=None, since=None, max_ms=None):
+
+    sql = "SELECT COALESCE(SUM(row_count), 0) AS total FROM metric_rollup WHERE metric = %s"
+    params = [metric]
+
+    if dimensions:
+        sql += " AND dimension IN (" + ",".join(["%s"] * len(dimensions)) + ")"
+        params.extend(dimensions)
+
+    if city and city != "All":
+        sql += " AND city = %s"
+        params.append(city)
+
+    if since is not None:
+        sql += " AND hour_start >= %s"
+        params.append(since)
+
+    return int(execute_query(with_time_limit(sql, max_ms), tuple(params))[0]["total"])
+
+
+def rollup_by(metric, label, alias, dimensions=None, city=None, by_city=False, limit=None, max_ms=None):
+
+    # groups by city or by the metric's dimension; label/alias name the output columns
+    column = "city" if by_city else "dimension"
+
+    sql = f"SELECT {column} AS {label}, SUM(row_count) AS {alias} FROM metric_rollup WHERE metric = %s"
+    params = [metric]
+
+    if dimensions:
+        sql += " AND dimension IN (" + ",".join(["%s"] * len(dimensions)) + ")"
+        params.extend(dimensions)
+
+    if city and city != "All":
+        sql += " AND city = %s"
+        params.append(city)
+
+    sql += f" GROUP BY {column}"
+
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    rows = execute_query(with_time_limit(sql, max_ms), tuple(params))
+
+    for row in rows:
+        row[alias] = int(row[alias])
+
+    return rows
@@ -1,5 +1,8 @@
 import boto3
+import io
+import mimetypes
 import os
+from boto3.s3.transfer import TransferConfig
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,10 +16,41 @@ s3 = boto3.client(
 
 BUCKET = os.getenv("AWS_BUCKET")
 
-def upload_to_s3(file_path, file_name):
+# Small files go up in one PUT; anything past the threshold (videos) is split
+# into parts that are sent in parallel.
+MB = 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(float(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) * MB),
+    multipart_chunksize=int(float(os.getenv("S3_MULTIPART_CHUNK_MB", "8")) * MB),
+    max_concurrency=int(os.getenv("S3_MAX_CONCURRENCY", "8")),
+    use_threads=True
+)
+
+
+def upload_to_s3(source, file_name):
+    """Upload to S3 and return the object URL, or None on failure.
+
+    source is a file path, raw bytes, or an open binary file object such as
+    Streamlit's UploadedFile - the original bytes are streamed as they are,
+    with no temp file or re-encode in between.
+    """
+
+    extra_args = {}
+    content_type = mimetypes.guess_type(file_name)[0]
+    if content_type:
+        extra_args["ContentType"] = content_type
+
     try:
         # Upload the file to S3
-        s3.upload_file(file_path, BUCKET, file_name)
+        if isinstance(source, (str, os.PathLike)):
+            s3.upload_file(source, BUCKET, file_name, ExtraArgs=extra_args, Config=TRANSFER_CONFIG)
+        else:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                source = io.BytesIO(source)
+            else:
+                # the page has usually read it already (PIL, getvalue)
+                source.seek(0)
+            s3.upload_fileobj(source, BUCKET, file_name, ExtraArgs=extra_args, Config=TRANSFER_CONFIG)
 
         # Generate file URL
         url = f"https://{BUCKET}.s3.{os.getenv('AWS_REGION')}.amazonaws.com/{file_name}"
@@ -25,4 +59,4 @@ def upload_to_s3(file_path, file_name):
 
     except Exception as e:
         print("S3 Upload Error:", e)
-        return None
\ No newline at end of file
+        return None
@@ -1,34 +1,159 @@
+import os
+import threading
 import uuid
 import datetime
-from utils.db import get_connection
+from utils.db import get_connection, execute_query
+from utils.query_cache import invalidate_tables
+
+# Alerts are deduplicated per (alert_type, location, severity): while an open
+# alert with the same key was last seen inside the suppression window, a repeat
+# bumps its occurrences / last_seen_at instead of adding a row (and callers skip
+# the email). Windows in seconds, 0 disables dedup:
+#   ALERT_SUPPRESS_SECONDS=900           -> every alert type
+#   ALERT_SUPPRESS_SECONDS_TRAFFIC=300   -> per alert_type
+
+ALERT_SUPPRESS_SECONDS = float(os.getenv("ALERT_SUPPRESS_SECONDS", "900"))
+
+# recent alert index: key -> (alert_id, last seen); saves the DB lookup for hot keys
+RECENT_MAX = 2000
+_recent = {}
+_recent_lock = threading.Lock()
+
+
+def suppress_window(alert_type):
+    value = os.getenv(f"ALERT_SUPPRESS_SECONDS_{(alert_type or '').upper()}")
+    return datetime.timedelta(seconds=float(value) if value else ALERT_SUPPRESS_SECONDS)
+
+
+def _open_alert(alert_type, location, severity, now, verify=False):
+    # alert_id of the open alert this one would repeat, if any. verify=True
+    # confirms a cached id is still unresolved (create_alert's UPDATE does that itself)
+    window = suppress_window(alert_type)
+    if not window:
+        return None
+
+    key = (alert_type, location, severity)
+
+    with _recent_lock:
+        recent = _recent.get(key)
+    if recent and now - recent[1] < window:
+        if not verify or execute_query(
+            "SELECT alert_id FROM system_alerts WHERE alert_id = %s AND resolved = FALSE",
+            (recent[0],)
+        ):
+            return recent[0]
+
+        # resolved by an operator since: forget it and look for another open one
+        with _recent_lock:
+            if _recent.get(key) == recent:
+                del _recent[key]
+
+    # another process (or before a restart) may have raised it
+    rows = execute_query("""
+        SELECT alert_id, last_seen_at
+        FROM system_alerts
+        WHERE alert_type = %s AND location = %s AND severity = %s
+          AND resolved = FALSE AND last_seen_at >= %s
+        ORDER BY last_seen_at DESC
+        LIMIT 1
+    """, (alert_type, location, severity, now - window))
+
+    if not rows:
+        return None
+
+    with _recent_lock:
+        _recent[key] = (rows[0]["alert_id"], rows[0]["last_seen_at"])
+    return rows[0]["alert_id"]
+
+
+def is_repeat_alert(alert_type, location, severity):
+    """True when create_alert would fold this alert into an open one (so skip the email)."""
+    return _open_alert(alert_type, location, severity, datetime.datetime.now(), verify=True) is not None
+
 
 def create_alert(alert_type, location, severity, message, email_sent):
+    """Raise an alert, or count a repeat of the open one. Returns True if a new row was added."""
+
+    now = datetime.datetime.now()
+    key = (alert_type, location, severity)
+    alert_id = _open_alert(alert_type, location, severity, now)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        if alert_id:
+            cursor.execute("""
+                UPDATE system_alerts
+                SET occurrences = occurrences + 1,
+                    last_seen_at = %s,
+                    message = %s,
+                    email_sent = email_sent OR %s
+                WHERE alert_id = %s AND resolved = FALSE
+            """, (now, message, email_sent, alert_id))
+
+            # resolved since we last looked: this is a fresh incident
+            if cursor.rowcount == 0:
+                alert_id = None
+                with _recent_lock:
+                    _recent.pop(key, None)
+
+        is_new = alert_id is None
+
+        if is_new:
+            alert_id = str(uuid.uuid1())
+
+            cursor.execute("""
+                INSERT INTO system_alerts (
+                    alert_id,
+                    alert_type,
+                    generated_at,
+                    location,
+                    severity,
+                    message,
+                    email_sent,
+                    resolved,
+                    occurrences,
+                    last_seen_at
+                )
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            """, (
+                alert_id,
+                alert_type,
+                now,
+                location,
+                severity,
+                message,
+                email_sent,
+                False,
+                1,
+                now
+            ))
+
+        conn.commit()
+
+    with _recent_lock:
+        _recent[key] = (alert_id, now)
+
+        if len(_recent) > RECENT_MAX:
+            for stale in [k for k, (_, seen) in _recent.items() if now - seen >= suppress_window(k[0])]:
+                del _recent[stale]
+
+    invalidate_tables("system_alerts")
+    return is_new
+
+
+def mark_alert_emailed(alert_type, location, severity):
+    """Flag the open alert for this key as emailed, once the digest carrying it went out."""
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE system_alerts
+            SET email_sent = TRUE
+            WHERE alert_type = %s AND location = %s AND severity = %s AND resolved = FALSE
+            ORDER BY last_seen_at DESC
+            LIMIT 1
+        """, (alert_type, location, severity))
+        conn.commit()
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO system_alerts (
-            alert_id,
-            alert_type,
-            generated_at,
-            location,
-            severity,
-            message,
-            email_sent,
-            resolved
-        )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        str(uuid.uuid1()),
-        alert_type,
-        datetime.datetime.now(),
-        location,
-        severity,
-        message,
-        email_sent,
-        False
-    ))
-
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    invalidate_tables("system_alerts")
@@ -0,0 +1,289 @@
+import numpy as np
+from utils.detections import Detections
+
+# Lightweight multi-object tracker for the video pages (ByteTrack-style).
+# Each track carries a constant-velocity Kalman filter over (cx, cy, w, h);
+# detections are matched to predicted boxes by IoU in two passes: confident
+# detections first, then low-confidence ones can only extend existing tracks.
+# Counting confirmed track ids gives unique objects per clip instead of the
+# sum of per-frame detections.
+
+TENTATIVE, CONFIRMED = "tentative", "confirmed"
+
+# share of a clip CountStabilizer always lets the pages see before stopping early
+MIN_CLIP_SHARE = 0.5
+
+
+def iou_matrix(a, b):
+    # pairwise IoU between (N, 4) and (M, 4) xyxy boxes
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def greedy_match(scores, threshold):
+    # highest-IoU pairs first; good enough at the object counts these pages see
+    matches = []
+    if scores.size == 0:
+        return matches, list(range(scores.shape[0])), list(range(scores.shape[1]))
+
+    order = np.dstack(np.unravel_index(np.argsort(-scores, axis=None), scores.shape))[0]
+    used_rows, used_cols = set(), set()
+
+    for row, col in order:
+        if scores[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        matches.append((int(row), int(col)))
+        used_rows.add(row)
+        used_cols.add(col)
+
+    unmatched_rows = [r for r in range(scores.shape[0]) if r not in used_rows]
+    unmatched_cols = [c for c in range(scores.shape[1]) if c not in used_cols]
+    return matches, unmatched_rows, unmatched_cols
+
+
+def _to_cxcywh(box):
+    x1, y1, x2, y2 = box
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
+
+
+class KalmanBox:
+    """Constant-velocity Kalman filter over one box's (cx, cy, w, h)."""
+
+    # transition: position += velocity each sampled frame
+    F = np.eye(8)
+    F[:4, 4:] = np.eye(4)
+    H = np.eye(4, 8)
+
+    def __init__(self, box):
+        self.x = np.zeros(8)
+        self.x[:4] = _to_cxcywh(box)
+
+        # box size scales the noise, so small and large objects behave alike
+        scale = max(self.x[2], self.x[3], 1.0)
+        self.P = np.diag([scale, scale, scale, scale, 10 * scale, 10 * scale, 10 * scale, 10 * scale]) ** 2 / 100
+        self._scale = scale
+
+    def _noise(self, position, velocity):
+        s = self._scale
+        return np.diag([position * s] * 4 + [velocity * s] * 4) ** 2
+
+    def predict(self):
+        self.x = self.F @ self.x
+        # widths/heights cannot go negative while coasting
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = self.F @ self.P @ self.F.T + self._noise(0.05, 0.0125)
+        return self.box()
+
+    def update(self, box):
+        z = _to_cxcywh(box)
+        self._scale = max(z[2], z[3], 1.0)
+
+        R = np.diag([0.05 * self._scale] * 4) ** 2
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+
+        self.x = self.x + K @ (z - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+
+class Track:
+
+    def __init__(self, track_id, box, conf, cls):
+        self.id = track_id
+        self.kf = KalmanBox(box)
+        self.cls = int(cls)
+        self.conf = float(conf)
+        self.hits = 1
+        self.missed = 0
+        self.state = TENTATIVE
+
+    def box(self):
+        return self.kf.box()
+
+
+class ByteTracker:
+    """Tracks detections across sampled frames and counts unique objects.
+
+    high_thresh - detections at or above this start new tracks
+    low_thresh  - weaker detections may still keep an existing track alive
+    match_iou   - minimum IoU between a predicted track box and a detection
+    max_missed  - sampled frames a track may go unseen before it is dropped
+    min_hits    - matches needed before a track counts as a real object
+    """
+
+    def __init__(self, high_thresh=0.5, low_thresh=0.1, match_iou=0.3, max_missed=10, min_hits=2):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.match_iou = match_iou
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+
+        self.tracks = []
+        self.frames = 0
+        self._next_id = 1
+        self._counted = {}  # confirmed track id -> class id
+        self._best = {}  # confirmed track id -> (conf, box) of its most confident detection
+
+    def _scores(self, tracks, boxes, classes):
+        scores = iou_matrix(np.array([t.box() for t in tracks], dtype=np.float32).reshape(-1, 4), boxes)
+        if scores.size:
+            # never match across classes
+            track_classes = np.array([t.cls for t in tracks])
+            scores[track_classes[:, None] != classes[None, :]] = 0
+        return scores
+
+    def _remember(self, track, box, conf):
+        best = self._best.get(track.id)
+        if best is None or conf > best[0]:
+            self._best[track.id] = (float(conf), np.asarray(box, dtype=np.float32))
+
+    def _associate(self, tracks, boxes, confs, classes):
+        scores = self._scores(tracks, boxes, classes)
+        matches, lost, unmatched = greedy_match(scores, self.match_iou)
+
+        for t, d in matches:
+            track = tracks[t]
+            track.kf.update(boxes[d])
+            track.conf = float(confs[d])
+            track.hits += 1
+            track.missed = 0
+
+            if track.state == TENTATIVE and track.hits >= self.min_hits:
+                track.state = CONFIRMED
+                self._counted[track.id] = track.cls
+
+            if track.state == CONFIRMED:
+                self._remember(track, boxes[d], confs[d])
+
+        return [tracks[t] for t in lost], unmatched
+
+    def update(self, detections):
+        """Feed one sampled frame's Detections; returns the confirmed tracks seen in it."""
+
+        self.frames += 1
+
+        for track in self.tracks:
+            track.kf.predict()
+
+        boxes = detections.xyxy.astype(np.float32)
+        confs = detections.conf
+        classes = detections.cls
+
+        high = confs >= self.high_thresh
+        low = (confs >= self.low_thresh) & ~high
+
+        # first pass: confident detections against every live track
+        remaining, unmatched_high = self._associate(self.tracks, boxes[high], confs[high], classes[high])
+
+        # second pass: weak detections can only rescue tracks that already exist
+        confirmed_left = [t for t in remaining if t.state == CONFIRMED]
+        unrescued, _ = self._associate(confirmed_left, boxes[low], confs[low], classes[low])
+        still_lost = {id(t) for t in unrescued} | {id(t) for t in remaining if t.state == TENTATIVE}
+
+        survivors = []
+        for track in self.tracks:
+            if id(track) in still_lost:
+                track.missed += 1
+                # unconfirmed tracks get no second chance
+                if track.state == TENTATIVE or track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+
+        high_boxes, high_confs, high_classes = boxes[high], confs[high], classes[high]
+        for d in unmatched_high:
+            track = Track(self._next_id, high_boxes[d], high_confs[d], high_classes[d])
+            self._next_id += 1
+            if self.min_hits <= 1:
+                track.state = CONFIRMED
+                self._counted[track.id] = track.cls
+                self._remember(track, high_boxes[d], high_confs[d])
+            survivors.append(track)
+
+        self.tracks = survivors
+        return [t for t in self.tracks if t.state == CONFIRMED and t.missed == 0]
+
+    @property
+    def unique_count(self):
+        return len(self._counted)
+
+    def objects(self, names=None):
+        """Detections with one row per counted object: its most confident box."""
+        ids = [i for i in self._counted if i in self._best]
+        if not ids:
+            return Detections(names=dict(names or {}))
+
+        return Detections(
+            xyxy=np.stack([self._best[i][1] for i in ids]).astype(np.float32),
+            conf=np.array([self._best[i][0] for i in ids], dtype=np.float32),
+            cls=np.array([self._counted[i] for i in ids], dtype=np.int64),
+            names=dict(names or {})
+        )
+
+    def unique_by_class(self, names=None):
+        counts = {}
+        for class_id in self._counted.values():
+            key = names.get(class_id, class_id) if names else class_id
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class CountStabilizer:
+    """Signals when a tracker's unique count has stopped changing.
+
+    Pages break out of analyze_video() once stable() is true, which also shuts
+    down the decode / inference threads, so the rest of the clip is skipped.
+    A clip that has shown nothing yet is never stable, and no clip stops before
+    min_share of its frames (total_frames, when known) have been seen. A moving
+    camera keeps reaching new ground, so with moving_camera=True the whole clip
+    is always analysed.
+    """
+
+    def __init__(self, patience, min_frames=None, total_frames=None, min_share=MIN_CLIP_SHARE,
+                 moving_camera=False):
+        self.patience = patience
+        self.min_frames = min_frames if min_frames is not None else patience
+        self.min_position = int(total_frames * min_share) if total_frames else 0
+        self.moving_camera = moving_camera
+        self._last_count = None
+        self._unchanged = 0
+
+    def stable(self, tracker, position=None):
+        # position: source frame index of the result just tracked (FrameResult.index)
+        count = tracker.unique_count
+
+        if count == self._last_count:
+            self._unchanged += 1
+        else:
+            self._last_count = count
+            self._unchanged = 0
+
+        if self.moving_camera or count == 0:
+            return False
+        if position is not None and position + 1 < self.min_position:
+            return False
+
+        # nothing half-seen may still be waiting to become a new object
+        pending = any(t.state == TENTATIVE for t in tracker.tracks)
+
+        return (
+            tracker.frames >= self.min_frames
+            and self._unchanged >= self.patience
+            and not pending
+        )
@@ -27,3 +27,28 @@ def app_footer():
     )
 
 
+def track_job(job_id):
+    st.session_state.setdefault("jobs", []).append(job_id)
+
+
+def job_status_panel(limit=5):
+    # background jobs (S3 / RDS / alerts) submitted from this session
+    job_ids = st.session_state.get("jobs", [])
+    if not job_ids:
+        return
+
+    from utils.job_queue import job_status
+
+    icons = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}
+
+    with st.sidebar.expander("🧾 Background Jobs", expanded=True):
+        st.button("🔄 Refresh", key="refresh_jobs")
+
+        for job_id in reversed(job_ids[-limit:]):
+            status = job_status(job_id)
+            if status is None:
+                continue
+
+            st.markdown(f"{icons.get(status['status'], '')} `{job_id}` {status['kind']} – {status['status']} ({status['progress']})")
+            if status["error"] and status["status"] != "done":
+                st.caption(f"Last error: {status['error']} (attempt {status['attempts']})")
@@ -1,50 +1,89 @@
-from utils.db import execute_query
+import os
+import threading
+import time
+from dataclasses import dataclass
+from utils.query_executor import run_parallel
 from utils.llm import call_llm
 
+# Chat turns inside CONTEXT_REFRESH_SECONDS reuse the rendered context text.
+# Up to CONTEXT_MAX_STALENESS the old text is served while a background
+# thread rebuilds it; past that the caller waits for a fresh build.
+CONTEXT_REFRESH_SECONDS = float(os.getenv("CITY_CONTEXT_REFRESH_SECONDS", "30"))
+CONTEXT_MAX_STALENESS = float(os.getenv("CITY_CONTEXT_MAX_STALENESS", "120"))
+
+
+@dataclass(frozen=True)
+class CityContext:
+    version: int
+    built_at: float
+    text: str
+
+    @property
+    def age(self):
+        return time.monotonic() - self.built_at
+
+
+_context = None
+_context_lock = threading.Lock()
+_build_lock = threading.Lock()
+
 
 def get_live_city_context():
 
-    traffic = execute_query("""
-        SELECT city, area, congestion_level, vehicle_count
-        FROM traffic_data
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-
-    aqi = execute_query("""
-        SELECT city, aqi, aqi_category
-        FROM air_quality_data
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-
-    accidents = execute_query("""
-        SELECT severity, COUNT(*)
-        FROM accident_events
-        GROUP BY severity
-    """)
-
-    complaints = execute_query("""
-        SELECT category, priority, COUNT(*)
-        FROM citizen_complaints
-        WHERE status='open'
-        GROUP BY category, priority
-    """)
-
-    crowd = execute_query("""
-        SELECT location, density_level, estimated_count
-        FROM crowd_density_data
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-
-    alerts = execute_query("""
-        SELECT alert_type, location, severity
-        FROM system_alerts
-        WHERE resolved = FALSE
-        ORDER BY generated_at DESC
-        LIMIT 5
-    """)
+    results, errors = run_parallel({
+
+        "traffic": """
+            SELECT city, area, congestion_level, vehicle_count
+            FROM traffic_data
+            ORDER BY timestamp DESC
+            LIMIT 5
+        """,
+
+        "aqi": """
+            SELECT city, aqi, aqi_category
+            FROM air_quality_data
+            ORDER BY timestamp DESC
+            LIMIT 5
+        """,
+
+        "accidents": """
+            SELECT severity, COUNT(*)
+            FROM accident_events
+            GROUP BY severity
+        """,
+
+        "complaints": """
+            SELECT category, priority, COUNT(*)
+            FROM citizen_complaints
+            WHERE status='open'
+            GROUP BY category, priority
+        """,
+
+        "crowd": """
+            SELECT location, density_level, estimated_count
+            FROM crowd_density_data
+            ORDER BY timestamp DESC
+            LIMIT 5
+        """,
+
+        "alerts": """
+            SELECT alert_type, location, severity
+            FROM system_alerts
+            WHERE resolved = FALSE
+            ORDER BY generated_at DESC
+            LIMIT 5
+        """
+    })
+
+    for name, reason in errors.items():
+        results[name] = f"UNAVAILABLE ({reason})"
+
+    traffic = results["traffic"]
+    aqi = results["aqi"]
+    accidents = results["accidents"]
+    complaints = results["complaints"]
+    crowd = results["crowd"]
+    alerts = results["alerts"]
 
     return f"""
 TRAFFIC:
@@ -67,9 +106,46 @@ ACTIVE ALERTS:
 """
 
 
+def _rebuild_context():
+
+    global _context
+
+    # single flight: concurrent callers wait for the build already running
+    with _build_lock:
+        current = _context
+        if current is not None and current.age < CONTEXT_REFRESH_SECONDS:
+            return current
+
+        text = get_live_city_context()
+
+        with _context_lock:
+            version = _context.version + 1 if _context else 1
+            _context = CityContext(version=version, built_at=time.monotonic(), text=text)
+            return _context
+
+
+def _refresh_in_background():
+    if _build_lock.locked():
+        return
+    threading.Thread(target=_rebuild_context, name="city-context-refresh", daemon=True).start()
+
+
+def get_city_context_snapshot():
+
+    current = _context
+
+    if current is None or current.age >= CONTEXT_MAX_STALENESS:
+        return _rebuild_context()
+
+    if current.age >= CONTEXT_REFRESH_SECONDS:
+        _refresh_in_background()
+
+    return current
+
+
 def ask_urban_ai(user_query):
 
-    context = get_live_city_context()
+    context = get_city_context_snapshot().text
 
     prompt = f"""
 You are UrbanBot AI – Smart City Command & Control Assistant.
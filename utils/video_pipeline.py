@@ -0,0 +1,334 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+import cv2
+from utils.inference import detect_batch
+
+# Shared video analysis for the detection pages: decode only the sampled frames,
+# run the detector on fixed-size batches and hand results back in frame order.
+#
+# decoder thread -> frame queue -> inference thread -> result queue -> page
+# Both queues are bounded, so decode runs ahead of the model by at most a
+# couple of batches and memory stays flat on long clips.
+
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "0"))  # 0 = adapt to the host
+MAX_BATCH_SIZE = int(os.getenv("VIDEO_MAX_BATCH_SIZE", "16"))
+
+# rough bytes held per queued frame: the BGR frame plus the letterboxed float tensor
+BYTES_PER_PIXEL = 3 + 3 * 4
+
+PREVIEW_FPS = float(os.getenv("VIDEO_PREVIEW_FPS", "4"))
+QUEUE_BATCHES = 2
+
+# crossing a gap by seeking re-decodes from the previous keyframe, so it only
+# pays off once the gap is longer than a typical GOP
+SEEK_AFTER_FRAMES = int(os.getenv("VIDEO_SEEK_AFTER_FRAMES", "60"))
+KEYFRAME_INTERVAL = float(os.getenv("VIDEO_KEYFRAME_INTERVAL", "2"))
+
+# stills used by the offline model tools when no footage is given
+SAMPLE_FRAMES = os.path.join("assets", "Detected images")
+
+FrameResult = namedtuple("FrameResult", ["index", "frame", "detections"])
+
+
+def _available_memory():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def adaptive_batch_size(frame_shape, imgsz=None):
+
+    if VIDEO_BATCH_SIZE > 0:
+        return VIDEO_BATCH_SIZE
+
+    # one frame per core keeps every intra-op thread busy without oversubscribing
+    size = min(MAX_BATCH_SIZE, os.cpu_count() or 1)
+
+    available = _available_memory()
+    if available:
+        height, width = frame_shape[:2]
+        side = imgsz or 640
+        per_frame = height * width * 3 + side * side * BYTES_PER_PIXEL
+        # never let one batch take more than a quarter of free memory
+        size = min(size, max(1, int(available * 0.25 // per_frame)))
+
+    return max(1, size)
+
+
+class FrameSampler:
+    """Picks which frames of a clip get decoded.
+
+    stride   - every n-th frame; frames in between are grab()bed, never retrieved
+    fps      - n frames per second of video time, whatever the source frame rate
+    keyframe - one frame every `interval` seconds, reached by seeking, so the
+               frames in between are not decoded at all
+    """
+
+    def __init__(self, mode="stride", value=1):
+        if mode not in ("stride", "fps", "keyframe"):
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        if value <= 0:
+            raise ValueError("Sampling value must be positive")
+
+        self.mode = mode
+        self.value = value
+
+    @classmethod
+    def every(cls, n=1):
+        return cls("stride", int(n))
+
+    @classmethod
+    def per_second(cls, fps):
+        return cls("fps", float(fps))
+
+    @classmethod
+    def keyframes(cls, interval=KEYFRAME_INTERVAL):
+        return cls("keyframe", float(interval))
+
+    @classmethod
+    def parse(cls, spec):
+        # "stride:5", "fps:2", "keyframe" or "keyframe:4"
+        mode, _, value = spec.strip().partition(":")
+        if mode == "keyframe":
+            return cls.keyframes(float(value) if value else KEYFRAME_INTERVAL)
+        return cls(mode, float(value) if mode == "fps" else int(value or 1))
+
+    def step(self, source_fps):
+        # distance between sampled frames, in source frames
+        if self.mode == "stride":
+            return self.value
+        if not source_fps or source_fps <= 0:
+            # unknown frame rate: fall back to decoding every frame
+            return 1
+        if self.mode == "fps":
+            return max(1.0, source_fps / self.value)
+        return max(1, round(source_fps * self.value))
+
+    def seek_after(self):
+        # gaps longer than this are crossed with a seek instead of grab()
+        return 0 if self.mode == "keyframe" else SEEK_AFTER_FRAMES
+
+    def targets(self, source_fps):
+        step = self.step(source_fps)
+        k = 0
+        while True:
+            yield int(round(k * step))
+            k += 1
+
+    def __repr__(self):
+        return f"FrameSampler({self.mode!r}, {self.value!r})"
+
+
+def sampler_for(model_name, default):
+    # VIDEO_SAMPLER_<MODEL>=fps:2 overrides a page's sampler without a code change
+    spec = os.getenv(f"VIDEO_SAMPLER_{model_name.upper()}")
+    return FrameSampler.parse(spec) if spec else default
+
+
+def read_frames(path, sampler=None):
+    # yields (index, frame) for the frames the sampler picks, 0-based source index
+    sampler = sampler or FrameSampler.every(1)
+    cap = cv2.VideoCapture(path)
+
+    # index of the frame the next read()/grab() returns
+    position = 0
+    seek_after = sampler.seek_after()
+
+    try:
+        if not cap.isOpened():
+            return
+
+        for target in sampler.targets(cap.get(cv2.CAP_PROP_FPS)):
+
+            if target < position:
+                continue
+
+            if target - position > seek_after and cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                position = target
+
+            # grab() demuxes/decodes but skips the colour conversion and copy
+            while position < target:
+                if not cap.grab():
+                    return
+                position += 1
+
+            ret, frame = cap.read()
+            if not ret:
+                return
+            position += 1
+
+            yield target, frame
+    finally:
+        cap.release()
+
+
+def frame_count(path):
+    # frames in the clip per its container, None when it does not say
+    cap = cv2.VideoCapture(path)
+    try:
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    finally:
+        cap.release()
+    return count if count > 0 else None
+
+
+def load_sample_frames(source=SAMPLE_FRAMES, limit=20):
+    # BGR frames from an image folder, a single image or a video (1 frame / second)
+
+    if os.path.isdir(source):
+        files = sorted(
+            f for f in os.listdir(source)
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        frames = [cv2.imread(os.path.join(source, f)) for f in files[:limit]]
+        return [f for f in frames if f is not None]
+
+    if source.lower().endswith((".jpg", ".jpeg", ".png")):
+        frame = cv2.imread(source)
+        return [] if frame is None else [frame]
+
+    frames = []
+    for _, frame in read_frames(source, FrameSampler.per_second(1)):
+        frames.append(frame)
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+def _batches(frames, batch_size, imgsz):
+    batch = []
+
+    for index, frame in frames:
+
+        if batch_size is None:
+            batch_size = adaptive_batch_size(frame.shape, imgsz)
+
+        batch.append((index, frame))
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _run_batch(batch, model_name, conf, imgsz):
+    detections = detect_batch(model_name, [frame for _, frame in batch], conf=conf, imgsz=imgsz)
+
+    return [
+        FrameResult(index, frame, frame_detections)
+        for (index, frame), frame_detections in zip(batch, detections)
+    ]
+
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    # blocking put that gives up once the consumer has gone away
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _decode_stage(path, sampler, frame_queue, stop):
+    try:
+        for item in read_frames(path, sampler):
+            if not _put(frame_queue, item, stop):
+                return
+    except Exception as e:
+        _put(frame_queue, _StageError(e), stop)
+        return
+    _put(frame_queue, _DONE, stop)
+
+
+def _infer_stage(frame_queue, result_queue, model_name, conf, imgsz, batch_size, stop):
+
+    def frames():
+        while not stop.is_set():
+            try:
+                item = frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+
+    try:
+        for batch in _batches(frames(), batch_size, imgsz):
+            for result in _run_batch(batch, model_name, conf, imgsz):
+                if not _put(result_queue, result, stop):
+                    return
+    except Exception as e:
+        _put(result_queue, _StageError(e), stop)
+        return
+    _put(result_queue, _DONE, stop)
+
+
+def analyze_video(path, model_name, conf, imgsz=None, sampler=None, batch_size=None, threaded=True):
+
+    if not threaded:
+        for batch in _batches(read_frames(path, sampler), batch_size, imgsz):
+            yield from _run_batch(batch, model_name, conf, imgsz)
+        return
+
+    depth = (batch_size or MAX_BATCH_SIZE) * QUEUE_BATCHES
+    frame_queue = queue.Queue(maxsize=depth)
+    result_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    stages = [
+        threading.Thread(target=_decode_stage, args=(path, sampler, frame_queue, stop),
+                         name="video-decode", daemon=True),
+        threading.Thread(target=_infer_stage,
+                         args=(frame_queue, result_queue, model_name, conf, imgsz, batch_size, stop),
+                         name="video-infer", daemon=True)
+    ]
+
+    for stage in stages:
+        stage.start()
+
+    try:
+        while True:
+            item = result_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        # also runs when the page stops iterating early
+        stop.set()
+        for stage in stages:
+            stage.join(timeout=5)
+
+
+class PreviewThrottle:
+    """Lets a page render at most max_fps preview frames per second."""
+
+    def __init__(self, max_fps=PREVIEW_FPS):
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self._last = 0.0
+
+    def ready(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False